@@ -0,0 +1,191 @@
+"""Batch Research Jobs.
+
+Runs a list of research briefs (for example, a nightly competitor sweep) in one
+process instead of as N independent `agent` invocations:
+- Clarification and scoping are skipped; each brief goes straight to the
+  supervisor, then notes consolidation and final report generation
+- All supervisor turns, sub-agents and provider calls of all jobs share the
+  process-wide priority schedulers (see scheduler.py), so the batch cannot
+  oversubscribe the providers and earlier jobs finish first. Jobs run in the
+  "bulk" priority class unless the batch's config sets another, so interactive
+  runs are served ahead of them
+- Search results and webpage summaries are cached and deduplicated across jobs
+  (see search_cache.py), even when SEARCH_CACHE is off, so overlapping briefs
+  pay for each query and each page summary once
+- Results stream per job as soon as each report is written
+
+The batch is available as the `research_batch` graph (input: `briefs`; stream
+with stream_mode="updates" to receive each job's report as it finishes), as the
+`run_batch` async iterator, and from the command line:
+
+    python -m deep_research_from_scratch.batch briefs.txt > reports.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import operator
+import sys
+import time
+from typing import AsyncIterator
+
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import ensure_config
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Send
+from typing_extensions import Annotated, TypedDict
+
+from deep_research_from_scratch.metrics import metrics
+from deep_research_from_scratch.multi_agent_supervisor import supervisor_agent
+from deep_research_from_scratch.research_agent_full import (
+    consolidate_notes,
+    final_report_generation,
+)
+from deep_research_from_scratch.scheduler import PRIORITY_CLASSES, run_priority
+from deep_research_from_scratch.search_cache import shared_caches
+from deep_research_from_scratch.state_scope import AgentState
+
+logger = logging.getLogger(__name__)
+
+# ===== STATE DEFINITIONS =====
+
+class BatchInputState(TypedDict):
+    """Input state for a batch - the research briefs to run."""
+    briefs: list[str]
+
+class BatchState(BatchInputState):
+    """State of a batch run; reports are appended as jobs finish."""
+    reports: Annotated[list[dict], operator.add]
+
+class BatchJob(TypedDict):
+    """A single job of a batch, sent to the job node."""
+    job_id: int
+    brief: str
+
+# ===== JOB PIPELINE =====
+
+# Brief -> supervisor -> consolidation -> report, without clarification or scoping
+job_builder = StateGraph(AgentState)
+job_builder.add_node("supervisor_subgraph", supervisor_agent)
+job_builder.add_node("consolidate_notes", consolidate_notes)
+job_builder.add_node("final_report_generation", final_report_generation)
+job_builder.add_edge(START, "supervisor_subgraph")
+job_builder.add_edge("supervisor_subgraph", "consolidate_notes")
+job_builder.add_edge("consolidate_notes", "final_report_generation")
+job_builder.add_edge("final_report_generation", END)
+
+# Jobs run with their own thread_id, so they are not checkpointed into the batch thread
+job_pipeline = job_builder.compile(checkpointer=False)
+
+def job_config(job_id: int, config: RunnableConfig | None = None) -> RunnableConfig:
+    """Build the config of one job from the batch's run config.
+
+    Each job gets its own thread_id (so run-scoped state such as the source
+    registry is not shared between jobs) and inherits the batch's priority
+    class, "bulk" by default.
+    """
+    config = ensure_config(config)
+    batch_thread = config.get("configurable", {}).get("thread_id", "batch")
+    return {
+        "run_name": f"batch_job_{job_id}",
+        "configurable": {"thread_id": f"{batch_thread}:job-{job_id}", "priority": run_priority(config, default="bulk")},
+    }
+
+async def run_job(job_id: int, brief: str, config: RunnableConfig | None = None) -> dict:
+    """Run one brief through the job pipeline with shared caches.
+
+    Returns:
+        Job result with the report, or the error if the job failed
+    """
+    token = shared_caches.set(True)
+    started = time.monotonic()
+    try:
+        result = await job_pipeline.ainvoke(
+            {
+                "research_brief": brief,
+                "supervisor_messages": [HumanMessage(content=f"{brief}.")],
+            },
+            config=job_config(job_id, config),
+        )
+        metrics.inc("batch_jobs_total", outcome="completed")
+        return {
+            "job_id": job_id,
+            "brief": brief,
+            "report": result.get("final_report", ""),
+            "seconds": round(time.monotonic() - started, 1),
+        }
+    except Exception as e:
+        # One failed job must not fail the rest of the batch
+        metrics.inc("batch_jobs_total", outcome="failed")
+        return {
+            "job_id": job_id,
+            "brief": brief,
+            "error": f"{type(e).__name__}: {e}",
+            "seconds": round(time.monotonic() - started, 1),
+        }
+    finally:
+        shared_caches.reset(token)
+
+# ===== BATCH GRAPH =====
+
+def dispatch_jobs(state: BatchState):
+    """Fan the briefs out to one job node each."""
+    return [Send("research_job", {"job_id": i, "brief": brief}) for i, brief in enumerate(state["briefs"])]
+
+async def research_job(job: BatchJob):
+    """Run one brief of the batch to a final report.
+
+    Each job's update streams as soon as it finishes.
+    """
+    return {"reports": [await run_job(job["job_id"], job["brief"])]}
+
+batch_builder = StateGraph(BatchState, input_schema=BatchInputState)
+batch_builder.add_node("research_job", research_job)
+batch_builder.add_conditional_edges(START, dispatch_jobs, ["research_job"])
+batch_builder.add_edge("research_job", END)
+
+research_batch = batch_builder.compile()
+
+# ===== PROGRAMMATIC API =====
+
+async def run_batch(briefs: list[str], config: RunnableConfig | None = None) -> AsyncIterator[dict]:
+    """Run a batch of briefs and yield each job's result as soon as it finishes.
+
+    Args:
+        briefs: Research briefs to run
+        config: Run config; its thread_id prefixes the jobs' thread_ids and its
+            `configurable.priority` class applies to every job ("bulk" by default)
+
+    Yields:
+        Job results (job_id, brief, report or error, seconds) in completion order
+    """
+    config = config or {"configurable": {"thread_id": f"batch-{int(time.time())}"}}
+    tasks = [asyncio.ensure_future(run_job(i, brief, config)) for i, brief in enumerate(briefs)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Abandoning the iterator cancels the rest of the batch
+        for task in tasks:
+            task.cancel()
+
+async def main(path: str, priority: str) -> None:
+    """Run the briefs in a file (one per line) and write one JSON result per line to stdout."""
+    with open(path, encoding="utf-8") as f:
+        briefs = [line.strip() for line in f if line.strip()]
+    config = {"configurable": {"thread_id": f"batch-{int(time.time())}", "priority": priority}}
+    async for result in run_batch(briefs, config):
+        sys.stdout.write(json.dumps(result, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+        logger.info("Job %s finished in %ss", result["job_id"], result["seconds"])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a batch of research briefs")
+    parser.add_argument("briefs", help="File with one research brief per line")
+    parser.add_argument("--priority", choices=PRIORITY_CLASSES, default="bulk", help="Priority class of the jobs")
+    args = parser.parse_args()
+    # Progress goes to stderr, so stdout carries only the JSON results
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args.briefs, args.priority))
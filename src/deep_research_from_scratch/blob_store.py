@@ -0,0 +1,148 @@
+"""Content-Addressed Blob Store for Large Research Payloads.
+
+Raw page summaries and tool outputs are otherwise copied into researcher messages,
+raw notes and every checkpoint written along the way. This module stores those
+payloads once, keyed by their SHA-256 digest, so graph state only carries short
+references. References are resolved lazily by the nodes that actually need the
+text (the researcher model calls, compression and report writing).
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Sequence
+
+from langchain_core.messages import BaseMessage, ToolMessage
+
+# ===== CONFIGURATION =====
+
+# Externalization is opt-in; state keeps inline strings unless enabled
+externalize_blobs = os.environ.get("EXTERNALIZE_BLOBS", "false").lower() == "true"
+
+# Local directory for blobs. The default lives inside the LangGraph API directory,
+# which is the persistent checkpoint volume in the Docker compose setup.
+blob_store_dir = Path(os.environ.get("BLOB_STORE_DIR", ".langgraph_api/blobs"))
+
+# Payloads smaller than this are kept inline since a reference would not save much
+blob_min_size = int(os.environ.get("BLOB_MIN_SIZE", "2048"))
+
+BLOB_REF_PREFIX = "blob://sha256/"
+BLOB_REF_PATTERN = re.compile(re.escape(BLOB_REF_PREFIX) + r"([0-9a-f]{64})")
+
+# ===== BLOB STORE =====
+
+class LocalBlobStore:
+    """Blob store backed by a sharded directory of zlib-compressed files."""
+
+    def __init__(self, root: Path):
+        """Create a store rooted at the given directory."""
+        self.root = Path(root)
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def put(self, data: bytes) -> str:
+        """Store bytes and return their hex digest.
+
+        Existing blobs are not rewritten; their modification time is refreshed
+        so that `sweep` treats them as freshly written.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if path.exists():
+            os.utime(path)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temp file and rename so readers never see partial blobs
+            with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as tmp:
+                tmp.write(zlib.compress(data))
+            os.replace(tmp.name, path)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        """Load the bytes stored under a hex digest."""
+        return zlib.decompress(self._path(digest).read_bytes())
+
+    def exists(self, digest: str) -> bool:
+        """Check whether a blob is present."""
+        return self._path(digest).exists()
+
+    def sweep(self, referenced: set[str], min_age_seconds: float) -> int:
+        """Delete blobs that no surviving state references (the sweep of a mark-and-sweep).
+
+        Args:
+            referenced: Digests still referenced, collected by the caller
+            min_age_seconds: Blobs written more recently are kept, since a running
+                step may reference them before its checkpoint is saved
+
+        Returns:
+            Number of blobs deleted
+        """
+        if not self.root.exists():
+            return 0
+        cutoff = time.time() - min_age_seconds
+        deleted = 0
+        for path in self.root.glob("*/*"):
+            if path.name not in referenced and path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                deleted += 1
+        return deleted
+
+_store: LocalBlobStore | None = None
+
+def get_blob_store() -> LocalBlobStore:
+    """Get or initialize the process-wide blob store lazily."""
+    global _store
+    if _store is None:
+        _store = LocalBlobStore(blob_store_dir)
+    return _store
+
+# ===== REFERENCE HELPERS =====
+
+def is_blob_ref(value: Any) -> bool:
+    """Check whether a value is a blob reference string."""
+    return isinstance(value, str) and value.startswith(BLOB_REF_PREFIX)
+
+def externalize(text: str, min_size: int | None = None) -> str:
+    """Store large text in the blob store and return a reference to it.
+
+    Args:
+        text: Text payload to externalize
+        min_size: Minimum size to externalize; defaults to BLOB_MIN_SIZE
+
+    Returns:
+        A blob reference, or the original text if externalization is disabled
+        or the payload is small
+    """
+    threshold = blob_min_size if min_size is None else min_size
+    if not externalize_blobs or not isinstance(text, str) or len(text) < threshold or is_blob_ref(text):
+        return text
+    return BLOB_REF_PREFIX + get_blob_store().put(text.encode("utf-8"))
+
+def find_blob_refs(text: str) -> set[str]:
+    """Return the digests of all blob references in a text (e.g. serialized state)."""
+    return set(BLOB_REF_PATTERN.findall(text))
+
+def load_text(value: Any) -> Any:
+    """Resolve a blob reference to its text; other values pass through unchanged."""
+    if not is_blob_ref(value):
+        return value
+    return get_blob_store().get(value[len(BLOB_REF_PREFIX):]).decode("utf-8")
+
+def externalize_tool_messages(messages: Sequence[BaseMessage]) -> list[BaseMessage]:
+    """Replace large ToolMessage contents with blob references."""
+    return [
+        m.model_copy(update={"content": externalize(m.content)}) if isinstance(m, ToolMessage) else m
+        for m in messages
+    ]
+
+def hydrate_messages(messages: Sequence[BaseMessage]) -> list[BaseMessage]:
+    """Resolve blob references in ToolMessage contents before a model call."""
+    return [
+        m.model_copy(update={"content": load_text(m.content)}) if is_blob_ref(m.content) else m
+        for m in messages
+    ]
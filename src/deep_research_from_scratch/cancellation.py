@@ -0,0 +1,59 @@
+"""Cooperative Cancellation for Delegated Research.
+
+When a run is cancelled (for example, the user abandons a thread in the chat
+UI), LangGraph cancels the task running the current node. For that to stop the
+work a run has started, every layer must be cancellable:
+- Researcher nodes, search tools, summarization and provider requests are async,
+  so cancellation reaches in-flight HTTP requests instead of leaving them
+  running in worker threads
+- Sub-agents are gathered with `gather_cancellable`, which cancels every
+  sibling (on cancellation or on the first failure) and waits a bounded grace
+  period for their cleanup before re-raising
+- Researchers hold a scheduler slot while they run (see scheduler.py); the
+  slot is released in a finally block, so cancelled runs free capacity
+  immediately
+"""
+
+import asyncio
+import logging
+import os
+from typing import Awaitable, Iterable
+
+from deep_research_from_scratch.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURATION =====
+
+# Seconds to wait for cancelled sub-tasks to finish their cleanup
+cancel_grace_seconds = float(os.environ.get("CANCEL_GRACE_SECONDS", "5"))
+
+# ===== CANCELLATION =====
+
+async def gather_cancellable(aws: Iterable[Awaitable], grace_seconds: float = cancel_grace_seconds) -> list:
+    """Run awaitables concurrently and cancel all of them if any fails or the caller is cancelled.
+
+    Args:
+        aws: Awaitables to run
+        grace_seconds: Time to wait for cancelled tasks to finish their cleanup
+
+    Returns:
+        Results in the order of the awaitables
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException as e:
+        # gather only cancels the others when it is cancelled itself, not when one task fails
+        unfinished = [task for task in tasks if not task.done()]
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            _, pending = await asyncio.wait(unfinished, timeout=grace_seconds)
+            if pending:
+                logger.warning("%d of %d cancelled tasks did not finish within %.1fs", len(pending), len(unfinished), grace_seconds)
+        cancelled = sum(task.cancelled() for task in tasks)
+        if cancelled:
+            reason = "cancelled" if isinstance(e, asyncio.CancelledError) else "failed"
+            metrics.inc("subtasks_cancelled_total", cancelled, reason=reason)
+        raise
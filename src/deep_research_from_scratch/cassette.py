@@ -0,0 +1,391 @@
+"""Record/Replay Cassettes for Graph Runs.
+
+Slow production runs cannot be reproduced: search results and model outputs
+change from one run to the next. In record mode every external call a run makes
+is captured, with its timing, in a compact cassette on disk (gzip-compressed
+JSON lines, one file per run). In replay mode the same graph runs against the
+cassette instead of the providers, fully offline and deterministically, with
+the original latencies or with zero latency:
+- Model calls are captured through LangChain's LLM cache hook, so every chat
+  model in the process is covered without wrapping each one
+- Search and extract calls are captured by wrapping the search provider
+- MCP tool calls are captured in the MCP researcher's tool node
+
+Cassettes are named after the run's thread_id (or `configurable.cassette`).
+Replayed calls are matched by request content first; when a request differs
+from the recording (e.g. a prompt contains today's date), the next unused
+recording from the same call site is used. A call with no recording left
+raises `CassetteMiss`.
+
+Record with CASSETTE_MODE=record on the server, or from the command line:
+
+    python -m deep_research_from_scratch.cassette record NAME --input input.json
+    python -m deep_research_from_scratch.cassette replay NAME --latency zero
+    python -m deep_research_from_scratch.cassette show NAME
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import importlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import warnings
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.caches import BaseCache
+from langchain_core.globals import set_llm_cache
+from langchain_core.load import dumpd, load
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import ensure_config
+
+from deep_research_from_scratch.search_providers import SearchProvider
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURATION =====
+
+# "off" (default), "record" or "replay"
+cassette_mode = os.environ.get("CASSETTE_MODE", "off").lower()
+
+# Directory holding one cassette file per run
+cassette_dir = Path(os.environ.get("CASSETTE_DIR", ".langgraph_api/cassettes"))
+
+# Replay latency: "original" sleeps for each call's recorded duration, "zero" does not
+cassette_latency = os.environ.get("CASSETTE_LATENCY", "original").lower()
+
+# Graphs that can be recorded and replayed from the command line (see langgraph.json)
+GRAPHS = {
+    "scope_research": "deep_research_from_scratch.research_agent_scope:scope_research",
+    "research_agent": "deep_research_from_scratch.research_agent:researcher_agent",
+    "research_agent_mcp": "deep_research_from_scratch.research_agent_mcp:agent_mcp",
+    "research_agent_supervisor": "deep_research_from_scratch.multi_agent_supervisor:supervisor_agent",
+    "research_agent_full": "deep_research_from_scratch.research_agent_full:agent",
+    "research_batch": "deep_research_from_scratch.batch:research_batch",
+}
+
+# Classes a recorded model response may deserialize to
+MODEL_RESPONSE_CLASSES = [ChatGeneration, Generation, AIMessage]
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when a call has no matching recording."""
+
+# ===== CASSETTES =====
+
+def request_key(request: Any) -> str:
+    """Hash a request for matching on replay."""
+    payload = json.dumps(request, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+def cassette_name(config: RunnableConfig | None = None) -> str:
+    """Return the cassette name of the current run (`configurable.cassette` or thread_id)."""
+    configurable = ensure_config(config).get("configurable", {})
+    name = str(configurable.get("cassette") or configurable.get("thread_id") or "default")
+    return re.sub(r"[^\w.-]", "_", name)
+
+class Cassette:
+    """The recorded calls of one run, appended to or consumed from one file."""
+
+    def __init__(self, path: Path):
+        """Create an empty cassette stored at `path`."""
+        self.path = path
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._by_key: dict[tuple, deque] = defaultdict(deque)
+        self._by_site: dict[tuple, deque] = defaultdict(deque)
+        self._used: set[int] = set()
+        self.meta: dict = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "Cassette":
+        """Load a recorded cassette for replay."""
+        cassette = cls(path)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for index, line in enumerate(f):
+                entry = json.loads(line)
+                if entry["kind"] == "meta":
+                    cassette.meta = entry
+                    continue
+                entry["index"] = index
+                cassette._by_key[(entry["kind"], entry["key"])].append(entry)
+                cassette._by_site[(entry["kind"], entry["site"])].append(entry)
+        logger.info("Replaying %d recorded calls from %s", sum(map(len, cassette._by_key.values())), path)
+        return cassette
+
+    def append(self, entry: dict) -> None:
+        """Append one entry; each append is its own gzip member, so partial runs stay readable."""
+        entry = {**entry, "offset": round(time.monotonic() - self.started, 3)}
+        line = json.dumps(entry, default=str, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(line)
+
+    def take(self, kind: str, site: str, key: str) -> dict:
+        """Consume the recording for a call: same request first, else next from the same site."""
+        with self._lock:
+            for queue in (self._by_key[(kind, key)], self._by_site[(kind, site)]):
+                while queue and queue[0]["index"] in self._used:
+                    queue.popleft()
+                if queue:
+                    entry = queue.popleft()
+                    self._used.add(entry["index"])
+                    return entry
+        raise CassetteMiss(f"No recorded {kind} call left for {site} in {self.path}")
+
+_cassettes: dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+def get_cassette(config: RunnableConfig | None = None) -> Cassette:
+    """Get the cassette of the current run, loading it on first use in replay mode."""
+    name = cassette_name(config)
+    with _cassettes_lock:
+        if name not in _cassettes:
+            path = cassette_dir / f"{name}.jsonl.gz"
+            _cassettes[name] = Cassette.load(path) if cassette_mode == "replay" else Cassette(path)
+        return _cassettes[name]
+
+# ===== INTERCEPTION =====
+
+def _replay_result(entry: dict, decode: Callable[[Any], Any]) -> Any:
+    if "error" in entry:
+        raise RuntimeError(f"Replayed error: {entry['error']}")
+    return decode(entry["response"])
+
+async def intercept(
+    kind: str,
+    site: str,
+    request: Any,
+    call: Callable[[], Awaitable],
+    encode: Callable[[Any], Any] = lambda value: value,
+    decode: Callable[[Any], Any] = lambda value: value,
+) -> Any:
+    """Record or replay one external async call.
+
+    Args:
+        kind: Kind of call ("search", "extract", "tool" or "model")
+        site: Call site within the kind, used to match recordings on replay
+        request: JSON-serializable request, used to match recordings on replay
+        call: Makes the real call (not awaited in replay mode)
+        encode: Converts the response to JSON-serializable form for recording
+        decode: Converts a recorded response back
+    """
+    if cassette_mode == "replay":
+        entry = get_cassette().take(kind, site, request_key(request))
+        if cassette_latency == "original":
+            await asyncio.sleep(entry["seconds"])
+        return _replay_result(entry, decode)
+    if cassette_mode != "record":
+        return await call()
+
+    started = time.monotonic()
+    record = {"kind": kind, "site": site, "key": request_key(request)}
+    try:
+        response = await call()
+    except Exception as e:
+        get_cassette().append({**record, "seconds": round(time.monotonic() - started, 3), "error": f"{type(e).__name__}: {e}"})
+        raise
+    get_cassette().append({**record, "seconds": round(time.monotonic() - started, 3), "response": encode(response)})
+    return response
+
+def intercept_sync(kind: str, site: str, request: Any, call: Callable[[], Any]) -> Any:
+    """Record or replay one external sync call (never sleeps on replay)."""
+    if cassette_mode == "replay":
+        return _replay_result(get_cassette().take(kind, site, request_key(request)), lambda value: value)
+    if cassette_mode != "record":
+        return call()
+    started = time.monotonic()
+    record = {"kind": kind, "site": site, "key": request_key(request)}
+    try:
+        response = call()
+    except Exception as e:
+        get_cassette().append({**record, "seconds": round(time.monotonic() - started, 3), "error": f"{type(e).__name__}: {e}"})
+        raise
+    get_cassette().append({**record, "seconds": round(time.monotonic() - started, 3), "response": response})
+    return response
+
+class CassetteSearchProvider(SearchProvider):
+    """Search provider wrapper that records or replays every search and extract."""
+
+    def __init__(self, provider: SearchProvider):
+        """Wrap `provider`, whose calls are recorded or replayed."""
+        self.provider = provider
+
+    def search(self, query: str, max_results: int = 3, include_raw_content: bool = True, topic: str = "general") -> dict:
+        """Record or replay a search."""
+        request = [query, max_results, include_raw_content, topic]
+        return intercept_sync("search", "search", request, lambda: self.provider.search(*request))
+
+    def extract(self, urls: list[str]) -> dict:
+        """Record or replay an extract."""
+        return intercept_sync("extract", "extract", urls, lambda: self.provider.extract(urls))
+
+    async def asearch(self, query: str, max_results: int = 3, include_raw_content: bool = True, topic: str = "general") -> dict:
+        """Record or replay an async search."""
+        request = [query, max_results, include_raw_content, topic]
+        return await intercept("search", "search", request, lambda: self.provider.asearch(*request))
+
+    async def aextract(self, urls: list[str]) -> dict:
+        """Record or replay an async extract."""
+        return await intercept("extract", "extract", urls, lambda: self.provider.aextract(urls))
+
+def with_cassette(provider: SearchProvider) -> SearchProvider:
+    """Wrap a search provider for recording or replay when a cassette mode is active."""
+    return CassetteSearchProvider(provider) if cassette_mode in ("record", "replay") else provider
+
+def load_generations(response: list) -> list:
+    """Deserialize recorded model generations."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", LangChainBetaWarning)
+        return load(response, allowed_objects=MODEL_RESPONSE_CLASSES)
+
+class CassetteLLMCache(BaseCache):
+    """LLM cache hook that records model calls (record mode) or serves them (replay mode).
+
+    The model's llm_string (model name, parameters and bound tools) is the call
+    site; the serialized prompt is the request.
+    """
+
+    def __init__(self):
+        """Create a hook with no model calls in flight."""
+        self._started: dict[tuple, float] = {}
+
+    @staticmethod
+    def _site(llm_string: str) -> str:
+        return hashlib.sha256(llm_string.encode("utf-8")).hexdigest()[:16]
+
+    def _call_id(self, prompt: str, llm_string: str) -> tuple:
+        try:
+            task = id(asyncio.current_task())
+        except RuntimeError:
+            task = threading.get_ident()
+        return (request_key(prompt), llm_string, task)
+
+    def lookup(self, prompt: str, llm_string: str) -> list | None:
+        """Serve a recorded response on replay; otherwise note the call's start and miss."""
+        if cassette_mode == "replay":
+            entry = get_cassette().take("model", self._site(llm_string), request_key(prompt))
+            return _replay_result(entry, load_generations)
+        self._started[self._call_id(prompt, llm_string)] = time.monotonic()
+        return None
+
+    async def alookup(self, prompt: str, llm_string: str) -> list | None:
+        """Async `lookup`, sleeping for the recorded latency on replay if configured."""
+        if cassette_mode == "replay":
+            entry = get_cassette().take("model", self._site(llm_string), request_key(prompt))
+            if cassette_latency == "original":
+                await asyncio.sleep(entry["seconds"])
+            return _replay_result(entry, load_generations)
+        return self.lookup(prompt, llm_string)
+
+    def update(self, prompt: str, llm_string: str, return_val: list) -> None:
+        """Record a model call's response and duration in record mode."""
+        if cassette_mode != "record":
+            return
+        started = self._started.pop(self._call_id(prompt, llm_string), None)
+        seconds = round(time.monotonic() - started, 3) if started else 0.0
+        get_cassette().append({
+            "kind": "model",
+            "site": self._site(llm_string),
+            "key": request_key(prompt),
+            "seconds": seconds,
+            "response": dumpd(return_val),
+        })
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: list) -> None:
+        """Async `update`."""
+        self.update(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        """Forget the start times of model calls in flight."""
+        self._started.clear()
+
+def configure(mode: str, latency: str = cassette_latency) -> None:
+    """Set the cassette mode and install the model hook.
+
+    Must run before the graph modules are imported, since the search provider
+    is wrapped at import time.
+    """
+    global cassette_mode, cassette_latency
+    cassette_mode, cassette_latency = mode, latency
+    if mode in ("record", "replay"):
+        set_llm_cache(CassetteLLMCache())
+
+if cassette_mode in ("record", "replay"):
+    configure(cassette_mode)
+
+# ===== COMMAND LINE =====
+
+def load_graph(name: str):
+    """Import a graph by its langgraph.json name."""
+    module_name, attribute = GRAPHS[name].split(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+async def run_cassette(mode: str, name: str, graph_name: str | None, input_path: str | None, latency: str) -> Any:
+    """Record or replay one graph run from the command line and return the graph's output."""
+    configure(mode, latency)
+    meta = {}
+    if mode == "replay":
+        meta = get_cassette({"configurable": {"cassette": name}}).meta
+    graph_name = graph_name or meta.get("graph", "research_agent_full")
+    if input_path:
+        with open(input_path, encoding="utf-8") as f:
+            graph_input = json.load(f)
+    elif "input" in meta:
+        graph_input = meta["input"]
+    else:
+        raise SystemExit("--input is required (the cassette has no recorded input)")
+    if mode == "record":
+        get_cassette({"configurable": {"cassette": name}}).append({"kind": "meta", "graph": graph_name, "input": graph_input})
+
+    graph = load_graph(graph_name)
+    started = time.monotonic()
+    result = await graph.ainvoke(graph_input, config={"configurable": {"thread_id": name, "cassette": name}})
+    logger.info("%s of %s finished in %.1fs", mode.capitalize(), graph_name, time.monotonic() - started)
+    return result
+
+def show_cassette(name: str) -> str:
+    """Return a table of per-kind call counts and recorded latency of a cassette."""
+    path = cassette_dir / f"{name}.jsonl.gz"
+    totals = defaultdict(lambda: [0, 0.0])
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry["kind"] != "meta":
+                totals[entry["kind"]][0] += 1
+                totals[entry["kind"]][1] += entry["seconds"]
+    return "".join(f"{kind:8} {count:5d} calls {seconds:9.1f}s recorded\n" for kind, (count, seconds) in sorted(totals.items()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record and replay graph runs")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    for command in ("record", "replay"):
+        sub = subcommands.add_parser(command)
+        sub.add_argument("name", help="Cassette name (also used as the run's thread_id)")
+        sub.add_argument("--graph", choices=sorted(GRAPHS), help="Graph to run (default: the recorded one, or research_agent_full)")
+        sub.add_argument("--input", help="JSON file with the graph input (default: the recorded input)")
+        sub.add_argument("--latency", choices=("original", "zero"), default=cassette_latency, help="Replay latency")
+    show = subcommands.add_parser("show")
+    show.add_argument("name")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    # Run through the package module, so the graphs see the configured mode
+    from deep_research_from_scratch import cassette
+    if args.command == "show":
+        sys.stdout.write(cassette.show_cassette(args.name))
+    else:
+        result = asyncio.run(cassette.run_cassette(args.command, args.name, args.graph, args.input, args.latency))
+        if isinstance(result, dict) and result.get("final_report"):
+            sys.stdout.write(result["final_report"] + "\n")
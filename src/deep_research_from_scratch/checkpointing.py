@@ -0,0 +1,162 @@
+"""Checkpoint Compaction for the LangGraph Server.
+
+Long supervisor runs leave large message histories in every checkpoint of their
+thread, and with EXTERNALIZE_BLOBS their payloads also live in the blob store
+(see blob_store.py). Nothing removes either once a thread is done, so this
+module ships a compaction job that:
+1. Prunes finished threads (idle, error or interrupted) whose last update is
+   older than the retention window, along with their persisted source registries
+   (see source_registry.py); busy threads are never touched
+2. Garbage-collects the blob store by mark-and-sweep: every blob referenced by a
+   checkpoint of a surviving thread is marked, all other blobs are deleted
+
+Compaction runs inside the server every CHECKPOINT_COMPACTION_INTERVAL_HOURS
+(started by the lifespan of metrics_app.py), or from cron against a server:
+    python -m deep_research_from_scratch.checkpointing --url http://127.0.0.1:2024
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from datetime import UTC, datetime, timedelta
+
+from deep_research_from_scratch.blob_store import (
+    LocalBlobStore,
+    find_blob_refs,
+    get_blob_store,
+)
+from deep_research_from_scratch.source_registry import registry_store
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURATION =====
+
+# Finished threads idle for longer than this are pruned by the compaction job
+thread_max_age_hours = float(os.environ.get("CHECKPOINT_THREAD_MAX_AGE_HOURS", "168"))
+
+# Unreferenced blobs younger than this are kept: a running step may have written
+# them before the checkpoint that references them is saved
+blob_min_age_hours = float(os.environ.get("BLOB_SWEEP_MIN_AGE_HOURS", "1"))
+
+# Thread statuses that mark a thread as finished
+FINISHED_STATUSES = ("idle", "error", "interrupted")
+
+# Hours between compactions run by the server itself; 0 leaves compaction to cron
+compaction_interval_hours = float(os.environ.get("CHECKPOINT_COMPACTION_INTERVAL_HOURS", "0"))
+
+# Page size for thread searches and state histories
+PAGE_SIZE = 100
+
+# ===== COMPACTION =====
+
+def _updated_at(thread: dict) -> datetime:
+    updated_at = thread["updated_at"]
+    if isinstance(updated_at, str):
+        updated_at = datetime.fromisoformat(updated_at.replace("Z", "+00:00"))
+    return updated_at
+
+async def prune_finished_threads(client, max_age_hours: float = thread_max_age_hours) -> int:
+    """Delete finished threads whose last update is older than the retention window, and their source registries.
+
+    Args:
+        client: LangGraph SDK client of the server
+        max_age_hours: Retention window for finished threads
+
+    Returns:
+        Number of threads deleted
+    """
+    cutoff = datetime.now(UTC) - timedelta(hours=max_age_hours)
+    deleted = 0
+    for status in FINISHED_STATUSES:
+        offset = 0
+        while True:
+            threads = await client.threads.search(status=status, limit=PAGE_SIZE, offset=offset)
+            if not threads:
+                break
+            for thread in threads:
+                if _updated_at(thread) < cutoff:
+                    await client.threads.delete(thread["thread_id"])
+                    await asyncio.to_thread(registry_store.delete_thread, str(thread["thread_id"]))
+                    deleted += 1
+                else:
+                    offset += 1
+    return deleted
+
+async def mark_referenced_blobs(client) -> set[str]:
+    """Collect the digests of all blobs referenced by the checkpoints of every thread.
+
+    Walks each thread's full state history and its current state including
+    subgraphs, so researchers of busy or interrupted runs keep their blobs.
+
+    Args:
+        client: LangGraph SDK client of the server
+
+    Returns:
+        Digests of referenced blobs
+    """
+    referenced: set[str] = set()
+    offset = 0
+    while True:
+        threads = await client.threads.search(limit=PAGE_SIZE, offset=offset)
+        if not threads:
+            break
+        offset += len(threads)
+        for thread in threads:
+            thread_id = thread["thread_id"]
+            states = [await client.threads.get_state(thread_id, subgraphs=True)]
+            before = None
+            while True:
+                history = await client.threads.get_history(thread_id, limit=PAGE_SIZE, before=before)
+                states.extend(history)
+                if len(history) < PAGE_SIZE:
+                    break
+                before = history[-1]["checkpoint"]
+            for state in states:
+                referenced |= find_blob_refs(json.dumps(state, default=str))
+    return referenced
+
+async def sweep_unreferenced_blobs(client, store: LocalBlobStore | None = None, min_age_hours: float = blob_min_age_hours) -> int:
+    """Delete blobs that no checkpoint of a surviving thread references.
+
+    Args:
+        client: LangGraph SDK client of the server
+        store: Blob store to sweep; defaults to the process-wide store
+        min_age_hours: Unreferenced blobs written more recently are kept
+
+    Returns:
+        Number of blobs deleted
+    """
+    store = store or get_blob_store()
+    referenced = await mark_referenced_blobs(client)
+    return await asyncio.to_thread(store.sweep, referenced, min_age_hours * 3600)
+
+async def compact(url: str | None = None, max_age_hours: float = thread_max_age_hours) -> None:
+    """Prune finished threads, then garbage-collect the blobs they referenced.
+
+    Without a URL the client connects to the server it runs in.
+    """
+    from langgraph_sdk import get_client
+
+    client = get_client(url=url)
+    threads = await prune_finished_threads(client, max_age_hours)
+    blobs = await sweep_unreferenced_blobs(client)
+    logger.info("Checkpoint compaction pruned %d threads and %d blobs", threads, blobs)
+
+async def run_periodic_compaction(interval_hours: float = compaction_interval_hours) -> None:
+    """Compact the server's threads and blob store every interval until cancelled."""
+    while True:
+        await asyncio.sleep(interval_hours * 3600)
+        try:
+            await compact()
+        except Exception:
+            logger.exception("Checkpoint compaction failed; retrying at the next interval")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prune finished threads and unreferenced blobs.")
+    parser.add_argument("--url", default="http://127.0.0.1:2024", help="LangGraph server URL")
+    parser.add_argument("--max-age-hours", type=float, default=thread_max_age_hours, help="Retention for finished threads")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(compact(args.url, args.max_age_hours))
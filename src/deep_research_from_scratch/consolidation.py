@@ -0,0 +1,220 @@
+"""Notes Consolidation before Final Report Generation.
+
+Sub-agents research overlapping sub-topics, so their compressed notes repeat
+the same facts and cite the same pages under different local numbers. Pasting
+them verbatim inflates the writer prompt, the largest single call in the
+system. This stage builds a compact evidence set without a model call:
+1. Every note's sources section is parsed and its URLs are merged into one
+   global source table; local citation numbers are rewritten to global ones,
+   and citations of numbers missing from the note's sources are dropped
+2. Sentences are deduplicated across notes, exactly (normalized hash) and by
+   token-set similarity, and each kept sentence counts how often it was repeated
+3. If the evidence still exceeds the token budget, the least supported
+   sentences are dropped, and sources no longer cited leave the table
+"""
+
+import hashlib
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+
+from deep_research_from_scratch.prompt_cache import estimate_tokens
+from deep_research_from_scratch.ranking import tokenize
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURATION =====
+
+# Consolidation is opt-in; without it the writer receives the notes verbatim
+consolidate_notes_enabled = os.environ.get("CONSOLIDATE_NOTES", "false").lower() == "true"
+
+# Token budget for the consolidated evidence, including the source table
+consolidation_token_budget = int(os.environ.get("CONSOLIDATION_TOKEN_BUDGET", "24000"))
+
+# Sentences whose token sets overlap at least this much are treated as duplicates
+similarity_threshold = 0.8
+
+# Sentences shorter than this (in tokens) are never treated as duplicates
+min_dedupe_tokens = 5
+
+URL_PATTERN = re.compile(r"https?://[^\s<>\"')\]]+")
+SOURCE_LINE_PATTERN = re.compile(r"^\s*[-*]?\s*\[?(\d+)[\].):]\s*(.*)$")
+SOURCES_HEADING_PATTERN = re.compile(r"^[\s#*_]*(sources|references|list of all relevant sources.*)[\s:*_]*$", re.IGNORECASE)
+CITATION_PATTERN = re.compile(r"\[(\d+(?:\s*,\s*\d+)*)\]")
+# A citation with the whitespace before it, removed along with citations that map to no source
+SPACED_CITATION_PATTERN = re.compile(r"(\s*)\[(\d+(?:\s*,\s*\d+)*)\]")
+# A sentence ends at terminal punctuation (plus any citations after it) followed by whitespace
+SENTENCE_PATTERN = re.compile(r"\S.*?(?:[.!?]+(?:\s*\[\d+(?:\s*,\s*\d+)*\])*(?=\s|$)|$)")
+
+# ===== DATA STRUCTURES =====
+
+@dataclass
+class Source:
+    """An entry of the global source table."""
+    number: int
+    url: str
+    title: str
+
+@dataclass
+class Evidence:
+    """A deduplicated sentence (or heading) of the consolidated notes."""
+    text: str
+    terms: frozenset
+    line: int
+    support: int = 1
+    heading: bool = False
+
+@dataclass
+class ConsolidatedNotes:
+    """Deduplicated evidence with its global source table."""
+    evidence: list[Evidence] = field(default_factory=list)
+    sources: dict[str, Source] = field(default_factory=dict)
+    input_tokens: int = 0
+    dropped_citations: int = 0
+
+    def cited_numbers(self) -> set[int]:
+        """Return the source numbers cited by any evidence item."""
+        numbers = set()
+        for item in self.evidence:
+            for group in CITATION_PATTERN.findall(item.text):
+                numbers.update(int(n) for n in group.split(","))
+        return numbers
+
+    def render(self) -> str:
+        """Render evidence lines followed by the source table of cited sources."""
+        lines, current_line = [], None
+        for item in self.evidence:
+            if item.line == current_line and not item.heading:
+                lines[-1] += " " + item.text
+            else:
+                lines.append(("\n" if item.heading and lines else "") + item.text)
+            current_line = item.line
+
+        cited = self.cited_numbers()
+        table = [f"[{s.number}] {s.title}: {s.url}" for s in sorted(self.sources.values(), key=lambda s: s.number) if s.number in cited]
+        if table:
+            lines += ["", "### Sources", *table]
+        return "\n".join(lines)
+
+# ===== CONSOLIDATION =====
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL for deduplication."""
+    return url.rstrip(".,;:").rstrip("/").lower()
+
+def split_note(note: str) -> tuple[list[str], dict[int, tuple[str, str]]]:
+    """Split a note into body lines and its {local number: (url, title)} source list."""
+    body, local_sources = [], {}
+    in_sources = False
+    for line in note.splitlines():
+        if SOURCES_HEADING_PATTERN.match(line):
+            in_sources = True
+            continue
+        match = SOURCE_LINE_PATTERN.match(line)
+        url_match = URL_PATTERN.search(line)
+        # Outside a sources section, only "[n] Title: URL" lines that end with the URL count
+        if match and url_match and (in_sources or line.rstrip().endswith(url_match.group(0))):
+            title = match.group(2).replace(url_match.group(0), "").strip(" :-–") or url_match.group(0)
+            local_sources[int(match.group(1))] = (url_match.group(0), title)
+            continue
+        if in_sources and not line.strip():
+            continue
+        in_sources = False
+        body.append(line)
+    return body, local_sources
+
+def consolidate_notes_text(notes: list[str], token_budget: int = consolidation_token_budget) -> ConsolidatedNotes:
+    """Merge sub-agent notes into a deduplicated evidence set within a token budget.
+
+    Args:
+        notes: Compressed research notes from the sub-agents
+        token_budget: Maximum estimated tokens of the rendered result
+
+    Returns:
+        Consolidated evidence and global source table
+    """
+    result = ConsolidatedNotes(input_tokens=estimate_tokens("\n".join(notes)))
+    seen_hashes: dict[str, Evidence] = {}
+    line_number = 0
+
+    for note in notes:
+        body, local_sources = split_note(note)
+
+        # Map local citation numbers to global ones, merging sources by URL
+        renumber = {}
+        for local_number, (url, title) in local_sources.items():
+            key = normalize_url(url)
+            if key not in result.sources:
+                result.sources[key] = Source(len(result.sources) + 1, url, title)
+            renumber[local_number] = result.sources[key].number
+
+        # Numbers missing from the note's sources would point at another note's source
+        def rewrite(match: re.Match) -> str:
+            local_numbers = [int(n) for n in match.group(2).split(",")]
+            numbers = [renumber[n] for n in local_numbers if n in renumber]
+            result.dropped_citations += len(local_numbers) - len(numbers)
+            if not numbers:
+                return ""
+            return match.group(1) + "[" + ", ".join(str(n) for n in dict.fromkeys(numbers)) + "]"
+
+        for line in body:
+            line = SPACED_CITATION_PATTERN.sub(rewrite, line).rstrip()
+            if not line.strip():
+                continue
+            line_number += 1
+            is_heading = line.lstrip().startswith("#")
+            for sentence in [line] if is_heading else SENTENCE_PATTERN.findall(line.strip()):
+                tokens = tokenize(CITATION_PATTERN.sub(" ", sentence))
+                digest = hashlib.blake2b(" ".join(tokens).encode("utf-8"), digest_size=8).hexdigest()
+                duplicate = seen_hashes.get(digest)
+                if duplicate is None and not is_heading and len(tokens) >= min_dedupe_tokens:
+                    duplicate = find_similar(result.evidence, frozenset(tokens))
+                if duplicate is not None:
+                    duplicate.support += 1
+                    continue
+                item = Evidence(sentence, frozenset(tokens), line_number, heading=is_heading)
+                seen_hashes[digest] = item
+                result.evidence.append(item)
+
+    enforce_budget(result, token_budget)
+    if result.dropped_citations:
+        logger.warning("Dropped %d citations of sources missing from their note's source list", result.dropped_citations)
+    logger.info(
+        "Consolidated %d notes: %d -> %d estimated tokens, %d sources",
+        len(notes), result.input_tokens, estimate_tokens(result.render()), len(result.cited_numbers()),
+    )
+    return result
+
+def find_similar(evidence: list[Evidence], terms: frozenset) -> Evidence | None:
+    """Return a kept sentence whose token set overlaps enough with `terms`."""
+    for item in evidence:
+        if item.heading or not item.terms:
+            continue
+        overlap = len(terms & item.terms) / len(terms | item.terms)
+        if overlap >= similarity_threshold:
+            return item
+    return None
+
+def enforce_budget(result: ConsolidatedNotes, token_budget: int) -> None:
+    """Drop the least supported sentences until the rendered notes fit the budget."""
+    excess = estimate_tokens(result.render()) - token_budget
+    if excess <= 0:
+        return
+    # Lowest support first; among equals, drop later sentences first
+    candidates = sorted(
+        (item for item in result.evidence if not item.heading),
+        key=lambda item: (item.support, -item.line),
+    )
+    dropped = set()
+    for item in candidates:
+        if excess <= 0:
+            break
+        dropped.add(id(item))
+        excess -= estimate_tokens(item.text)
+    kept = [item for item in result.evidence if id(item) not in dropped]
+    # Drop headings left without content
+    result.evidence = [
+        item for i, item in enumerate(kept)
+        if not item.heading or (i + 1 < len(kept) and not kept[i + 1].heading)
+    ]
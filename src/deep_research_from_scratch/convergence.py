@@ -0,0 +1,166 @@
+"""Convergence Detection for the Supervisor Loop.
+
+After each round of delegated research, the supervisor compares the new
+compressed findings with everything gathered in earlier rounds:
+- Sources: unique URLs cited in the findings, and with the source registry
+  (SOURCE_REGISTRY) the URLs behind the stable IDs they cite, such as [S3]
+- Facts: sentences, compared as sets of word shingles. A sentence is a new fact
+  when its shingle overlap (Jaccard similarity) with every earlier sentence is
+  below CONVERGENCE_FACT_SIMILARITY, so a finding that a later researcher
+  restates in slightly different words is not counted again
+
+When a round adds fewer new sources and a smaller share of new facts than the
+configured thresholds, research has converged. Depending on CONVERGENCE_ACTION
+the supervisor then either ends research or is told that more rounds are unlikely
+to pay off. Every round's gain is logged so the thresholds can be tuned.
+"""
+
+import logging
+import os
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+from deep_research_from_scratch.metrics import metrics
+from deep_research_from_scratch.ranking import tokenize
+from deep_research_from_scratch.source_registry import SOURCE_ID_PATTERN, SourceRegistry
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURATION =====
+
+# What to do once research converges: "off", "advise" (tell the supervisor) or "stop"
+convergence_action = os.environ.get("CONVERGENCE_ACTION", "off")
+
+# A round converges when its share of new facts is below this ratio...
+min_new_fact_ratio = float(os.environ.get("CONVERGENCE_MIN_NEW_FACT_RATIO", "0.2"))
+
+# ...and it cited fewer than this many new sources
+min_new_sources = int(os.environ.get("CONVERGENCE_MIN_NEW_SOURCES", "2"))
+
+# Sentences at least this similar (shingle Jaccard) to an earlier one restate a known fact
+fact_similarity_threshold = float(os.environ.get("CONVERGENCE_FACT_SIMILARITY", "0.5"))
+
+# Sentences with fewer tokens than this are not counted as facts
+min_fact_tokens = 6
+
+# Shingle length in words; short, since facts are single sentences
+FACT_SHINGLE_WORDS = 3
+
+URL_PATTERN = re.compile(r"https?://[^\s<>\"')\]]+")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# ===== EXTRACTION =====
+
+def normalize_source_url(url: str) -> str:
+    """Normalize a URL for counting sources."""
+    return url.rstrip(".,;:").rstrip("/").lower()
+
+def extract_sources(text: str, registry: SourceRegistry | None = None) -> set[str]:
+    """Return the normalized URLs cited in a text, by URL or by registry source ID."""
+    sources = {normalize_source_url(url) for url in URL_PATTERN.findall(text)}
+    if registry is not None:
+        for group in SOURCE_ID_PATTERN.findall(text):
+            for source_id in group.split(","):
+                entry = registry.get(source_id.strip())
+                if entry is not None:
+                    sources.add(normalize_source_url(entry.url))
+    return sources
+
+def extract_facts(text: str) -> set[frozenset]:
+    """Return the sentences of a text as sets of word shingles."""
+    facts = set()
+    for sentence in SENTENCE_PATTERN.split(URL_PATTERN.sub(" ", SOURCE_ID_PATTERN.sub(" ", text))):
+        tokens = tokenize(sentence)
+        if len(tokens) >= min_fact_tokens:
+            facts.add(frozenset(
+                " ".join(tokens[i:i + FACT_SHINGLE_WORDS]) for i in range(len(tokens) - FACT_SHINGLE_WORDS + 1)
+            ))
+    return facts
+
+def count_new_facts(seen_facts: set[frozenset], round_facts: set[frozenset]) -> int:
+    """Count the facts of a round that are not similar to any earlier fact."""
+    seen = list(seen_facts)
+    index = defaultdict(list)
+    for i, fact in enumerate(seen):
+        for shingle in fact:
+            index[shingle].append(i)
+
+    new = 0
+    for fact in round_facts:
+        shared = Counter(i for shingle in fact for i in index.get(shingle, ()))
+        similarity = max((count / (len(fact) + len(seen[i]) - count) for i, count in shared.items()), default=0.0)
+        if similarity < fact_similarity_threshold:
+            new += 1
+    return new
+
+# ===== GAIN MEASUREMENT =====
+
+@dataclass
+class ResearchGain:
+    """Marginal yield of one research round."""
+    new_sources: int
+    total_sources: int
+    new_facts: int
+    round_facts: int
+
+    @property
+    def new_fact_ratio(self) -> float:
+        """Share of this round's facts that were not seen before."""
+        return self.new_facts / self.round_facts if self.round_facts else 0.0
+
+def measure_gain(previous_notes: list[str], new_notes: list[str], registry: SourceRegistry | None = None) -> ResearchGain:
+    """Compare a round's findings with the findings of earlier rounds.
+
+    Args:
+        previous_notes: Compressed research from earlier rounds
+        new_notes: Compressed research from this round
+        registry: The run's source registry, to count sources cited by ID
+
+    Returns:
+        Counts of new and total sources and facts
+    """
+    seen_sources, seen_facts = set(), set()
+    for note in previous_notes:
+        seen_sources |= extract_sources(note, registry)
+        seen_facts |= extract_facts(note)
+
+    round_sources, round_facts = set(), set()
+    for note in new_notes:
+        round_sources |= extract_sources(note, registry)
+        round_facts |= extract_facts(note)
+
+    return ResearchGain(
+        new_sources=len(round_sources - seen_sources),
+        total_sources=len(seen_sources | round_sources),
+        new_facts=count_new_facts(seen_facts, round_facts),
+        round_facts=len(round_facts),
+    )
+
+def has_converged(gain: ResearchGain, first_round: bool) -> bool:
+    """Return True if a round added too little to justify another one.
+
+    A round without any findings (its researchers failed or were declined) says
+    nothing about the remaining gain, so it never counts as converged.
+    """
+    if first_round or not gain.round_facts:
+        return False
+    return gain.new_fact_ratio < min_new_fact_ratio and gain.new_sources < min_new_sources
+
+def record_gain(iteration: int, gain: ResearchGain, converged: bool) -> None:
+    """Log a round's gain and count converged rounds."""
+    logger.info(
+        "Research round %d: %d new sources (%d total), %d/%d new facts (%.0f%%)%s",
+        iteration, gain.new_sources, gain.total_sources, gain.new_facts, gain.round_facts,
+        100 * gain.new_fact_ratio, ", converged" if converged else "",
+    )
+    metrics.inc("research_rounds_total", converged=str(converged).lower())
+
+def convergence_advice(gain: ResearchGain) -> str:
+    """Build the message telling the supervisor that research has converged."""
+    return (
+        f"Note: the last research round added only {gain.new_sources} new sources and "
+        f"{gain.new_facts} new facts ({gain.new_fact_ratio:.0%} of its findings). "
+        "Further research on these lines is unlikely to add much. Unless an important "
+        "part of the brief is still uncovered, call ResearchComplete."
+    )
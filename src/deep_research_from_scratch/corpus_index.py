@@ -0,0 +1,251 @@
+"""On-Disk BM25 Index over a Directory of Documents.
+
+This module maintains a persistent inverted index over the text files in a
+directory. Files are split into passages (chunks) with byte offsets, so search
+results can cite the exact region of a file they come from in a form that byte
+range reads accept. The index is refreshed incrementally: only files whose
+modification time or size changed are re-read, and only files whose content
+hash changed are re-indexed. Symlinks that resolve outside the directory are
+never indexed.
+"""
+
+import hashlib
+import json
+import math
+import os
+import tempfile
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+
+from deep_research_from_scratch.ranking import tokenize
+
+# ===== CONFIGURATION =====
+
+# Directory holding on-disk indexes, one file per indexed directory
+corpus_index_dir = Path(os.environ.get("LOCAL_INDEX_DIR", ".langgraph_api/corpus_index"))
+
+# File types indexed as plain text
+indexed_extensions = {".md", ".txt", ".rst", ".html", ".htm", ".csv", ".json"}
+
+# Target passage size in characters; passages break on paragraph boundaries
+chunk_size = 1200
+
+# BM25 parameters
+bm25_k1 = 1.5
+bm25_b = 0.75
+
+INDEX_VERSION = 2
+
+# ===== DATA STRUCTURES =====
+
+@dataclass
+class Passage:
+    """A ranked passage of an indexed file with its byte offsets."""
+    path: str
+    start: int
+    end: int
+    score: float
+    text: str
+
+def split_into_chunks(text: str, size: int = chunk_size) -> list[tuple[int, int]]:
+    """Split text into (start, end) character ranges on paragraph boundaries.
+
+    Paragraphs are accumulated until a chunk reaches the target size; a single
+    paragraph longer than the target is split at whitespace.
+    """
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + size)
+        if end < len(text):
+            # Prefer the last paragraph break, then the last whitespace, inside the window
+            window = text[start:end]
+            cut = window.rfind("\n\n")
+            if cut <= size // 4:
+                cut = window.rfind(" ")
+            if cut > size // 4:
+                end = start + cut
+        if text[start:end].strip():
+            chunks.append((start, end))
+        start = end
+    return chunks
+
+# ===== INDEX =====
+
+class CorpusIndex:
+    """Persistent, incrementally updated BM25 passage index over a directory.
+
+    The on-disk JSON holds file metadata (mtime, size, hash), passage offsets
+    and lengths, and the inverted index mapping each term to {chunk_id: tf}.
+    """
+
+    def __init__(self, root: Path, index_path: Path | None = None):
+        """Create an empty index of `root`, stored at `index_path` (default: inside `root`)."""
+        self.root = Path(root).resolve()
+        self.index_path = Path(index_path) if index_path else self.root / ".corpus_index.json"
+        self._lock = threading.Lock()
+        self.files: dict[str, dict] = {}
+        self.chunks: dict[str, dict] = {}
+        self.postings: dict[str, dict[str, int]] = {}
+        self._load()
+
+    # ----- persistence -----
+
+    def _load(self) -> None:
+        if not self.index_path.exists():
+            return
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return  # A corrupt index is rebuilt from scratch
+        if data.get("version") == INDEX_VERSION:
+            self.files, self.chunks, self.postings = data["files"], data["chunks"], data["postings"]
+
+    def _save(self) -> None:
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": INDEX_VERSION, "files": self.files, "chunks": self.chunks, "postings": self.postings}
+        # Write to a temp file and rename so a crash never leaves a partial index
+        with tempfile.NamedTemporaryFile("w", dir=self.index_path.parent, delete=False, encoding="utf-8") as tmp:
+            json.dump(data, tmp)
+        os.replace(tmp.name, self.index_path)
+
+    # ----- incremental indexing -----
+
+    def _iter_files(self):
+        # Symlinked directories are not descended into; symlinked files are
+        # indexed only when they resolve inside the root
+        for parent, dirnames, filenames in os.walk(self.root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                path = Path(parent, name)
+                if path.suffix.lower() not in indexed_extensions or path == self.index_path:
+                    continue
+                try:
+                    resolved = path.resolve()
+                except (OSError, RuntimeError):
+                    continue  # Broken or looping link
+                if resolved.is_relative_to(self.root) and resolved.is_file():
+                    yield path
+
+    def _remove_file(self, rel_path: str) -> None:
+        for chunk_id in self.files.pop(rel_path, {}).get("chunks", []):
+            for term in self.chunks.pop(chunk_id, {}).get("terms", []):
+                postings = self.postings.get(term)
+                if postings is not None:
+                    postings.pop(chunk_id, None)
+                    if not postings:
+                        del self.postings[term]
+
+    def _add_file(self, rel_path: str, text: str, stat: os.stat_result, digest: str) -> None:
+        chunk_ids = []
+        # Chunks are cut on characters and stored with byte offsets; the text was
+        # decoded with surrogateescape, so re-encoding it gives the file's bytes
+        position, byte_position = 0, 0
+        for start, end in split_into_chunks(text):
+            byte_start = byte_position + len(text[position:start].encode("utf-8", errors="surrogateescape"))
+            byte_end = byte_start + len(text[start:end].encode("utf-8", errors="surrogateescape"))
+            position, byte_position = end, byte_end
+            chunk_id = f"{rel_path}#{byte_start}"
+            term_counts = Counter(tokenize(text[start:end]))
+            for term, count in term_counts.items():
+                self.postings.setdefault(term, {})[chunk_id] = count
+            self.chunks[chunk_id] = {
+                "path": rel_path, "start": byte_start, "end": byte_end,
+                "length": sum(term_counts.values()), "terms": list(term_counts),
+            }
+            chunk_ids.append(chunk_id)
+        self.files[rel_path] = {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": digest, "chunks": chunk_ids}
+
+    def refresh(self) -> bool:
+        """Bring the index up to date with the directory.
+
+        Returns:
+            True if any file was added, changed or removed
+        """
+        with self._lock:
+            changed = False
+            seen = set()
+            for path in self._iter_files():
+                rel_path = path.relative_to(self.root).as_posix()
+                seen.add(rel_path)
+                stat = path.stat()
+                entry = self.files.get(rel_path)
+                if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                    continue
+
+                data = path.read_bytes()
+                text = data.decode("utf-8", errors="surrogateescape")
+                digest = hashlib.sha256(data).hexdigest()
+                if entry and entry["sha256"] == digest:
+                    # Touched but unchanged: only record the new metadata
+                    entry["mtime"], entry["size"] = stat.st_mtime, stat.st_size
+                else:
+                    self._remove_file(rel_path)
+                    self._add_file(rel_path, text, stat, digest)
+                changed = True
+
+            for rel_path in set(self.files) - seen:
+                self._remove_file(rel_path)
+                changed = True
+
+            if changed:
+                self._save()
+            return changed
+
+    # ----- search -----
+
+    def read_range(self, rel_path: str, start: int, end: int) -> str:
+        """Read a byte range of an indexed file."""
+        with open(self.root / rel_path, "rb") as f:
+            f.seek(start)
+            return f.read(end - start).decode("utf-8", errors="replace")
+
+    def search(self, query: str, k: int = 5) -> list[Passage]:
+        """Return the top-k passages for a query ranked by BM25.
+
+        Args:
+            query: Free-text query
+            k: Number of passages to return
+
+        Returns:
+            Ranked passages with file paths, offsets and text
+        """
+        with self._lock:
+            if not self.chunks:
+                return []
+            n_chunks = len(self.chunks)
+            average_length = sum(c["length"] for c in self.chunks.values()) / n_chunks or 1.0
+
+            scores: dict[str, float] = {}
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log1p((n_chunks - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, tf in postings.items():
+                    norm = bm25_k1 * (1 - bm25_b + bm25_b * self.chunks[chunk_id]["length"] / average_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (bm25_k1 + 1) / (tf + norm)
+
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            hits = [(self.chunks[chunk_id], score) for chunk_id, score in top]
+
+        return [
+            Passage(chunk["path"], chunk["start"], chunk["end"], score, self.read_range(chunk["path"], chunk["start"], chunk["end"]))
+            for chunk, score in hits
+        ]
+
+_indexes: dict[Path, CorpusIndex] = {}
+
+def get_corpus_index(root: Path, index_dir: Path = corpus_index_dir) -> CorpusIndex:
+    """Get or create the shared index for a directory.
+
+    The index file is named after a hash of the directory path, so several
+    directories can be indexed side by side in the same index directory.
+    """
+    root = Path(root).resolve()
+    if root not in _indexes:
+        index_name = hashlib.sha256(str(root).encode("utf-8")).hexdigest()[:16] + ".json"
+        _indexes[root] = CorpusIndex(root, Path(index_dir) / index_name)
+    return _indexes[root]
@@ -0,0 +1,306 @@
+"""Event-Loop Lag Monitor and Blocking-Call Detector.
+
+A sync call inside an async graph node (a blocking HTTP client, file or SQLite
+access, CPU-heavy parsing) stalls every run sharing the server's event loop.
+With diagnostics enabled:
+- A heartbeat task on each event loop that runs graph code measures how late
+  its timer fires; lateness above LOOP_LAG_THRESHOLD_MS is a blocking stretch
+- A watchdog thread samples the loop thread's stack while the heartbeat is
+  overdue, so each stretch is attributed to the graph node (from LangGraph's
+  node metadata on the stack), the call site in this package and the innermost
+  frame, which is usually the blocking call itself
+- Blocking stretches are logged as warnings and counted per node in metrics
+- In strict mode, the next graph step of the run that blocked raises
+  `BlockingCallError`, failing that run (for tests and CI); other runs sharing
+  the loop are not affected. Tests can also wrap code in `detect_blocking()`
+
+Monitors are attached through a LangChain configure hook, so every graph run
+starts the monitor for its loop without changes to the nodes.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import Counter
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+from deep_research_from_scratch.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURATION =====
+
+# "off" (default), "warn" (log and count blocking stretches) or "strict" (also fail the run)
+loop_diagnostics = os.environ.get("LOOP_DIAGNOSTICS", "off").lower()
+
+# Event-loop lag treated as a blocking stretch, in milliseconds
+loop_lag_threshold = float(os.environ.get("LOOP_LAG_THRESHOLD_MS", "100")) / 1000
+
+# Heartbeat interval of the lag monitor, in seconds
+heartbeat_interval = 0.05
+
+PACKAGE_MARKER = f"{os.sep}deep_research_from_scratch{os.sep}"
+
+# ===== DATA STRUCTURES =====
+
+@dataclass
+class BlockingStretch:
+    """A stretch during which the event loop was blocked."""
+    seconds: float
+    node: str = "unknown"
+    call_site: str = "unknown"
+    blocking_frame: str = "unknown"
+    # Root graph run whose task was blocking, if it could be identified
+    run_id: UUID | None = None
+
+    def describe(self) -> str:
+        """Describe the stretch for logs and errors."""
+        return (
+            f"event loop blocked for {self.seconds * 1000:.0f}ms in node {self.node} "
+            f"at {self.call_site} (innermost frame: {self.blocking_frame})"
+        )
+
+class BlockingCallError(AssertionError):
+    """Raised in strict mode when graph code blocked the event loop."""
+
+@dataclass
+class LoopMonitor:
+    """Heartbeat state of one event loop."""
+    thread_id: int
+    last_beat: float = field(default_factory=time.monotonic)
+    samples: list = field(default_factory=list)
+    # Strict mode: stretches not yet raised, by root run
+    unreported: dict = field(default_factory=dict)
+    collectors: list = field(default_factory=list)
+    task: asyncio.Task | None = None
+
+# ===== STACK ATTRIBUTION =====
+
+def _describe_frame(frame_summary: traceback.FrameSummary) -> str:
+    path = frame_summary.filename
+    if PACKAGE_MARKER in path:
+        path = path.split(PACKAGE_MARKER, 1)[1]
+    return f"{path}:{frame_summary.lineno} in {frame_summary.name}"
+
+def graph_node(frame) -> str | None:
+    """Return the LangGraph node of the innermost frame holding a node config."""
+    while frame is not None:
+        config = frame.f_locals.get("config")
+        if isinstance(config, dict):
+            node = config.get("metadata", {}).get("langgraph_node")
+            if node:
+                return node
+        frame = frame.f_back
+    return None
+
+def graph_run(frame) -> UUID | None:
+    """Return the root graph run of the innermost frame holding a config of a tracked run.
+
+    A node's (or tool's) config carries the callback manager of its run, whose
+    parent_run_id is the node's chain run; the diagnostics handler maps that to
+    the root run.
+    """
+    while frame is not None:
+        config = frame.f_locals.get("config")
+        if isinstance(config, dict):
+            parent_run_id = getattr(config.get("callbacks"), "parent_run_id", None)
+            with _runs_lock:
+                root = _run_roots.get(parent_run_id)
+            if root is not None:
+                return root
+        frame = frame.f_back
+    return None
+
+def attribute_stack(frame) -> tuple[str, str, str, UUID | None]:
+    """Return (node, call site, innermost frame, root run) for a sampled stack."""
+    stack = traceback.extract_stack(frame)
+    own = [summary for summary in stack if PACKAGE_MARKER in summary.filename]
+    node = graph_node(frame) or (own[0].name if own else "unknown")
+    call_site = _describe_frame(own[-1]) if own else "unknown"
+    blocking_frame = _describe_frame(stack[-1]) if stack else "unknown"
+    return node, call_site, blocking_frame, graph_run(frame)
+
+# ===== MONITORING =====
+
+_monitors: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, LoopMonitor]" = weakref.WeakKeyDictionary()
+_monitors_lock = threading.Lock()
+_watchdog: threading.Thread | None = None
+
+# Root graph run of every active chain and tool run, maintained by the diagnostics handler
+_run_roots: dict[UUID, UUID] = {}
+_runs_lock = threading.Lock()
+
+def _watch() -> None:
+    """Sample the stack of every loop whose heartbeat is overdue."""
+    while True:
+        time.sleep(heartbeat_interval / 2)
+        now = time.monotonic()
+        with _monitors_lock:
+            monitors = list(_monitors.values())
+        frames = None
+        for monitor in monitors:
+            if now - monitor.last_beat > heartbeat_interval + loop_lag_threshold:
+                frames = frames or sys._current_frames()
+                frame = frames.get(monitor.thread_id)
+                if frame is not None:
+                    monitor.samples.append(attribute_stack(frame))
+
+async def _heartbeat(monitor: LoopMonitor) -> None:
+    """Measure how late the loop wakes up and report blocking stretches."""
+    while True:
+        expected = time.monotonic() + heartbeat_interval
+        await asyncio.sleep(heartbeat_interval)
+        now = time.monotonic()
+        lag = now - expected
+        monitor.last_beat = now
+        metrics.inc("event_loop_lag_seconds_total", max(lag, 0.0))
+        if lag > loop_lag_threshold:
+            report_stretch(monitor, lag)
+        monitor.samples.clear()
+
+def report_stretch(monitor: LoopMonitor, lag: float) -> None:
+    """Log, count and collect a blocking stretch, attributed to its most sampled call site."""
+    stretch = BlockingStretch(lag)
+    if monitor.samples:
+        stretch.node, stretch.call_site, stretch.blocking_frame, stretch.run_id = Counter(monitor.samples).most_common(1)[0][0]
+    logger.warning(stretch.describe())
+    metrics.inc("event_loop_blocked_total", node=stretch.node)
+    metrics.inc("event_loop_blocked_seconds_total", lag, node=stretch.node)
+    for collector in monitor.collectors:
+        collector.append(stretch)
+    # Only a stretch attributed to a run that is still active can fail it
+    with _runs_lock:
+        active = stretch.run_id in _run_roots
+    if loop_diagnostics == "strict" and active:
+        monitor.unreported.setdefault(stretch.run_id, []).append(stretch)
+
+def ensure_loop_monitor() -> LoopMonitor | None:
+    """Start the lag monitor for the running event loop, if there is one."""
+    global _watchdog
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    monitor = _monitors.get(loop)
+    if monitor is not None:
+        return monitor
+    with _monitors_lock:
+        monitor = _monitors.get(loop)
+        if monitor is None:
+            monitor = _monitors[loop] = LoopMonitor(threading.get_ident())
+            monitor.task = loop.create_task(_heartbeat(monitor), name="loop-lag-monitor")
+        if _watchdog is None:
+            _watchdog = threading.Thread(target=_watch, name="loop-watchdog", daemon=True)
+            _watchdog.start()
+    return monitor
+
+@asynccontextmanager
+async def detect_blocking(strict: bool = True):
+    """Collect blocking stretches on the current loop during the block.
+
+    Args:
+        strict: Raise BlockingCallError at the end of the block if any stretch was seen
+
+    Yields:
+        The list of BlockingStretch collected so far
+    """
+    monitor = ensure_loop_monitor()
+    stretches: list[BlockingStretch] = []
+    monitor.collectors.append(stretches)
+    try:
+        yield stretches
+        # Let the heartbeat report a stretch that ended just before the block did
+        await asyncio.sleep(heartbeat_interval * 2)
+    finally:
+        monitor.collectors.remove(stretches)
+    if strict and stretches:
+        raise BlockingCallError("; ".join(stretch.describe() for stretch in stretches))
+
+# ===== GRAPH HOOK =====
+
+class LoopDiagnosticsHandler(BaseCallbackHandler):
+    """Callback handler that starts loop monitors and enforces strict mode.
+
+    It runs inline on the loop thread, so it sees the loop running the graph.
+    It records the root run of every chain and tool run, so blocking stretches
+    can be attributed to their run, and in strict mode raises a run's stretches
+    into that run only.
+    """
+
+    run_inline = True
+    raise_error = True
+
+    def _check(self, root: UUID) -> None:
+        monitor = ensure_loop_monitor()
+        stretches = monitor.unreported.pop(root, None) if monitor is not None else None
+        if stretches:
+            raise BlockingCallError("; ".join(stretch.describe() for stretch in stretches))
+
+    def _start(self, run_id: UUID, parent_run_id: UUID | None) -> UUID:
+        ensure_loop_monitor()
+        with _runs_lock:
+            root = _run_roots[run_id] = _run_roots.get(parent_run_id, run_id) if parent_run_id is not None else run_id
+        return root
+
+    def _finish(self, run_id: UUID) -> UUID:
+        with _runs_lock:
+            root = _run_roots.pop(run_id, run_id)
+        if root == run_id:
+            monitor = ensure_loop_monitor()
+            if monitor is not None:
+                monitor.unreported.pop(root, None)
+        return root
+
+    def on_chain_start(self, serialized: Any, inputs: Any, *, run_id: UUID, parent_run_id: UUID | None = None, **kwargs: Any) -> None:
+        """Record the chain's root run and raise the run's blocking stretches in strict mode."""
+        root = self._start(run_id, parent_run_id)
+        try:
+            self._check(root)
+        except BlockingCallError:
+            # A chain that fails to start gets no end or error callback
+            self._finish(run_id)
+            raise
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        """Raise the run's blocking stretches in strict mode and forget the chain."""
+        with _runs_lock:
+            root = _run_roots.get(run_id, run_id)
+        try:
+            self._check(root)
+        finally:
+            self._finish(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        """Forget a failed chain."""
+        self._finish(run_id)
+
+    def on_tool_start(self, serialized: Any, input_str: str, *, run_id: UUID, parent_run_id: UUID | None = None, **kwargs: Any) -> None:
+        """Record the tool call's root run, for graphs and models the tool invokes."""
+        self._start(run_id, parent_run_id)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        """Forget a finished tool call."""
+        self._finish(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        """Forget a failed tool call."""
+        self._finish(run_id)
+
+loop_diagnostics_handler: ContextVar[LoopDiagnosticsHandler | None] = ContextVar(
+    "loop_diagnostics_handler",
+    default=LoopDiagnosticsHandler() if loop_diagnostics in ("warn", "strict") else None,
+)
+
+register_configure_hook(loop_diagnostics_handler, inheritable=True)
@@ -0,0 +1,550 @@
+"""Execution Backends for Delegated Research.
+
+`supervisor_tools` runs every ConductResearch call through an execution backend:
+- "inprocess": researchers run as coroutines in the server's event loop (default)
+- "workers": researchers are dispatched as jobs through a broker to a pool of
+  worker processes, local or on other hosts, so research throughput is not
+  capped by one process's event loop, CPU and sockets
+
+Brokers are pluggable (see `Broker`). Two are included:
+- InMemoryBroker: queues in this process, served by worker threads; a stand-in
+  for development and tests
+- ManagerBroker: queues served over TCP by a multiprocessing manager. Local
+  worker processes are started automatically, and workers on other hosts can
+  join with:
+
+      python -m deep_research_from_scratch.execution_backend worker --address HOST:PORT
+
+  (BROKER_AUTHKEY must be set to the same value on every host)
+
+Workers return the same {"compressed_research", "raw_notes"} payload as an
+in-process researcher, with the text inline: blobs a worker process wrote would
+live on its own disk, so worker processes keep payloads inline and the backend
+externalizes the returned notes into the server's blob store (see blob_store.py),
+the one store that checkpoints reference and compaction sweeps. Likewise, a job
+numbers sources in its own registry and returns the sources it cited; the backend
+registers them in the run's source registry and rewrites the job's citations to
+the run's IDs (see source_registry.py). Jobs are retried when a worker reports an error, dies
+(detected for local workers) or exceeds the job timeout, and cancelling a run
+cancels its jobs on the workers.
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from multiprocessing.managers import BaseManager, DictProxy
+
+from langchain_core.messages import HumanMessage
+
+from deep_research_from_scratch import blob_store
+from deep_research_from_scratch.blob_store import externalize, load_text
+from deep_research_from_scratch.metrics import metrics
+from deep_research_from_scratch.research_agent import researcher_agent
+from deep_research_from_scratch.scheduler import run_priority
+from deep_research_from_scratch.source_registry import (
+    SourceEntry,
+    close_source_registry,
+    get_source_registry,
+    open_source_registry,
+    remap_source_ids,
+)
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURATION =====
+
+# Backend for ConductResearch: "inprocess" or "workers"
+execution_backend_name = os.environ.get("EXECUTION_BACKEND", "inprocess")
+
+# Broker for the workers backend: "manager" (TCP, multi-process/multi-host) or "memory" (threads)
+execution_broker_name = os.environ.get("EXECUTION_BROKER", "manager")
+
+# Number of local workers started by this process (0 to rely on remote workers only)
+execution_workers = int(os.environ.get("EXECUTION_WORKERS", "4"))
+
+# Address the manager broker listens on and remote workers connect to
+broker_address = os.environ.get("BROKER_ADDRESS", "127.0.0.1:50051")
+
+# Shared secret for the manager broker; random (local workers only) when unset
+broker_authkey = os.environ.get("BROKER_AUTHKEY", "").encode() or os.urandom(16)
+
+# Seconds a single attempt may run before it is cancelled and retried
+job_timeout_seconds = float(os.environ.get("WORKER_JOB_TIMEOUT_SECONDS", "900"))
+
+# Additional attempts after a failed, timed out or orphaned job
+job_max_retries = int(os.environ.get("WORKER_MAX_RETRIES", "2"))
+
+# How often workers check whether their running job was cancelled
+cancel_poll_seconds = 0.5
+
+# Cancellation markers are dropped once a worker has seen them; markers no worker
+# ever picks up (e.g. the job finished as it was cancelled) expire after this long
+cancel_marker_ttl_seconds = 24 * 60 * 60
+
+class WorkerFailure(Exception):
+    """Raised for a job whose worker died while running it."""
+
+# ===== BROKERS =====
+
+class Broker(ABC):
+    """Transport between the backend (producer) and workers (consumers).
+
+    Messages are plain dicts. Jobs carry a job_id and the research topic;
+    results carry the job_id, a status ("started", "done" or "error") and
+    either the worker id, the result payload or the error.
+    """
+
+    @abstractmethod
+    def submit(self, job: dict) -> None:
+        """Enqueue a job for any worker."""
+
+    @abstractmethod
+    def next_job(self, timeout: float) -> dict | None:
+        """Dequeue the next job, or None after the timeout."""
+
+    @abstractmethod
+    def publish_result(self, message: dict) -> None:
+        """Send a status or result message back to the backend."""
+
+    @abstractmethod
+    def next_result(self, timeout: float) -> dict | None:
+        """Receive the next status or result message, or None after the timeout."""
+
+    @abstractmethod
+    def cancel(self, job_id: str) -> None:
+        """Mark a job as cancelled."""
+
+    @abstractmethod
+    def is_cancelled(self, job_id: str) -> bool:
+        """Return True if a job was cancelled."""
+
+    @abstractmethod
+    def forget(self, job_id: str) -> None:
+        """Drop the cancellation marker of a job that no worker will run again."""
+
+def prune_cancel_markers(cancelled, ttl_seconds: float = cancel_marker_ttl_seconds) -> None:
+    """Drop cancellation markers older than the TTL from a broker's cancelled mapping."""
+    cutoff = time.time() - ttl_seconds
+    for job_id, cancelled_at in list(cancelled.items()):
+        if cancelled_at < cutoff:
+            cancelled.pop(job_id, None)
+
+class InMemoryBroker(Broker):
+    """Broker backed by in-process queues, for worker threads."""
+
+    def __init__(self):
+        """Create empty job and result queues."""
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.cancelled = {}
+
+    def submit(self, job: dict) -> None:
+        """Enqueue a job on the in-process job queue."""
+        self.jobs.put(job)
+
+    def next_job(self, timeout: float) -> dict | None:
+        """Dequeue the next job, or None after the timeout."""
+        try:
+            return self.jobs.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def publish_result(self, message: dict) -> None:
+        """Put a status or result message on the in-process result queue."""
+        self.results.put(message)
+
+    def next_result(self, timeout: float) -> dict | None:
+        """Receive the next status or result message, or None after the timeout."""
+        try:
+            return self.results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def cancel(self, job_id: str) -> None:
+        """Mark a job as cancelled, pruning expired markers."""
+        prune_cancel_markers(self.cancelled)
+        self.cancelled[job_id] = time.time()
+
+    def is_cancelled(self, job_id: str) -> bool:
+        """Return True if a job was cancelled."""
+        return job_id in self.cancelled
+
+    def forget(self, job_id: str) -> None:
+        """Drop the cancellation marker of a job."""
+        self.cancelled.pop(job_id, None)
+
+# Queues living in the manager's server process
+_manager_jobs = queue.Queue()
+_manager_results = queue.Queue()
+_manager_cancelled = {}
+
+def _get_jobs():
+    return _manager_jobs
+
+def _get_results():
+    return _manager_results
+
+def _get_cancelled():
+    return _manager_cancelled
+
+class _BrokerManager(BaseManager):
+    pass
+
+_BrokerManager.register("jobs", callable=_get_jobs)
+_BrokerManager.register("results", callable=_get_results)
+_BrokerManager.register("cancelled", callable=_get_cancelled, proxytype=DictProxy)
+
+def parse_address(address: str) -> tuple[str, int]:
+    """Split a HOST:PORT address into its host and port."""
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+class ManagerBroker(Broker):
+    """Broker whose queues are served over TCP by a multiprocessing manager.
+
+    Use `serve` in the process that dispatches jobs and `connect` in workers.
+    """
+
+    def __init__(self, manager: _BrokerManager):
+        """Wrap the queues and cancellation markers served by a connected manager."""
+        self.manager = manager
+        self.jobs = manager.jobs()
+        self.results = manager.results()
+        self.cancelled = manager.cancelled()
+
+    @classmethod
+    def serve(cls, address: str = broker_address, authkey: bytes = broker_authkey) -> "ManagerBroker":
+        """Start the broker server process and connect to it."""
+        manager = _BrokerManager(address=parse_address(address), authkey=authkey, ctx=multiprocessing.get_context("spawn"))
+        manager.start()
+        return cls(manager)
+
+    @classmethod
+    def connect(cls, address: str = broker_address, authkey: bytes = broker_authkey) -> "ManagerBroker":
+        """Connect to a running broker server."""
+        manager = _BrokerManager(address=parse_address(address), authkey=authkey)
+        manager.connect()
+        return cls(manager)
+
+    def submit(self, job: dict) -> None:
+        """Enqueue a job on the manager's job queue."""
+        self.jobs.put(job)
+
+    def next_job(self, timeout: float) -> dict | None:
+        """Dequeue the next job, or None after the timeout."""
+        try:
+            return self.jobs.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def publish_result(self, message: dict) -> None:
+        """Put a status or result message on the manager's result queue."""
+        self.results.put(message)
+
+    def next_result(self, timeout: float) -> dict | None:
+        """Receive the next status or result message, or None after the timeout."""
+        try:
+            return self.results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def cancel(self, job_id: str) -> None:
+        """Mark a job as cancelled, pruning expired markers."""
+        prune_cancel_markers(self.cancelled)
+        self.cancelled[job_id] = time.time()
+
+    def is_cancelled(self, job_id: str) -> bool:
+        """Return True if a job was cancelled."""
+        return job_id in self.cancelled
+
+    def forget(self, job_id: str) -> None:
+        """Drop the cancellation marker of a job."""
+        self.cancelled.pop(job_id, None)
+
+# ===== WORKERS =====
+
+async def execute_job(job: dict, broker: Broker) -> dict:
+    """Run one researcher job, cancelling it if the broker marks it cancelled."""
+    # The job runs with its run's thread_id and priority class, so run-scoped state and scheduling carry over
+    configurable = {key: job[key] for key in ("thread_id", "priority") if job.get(key)}
+    # The job is a root run of its own, with an in-memory source registry; the sources
+    # it cites are returned with the result and get the run's IDs on the server
+    run_id = uuid.UUID(job["job_id"])
+    registry = open_source_registry(str(run_id))
+    try:
+        task = asyncio.ensure_future(researcher_agent.ainvoke({
+            "researcher_messages": [HumanMessage(content=job["research_topic"])],
+            "research_topic": job["research_topic"],
+        }, config={"configurable": configurable, "run_id": run_id}))
+        while not task.done():
+            await asyncio.wait([task], timeout=cancel_poll_seconds)
+            if not task.done() and broker.is_cancelled(job["job_id"]):
+                task.cancel()
+        result = task.result()
+    finally:
+        close_source_registry(str(run_id))
+    compressed_research = result.get("compressed_research", "Error synthesizing research report")
+    raw_notes = [load_text(note) for note in result.get("raw_notes", [])]
+    return {
+        "compressed_research": compressed_research,
+        "raw_notes": raw_notes,
+        "sources": [
+            [entry.source_id, entry.url, entry.title]
+            for entry in registry.referenced_entries([compressed_research, *raw_notes])
+        ],
+        "fingerprints": registry.fingerprints(),
+    }
+
+def adopt_job_result(result: dict) -> dict:
+    """Turn a job's result into the researcher payload of the current run.
+
+    The sources the job cited are registered in the run's source registry and
+    its citations rewritten to the run's IDs, and the notes are externalized
+    into this process's blob store.
+    """
+    registry = get_source_registry()
+    mapping = registry.adopt([SourceEntry(*source) for source in result.get("sources", [])], result.get("fingerprints", {}))
+    return {
+        "compressed_research": remap_source_ids(result["compressed_research"], mapping),
+        "raw_notes": [externalize(remap_source_ids(note, mapping)) for note in result["raw_notes"]],
+    }
+
+def run_worker(broker: Broker, worker_id: str, stop: threading.Event | None = None) -> None:
+    """Process jobs from the broker until stopped."""
+    while stop is None or not stop.is_set():
+        try:
+            job = broker.next_job(timeout=1.0)
+        except (EOFError, OSError):
+            logger.info("Broker connection closed; worker %s exiting", worker_id)
+            return
+        if job is None:
+            continue
+        if broker.is_cancelled(job["job_id"]):
+            broker.forget(job["job_id"])
+            continue
+        broker.publish_result({"job_id": job["job_id"], "status": "started", "worker": worker_id})
+        try:
+            result = asyncio.run(execute_job(job, broker))
+            message = {"job_id": job["job_id"], "status": "done", "result": result}
+        except asyncio.CancelledError:
+            continue  # Nobody is waiting for a cancelled job
+        except Exception as e:
+            message = {"job_id": job["job_id"], "status": "error", "error": repr(e)}
+        finally:
+            # Each attempt has its own job_id, so the job is never dequeued again
+            broker.forget(job["job_id"])
+        broker.publish_result(message)
+
+def worker_process_main(address: str, authkey: bytes, worker_id: str) -> None:
+    """Entry point of a worker process."""
+    logging.basicConfig(level=logging.INFO)
+    # Results are returned inline; blobs on this host's disk would be unreachable from the server
+    blob_store.externalize_blobs = False
+    run_worker(ManagerBroker.connect(address, authkey), worker_id)
+
+def make_worker_id() -> str:
+    """Return a worker ID unique across hosts."""
+    return f"{socket.gethostname()}:{uuid.uuid4().hex[:8]}"
+
+# ===== BACKENDS =====
+
+class ExecutionBackend(ABC):
+    """Runs one delegated research topic and returns the researcher's output payload."""
+
+    @abstractmethod
+    async def run_researcher(self, research_topic: str, thread_id: str | None = None) -> dict:
+        """Return {"compressed_research": str, "raw_notes": list[str]}."""
+
+class InProcessBackend(ExecutionBackend):
+    """Runs researchers as coroutines in the current event loop."""
+
+    async def run_researcher(self, research_topic: str, thread_id: str | None = None) -> dict:
+        """Run the researcher subgraph in this event loop and return its output."""
+        return await researcher_agent.ainvoke({
+            "researcher_messages": [HumanMessage(content=research_topic)],
+            "research_topic": research_topic,
+        })
+
+class WorkerPoolBackend(ExecutionBackend):
+    """Dispatches researchers to workers through a broker, with retries.
+
+    A reader thread routes result messages to the waiting coroutines. Local
+    worker threads or processes can be attached with `start_thread_workers`
+    and `start_process_workers`; dead local processes are restarted and their
+    in-flight jobs retried right away.
+    """
+
+    def __init__(self, broker: Broker, timeout_seconds: float = job_timeout_seconds, max_retries: int = job_max_retries):
+        """Create a backend dispatching through `broker` and start routing its results."""
+        self.broker = broker
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._waiting: dict[str, tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self._job_workers: dict[str, str] = {}
+        self._stop = threading.Event()
+        threading.Thread(target=self._read_results, name="broker-results", daemon=True).start()
+
+    # ----- result routing -----
+
+    @staticmethod
+    def _settle(future: asyncio.Future, message: dict | None, error: Exception | None = None) -> None:
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(message)
+
+    def _read_results(self) -> None:
+        while not self._stop.is_set():
+            try:
+                message = self.broker.next_result(timeout=1.0)
+            except (EOFError, OSError):
+                return  # The broker shut down with this process
+            if message is None:
+                continue
+            with self._lock:
+                if message["status"] == "started":
+                    # A late message for an attempt nobody waits for any more is dropped
+                    if message["job_id"] in self._waiting:
+                        self._job_workers[message["job_id"]] = message["worker"]
+                    continue
+                waiting = self._waiting.get(message["job_id"])
+            if waiting is not None:
+                loop, future = waiting
+                loop.call_soon_threadsafe(self._settle, future, message)
+
+    def worker_died(self, worker_id: str) -> None:
+        """Fail the jobs a dead worker was running so they are retried."""
+        with self._lock:
+            jobs = [job_id for job_id, worker in self._job_workers.items() if worker == worker_id]
+            waiting = [self._waiting[job_id] for job_id in jobs if job_id in self._waiting]
+        for loop, future in waiting:
+            loop.call_soon_threadsafe(self._settle, future, None, WorkerFailure(f"Worker {worker_id} died"))
+
+    # ----- local workers -----
+
+    def start_thread_workers(self, count: int) -> None:
+        """Serve jobs with worker threads in this process."""
+        for i in range(count):
+            thread = threading.Thread(target=run_worker, args=(self.broker, f"thread-{i}", self._stop), daemon=True)
+            thread.start()
+
+    def start_process_workers(self, count: int, address: str = broker_address, authkey: bytes = broker_authkey) -> None:
+        """Serve jobs with local worker processes, restarting any that die."""
+        context = multiprocessing.get_context("spawn")
+
+        def spawn() -> tuple[str, multiprocessing.Process]:
+            worker_id = make_worker_id()
+            process = context.Process(target=worker_process_main, args=(address, authkey, worker_id), daemon=True)
+            process.start()
+            return worker_id, process
+
+        workers = [spawn() for _ in range(count)]
+
+        def monitor() -> None:
+            while not self._stop.wait(1.0):
+                for i, (worker_id, process) in enumerate(workers):
+                    if not process.is_alive():
+                        logger.warning("Worker %s exited with code %s; restarting", worker_id, process.exitcode)
+                        metrics.inc("worker_restarts_total")
+                        self.worker_died(worker_id)
+                        workers[i] = spawn()
+
+        threading.Thread(target=monitor, name="worker-monitor", daemon=True).start()
+
+    # ----- dispatch -----
+
+    async def run_researcher(self, research_topic: str, thread_id: str | None = None) -> dict:
+        """Submit the topic as a job and await its result, retrying failed attempts."""
+        loop = asyncio.get_running_loop()
+        error = None
+        for attempt in range(self.max_retries + 1):
+            job_id = uuid.uuid4().hex
+            future = loop.create_future()
+            with self._lock:
+                self._waiting[job_id] = (loop, future)
+            self.broker.submit({
+                "job_id": job_id,
+                "research_topic": research_topic,
+                "thread_id": thread_id,
+                "priority": run_priority(),
+                "attempt": attempt,
+            })
+            try:
+                message = await asyncio.wait_for(future, self.timeout_seconds)
+                if message["status"] == "done":
+                    metrics.inc("researcher_jobs_total", status="done")
+                    return adopt_job_result(message["result"])
+                error = message["error"]
+            except TimeoutError:
+                self.broker.cancel(job_id)
+                error = f"timed out after {self.timeout_seconds:.0f}s"
+            except WorkerFailure as e:
+                error = str(e)
+            except asyncio.CancelledError:
+                # Stop the job on its worker, then let the cancellation propagate
+                self.broker.cancel(job_id)
+                raise
+            finally:
+                with self._lock:
+                    self._waiting.pop(job_id, None)
+                    self._job_workers.pop(job_id, None)
+
+            logger.warning("Research job attempt %d/%d failed: %s", attempt + 1, self.max_retries + 1, error)
+            metrics.inc("researcher_jobs_total", status="retried" if attempt < self.max_retries else "failed")
+
+        raise RuntimeError(f"Research job failed after {self.max_retries + 1} attempts: {error}")
+
+_backend: ExecutionBackend | None = None
+_backend_lock = threading.Lock()
+
+def get_execution_backend() -> ExecutionBackend:
+    """Get or initialize the configured execution backend lazily."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if execution_backend_name == "inprocess":
+                _backend = InProcessBackend()
+            elif execution_backend_name == "workers" and execution_broker_name == "memory":
+                backend = WorkerPoolBackend(InMemoryBroker())
+                backend.start_thread_workers(execution_workers)
+                _backend = backend
+            elif execution_backend_name == "workers" and execution_broker_name == "manager":
+                backend = WorkerPoolBackend(ManagerBroker.serve())
+                if execution_workers:
+                    backend.start_process_workers(execution_workers)
+                _backend = backend
+            else:
+                raise ValueError(f"Unknown EXECUTION_BACKEND/EXECUTION_BROKER: {execution_backend_name}/{execution_broker_name}")
+        return _backend
+
+# ===== WORKER ENTRY POINT =====
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a research worker connected to a remote broker")
+    parser.add_argument("command", choices=["worker"])
+    parser.add_argument("--address", default=broker_address, help="Broker address as HOST:PORT")
+    parser.add_argument("--concurrency", type=int, default=1, help="Jobs processed in parallel by this worker")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if not os.environ.get("BROKER_AUTHKEY"):
+        parser.error("BROKER_AUTHKEY must be set to the broker's key")
+    threads = [
+        threading.Thread(target=worker_process_main, args=(args.address, broker_authkey, make_worker_id()))
+        for _ in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
@@ -0,0 +1,489 @@
+"""In-Process Filesystem Research Tools.
+
+This module provides a native Python alternative to the Node.js
+`@modelcontextprotocol/server-filesystem` MCP server used by the MCP research
+agent. The read-only tools keep the server's names and argument schemas, so the
+agent and its prompt work unchanged, but run in-process without npx startup or
+JSON-RPC round trips:
+- Files are read through memory maps; head/tail reads touch only the needed lines
+- Large files are returned in bounded chunks with `read_file_range` for the rest
+- `grep_files` scans file contents with a compiled regex over memory-mapped bytes
+
+Sandboxing matches the server: every path is resolved (following symlinks) and
+must lie inside one of the allowed directories. Recursive tools skip entries
+that resolve outside them and never descend into symlinked directories.
+"""
+
+import fnmatch
+import functools
+import json
+import mmap
+import os
+import re
+import stat
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+from langchain_core.tools import ToolException, tool
+
+from deep_research_from_scratch.corpus_index import get_corpus_index
+
+# ===== CONFIGURATION =====
+
+# Maximum bytes returned by a single read; larger files are truncated with a note
+max_read_bytes = 256 * 1024
+
+# Maximum number of matches returned by grep_files
+max_grep_matches = 200
+
+# Number of passages returned by search_local_files
+local_search_passages = 6
+
+# ===== SANDBOX =====
+
+class FilesystemSandbox:
+    """Set of allowed directories that every tool path must resolve into."""
+
+    def __init__(self, allowed_directories: list[Path]):
+        """Create a sandbox allowing the given directories and everything below them."""
+        self.allowed = [Path(d).resolve() for d in allowed_directories]
+
+    def validate(self, path: str) -> Path:
+        """Resolve a path and ensure it lies inside an allowed directory.
+
+        Relative paths are resolved against the first allowed directory.
+
+        Raises:
+            ToolException: If the path escapes the allowed directories
+        """
+        candidate = Path(path).expanduser()
+        if not candidate.is_absolute():
+            candidate = self.allowed[0] / candidate
+        resolved = candidate.resolve()
+        if not self.allows(resolved):
+            allowed = ", ".join(str(root) for root in self.allowed)
+            raise ToolException(f"Access denied - path outside allowed directories: {resolved} not in {allowed}")
+        return resolved
+
+    def allows(self, resolved: Path) -> bool:
+        """Return True if a resolved path lies inside an allowed directory."""
+        return any(resolved == root or resolved.is_relative_to(root) for root in self.allowed)
+
+    def walk(self, directory: Path) -> Iterator[Path]:
+        """Recursively yield the entries under a directory that resolve inside the sandbox.
+
+        Symlinked directories are yielded but never descended into, so a walk
+        cannot escape the sandbox or loop through a cyclic link.
+        """
+        for parent, dirnames, filenames in os.walk(directory):
+            dirnames.sort()
+            for name in sorted(dirnames + filenames):
+                entry = Path(parent, name)
+                try:
+                    if self.allows(entry.resolve()):
+                        yield entry
+                except (OSError, RuntimeError):
+                    continue  # Broken or looping link
+
+def raises_tool_errors(func):
+    """Convert I/O errors into ToolExceptions so they are reported to the model."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except OSError as e:
+            raise ToolException(f"Error: {e}")
+    return wrapper
+
+# ===== READ HELPERS =====
+
+def _mapped(path: Path):
+    handle = open(path, "rb")
+    try:
+        return handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # Empty files cannot be memory mapped
+        handle.close()
+        return None, None
+
+def read_bytes_range(path: Path, offset: int = 0, length: int | None = None) -> bytes:
+    """Read a byte range of a file through a memory map."""
+    handle, mm = _mapped(path)
+    if mm is None:
+        return b""
+    with handle, mm:
+        end = len(mm) if length is None else min(len(mm), offset + length)
+        return mm[offset:end]
+
+def read_head_lines(path: Path, lines: int) -> str:
+    """Read the first N lines of a file without reading the rest, up to max_read_bytes."""
+    if lines <= 0:
+        return ""
+    handle, mm = _mapped(path)
+    if mm is None:
+        return ""
+    with handle, mm:
+        limit = min(len(mm), max_read_bytes)
+        end = -1
+        for _ in range(lines):
+            end = mm.find(b"\n", end + 1, limit)
+            if end == -1:
+                end = limit
+                break
+        text = mm[:end].decode("utf-8", errors="replace")
+        if end == limit < len(mm):
+            text += (
+                f"\n\n[Truncated: the requested lines exceed {max_read_bytes} bytes. "
+                f"Use read_file_range with offset={limit} to continue.]"
+            )
+        return text
+
+def read_tail_lines(path: Path, lines: int) -> str:
+    """Read the last N lines of a file, scanning backwards from the end, up to max_read_bytes."""
+    if lines <= 0:
+        return ""
+    handle, mm = _mapped(path)
+    if mm is None:
+        return ""
+    with handle, mm:
+        floor = max(0, len(mm) - max_read_bytes)
+        start = len(mm) - 1 if mm[-1:] == b"\n" else len(mm)
+        for _ in range(lines):
+            start = mm.rfind(b"\n", floor, start)
+            if start == -1:
+                break
+        text = mm[floor if start == -1 else start + 1:].decode("utf-8", errors="replace")
+        if start == -1 and floor:
+            text = (
+                f"[Truncated: the requested lines exceed {max_read_bytes} bytes; showing the last {max_read_bytes}. "
+                f"Use read_file_range with a lower offset to read earlier content.]\n\n" + text
+            )
+        return text
+
+def read_text(path: Path) -> str:
+    """Read a file as text, truncating files larger than max_read_bytes."""
+    size = path.stat().st_size
+    text = read_bytes_range(path, 0, max_read_bytes).decode("utf-8", errors="replace")
+    if size > max_read_bytes:
+        text += (
+            f"\n\n[Truncated: file is {size} bytes; showing the first {max_read_bytes}. "
+            f"Use read_file_range with offset={max_read_bytes} to continue.]"
+        )
+    return text
+
+# ===== TOOLS =====
+
+def build_filesystem_tools(allowed_directories: list[Path]) -> list:
+    """Create the filesystem tools sandboxed to the given directories.
+
+    Args:
+        allowed_directories: Directories the tools may access
+
+    Returns:
+        List of LangChain tools mirroring the MCP filesystem server's read tools
+    """
+    sandbox = FilesystemSandbox(allowed_directories)
+
+    @tool(parse_docstring=True)
+    @raises_tool_errors
+    def list_allowed_directories() -> str:
+        """Return the list of directories that this server is allowed to access.
+
+        Returns:
+            Allowed directories, one per line
+        """
+        return "Allowed directories:\n" + "\n".join(str(root) for root in sandbox.allowed)
+
+    @tool(parse_docstring=True)
+    @raises_tool_errors
+    def list_directory(path: str) -> str:
+        """Get a detailed listing of all files and directories in a specified path.
+
+        Results distinguish between files and directories with [FILE] and [DIR] prefixes.
+
+        Args:
+            path: Directory to list
+
+        Returns:
+            One entry per line
+        """
+        directory = sandbox.validate(path)
+        entries = sorted(directory.iterdir(), key=lambda p: p.name)
+        return "\n".join(f"{'[DIR]' if p.is_dir() else '[FILE]'} {p.name}" for p in entries)
+
+    @tool(parse_docstring=True)
+    @raises_tool_errors
+    def list_directory_with_sizes(path: str, sortBy: str = "name") -> str:
+        """Get a detailed listing of all files and directories in a specified path, including sizes.
+
+        Args:
+            path: Directory to list
+            sortBy: Sort entries by 'name' or 'size'
+
+        Returns:
+            One entry per line with sizes, followed by totals
+        """
+        directory = sandbox.validate(path)
+        entries = [(p, p.stat().st_size if p.is_file() else 0) for p in directory.iterdir()]
+        entries.sort(key=(lambda e: -e[1]) if sortBy == "size" else (lambda e: e[0].name))
+        lines = [f"{'[DIR]' if p.is_dir() else '[FILE]'} {p.name:<40} {'' if p.is_dir() else f'{size} B'}" for p, size in entries]
+        files = sum(1 for p, _ in entries if p.is_file())
+        lines.append(f"\nTotal: {files} files, {len(entries) - files} directories")
+        lines.append(f"Combined size: {sum(size for _, size in entries)} B")
+        return "\n".join(lines)
+
+    @tool(parse_docstring=True)
+    @raises_tool_errors
+    def directory_tree(path: str) -> str:
+        """Get a recursive tree view of files and directories as a JSON structure.
+
+        Args:
+            path: Root directory of the tree
+
+        Returns:
+            JSON array of entries with name, type and children
+        """
+        def walk(directory: Path) -> list[dict]:
+            tree = []
+            for p in sorted(directory.iterdir(), key=lambda p: p.name):
+                try:
+                    if not sandbox.allows(p.resolve()):
+                        continue
+                except (OSError, RuntimeError):
+                    continue  # Broken or looping link
+                entry = {"name": p.name, "type": "directory" if p.is_dir() else "file"}
+                if p.is_dir():
+                    # Symlinked directories are listed but not descended into
+                    entry["children"] = [] if p.is_symlink() else walk(p)
+                tree.append(entry)
+            return tree
+
+        return json.dumps(walk(sandbox.validate(path)), indent=2)
+
+    @tool(parse_docstring=True)
+    @raises_tool_errors
+    def get_file_info(path: str) -> str:
+        """Retrieve detailed metadata about a file or directory.
+
+        Args:
+            path: File or directory to inspect
+
+        Returns:
+            Size, timestamps, type and permissions, one per line
+        """
+        target = sandbox.validate(path)
+        info = target.stat()
+        fields = {
+            "size": info.st_size,
+            "created": datetime.fromtimestamp(info.st_ctime).isoformat(),
+            "modified": datetime.fromtimestamp(info.st_mtime).isoformat(),
+            "accessed": datetime.fromtimestamp(info.st_atime).isoformat(),
+            "isDirectory": target.is_dir(),
+            "isFile": target.is_file(),
+            "permissions": oct(stat.S_IMODE(info.st_mode))[2:],
+        }
+        return "\n".join(f"{key}: {value}" for key, value in fields.items())
+
+    @tool(parse_docstring=True)
+    @raises_tool_errors
+    def read_text_file(path: str, head: int | None = None, tail: int | None = None) -> str:
+        """Read the complete contents of a file from the file system as text.
+
+        Use the 'head' parameter to read only the first N lines of a file, or the
+        'tail' parameter to read only the last N lines of a file.
+
+        Args:
+            path: File to read
+            head: If provided, returns only the first N lines of the file
+            tail: If provided, returns only the last N lines of the file
+
+        Returns:
+            File contents
+        """
+        target = sandbox.validate(path)
+        if head is not None and tail is not None:
+            raise ToolException("Cannot specify both head and tail parameters simultaneously")
+        if head is not None:
+            return read_head_lines(target, head)
+        if tail is not None:
+            return read_tail_lines(target, tail)
+        return read_text(target)
+
+    @tool(parse_docstring=True)
+    @raises_tool_errors
+    def read_file(path: str, head: int | None = None, tail: int | None = None) -> str:
+        """Read the complete contents of a file as text. DEPRECATED: Use read_text_file instead.
+
+        Args:
+            path: File to read
+            head: If provided, returns only the first N lines of the file
+            tail: If provided, returns only the last N lines of the file
+
+        Returns:
+            File contents
+        """
+        return read_text_file.func(path, head, tail)
+
+    @tool(parse_docstring=True)
+    @raises_tool_errors
+    def read_multiple_files(paths: list[str]) -> str:
+        """Read the contents of multiple files simultaneously.
+
+        Failed reads for individual files won't stop the entire operation.
+
+        Args:
+            paths: Files to read
+
+        Returns:
+            Each file's path and contents, separated by ---
+        """
+        results = []
+        for path in paths:
+            try:
+                results.append(f"{path}:\n{read_text(sandbox.validate(path))}\n")
+            except Exception as e:
+                results.append(f"{path}: Error - {e}")
+        return "\n---\n".join(results)
+
+    @tool(parse_docstring=True)
+    @raises_tool_errors
+    def read_file_range(path: str, offset: int = 0, length: int = max_read_bytes) -> str:
+        """Read a byte range of a large file, e.g. to continue after a truncated read.
+
+        Args:
+            path: File to read
+            offset: Byte offset to start reading from
+            length: Maximum number of bytes to read
+
+        Returns:
+            The requested part of the file
+        """
+        target = sandbox.validate(path)
+        return read_bytes_range(target, max(0, offset), min(length, max_read_bytes)).decode("utf-8", errors="replace")
+
+    @tool(parse_docstring=True)
+    @raises_tool_errors
+    def search_files(path: str, pattern: str, excludePatterns: list[str] | None = None) -> str:
+        """Recursively search for files and directories matching a pattern.
+
+        Matches file names case-insensitively; glob patterns such as '*.md' are supported.
+
+        Args:
+            path: Directory to search from
+            pattern: Name substring or glob pattern to match
+            excludePatterns: Glob patterns of relative paths to skip
+
+        Returns:
+            Full paths of matching entries, one per line
+        """
+        root = sandbox.validate(path)
+        is_glob = any(ch in pattern for ch in "*?[")
+        matches = []
+        for candidate in sandbox.walk(root):
+            relative = candidate.relative_to(root).as_posix()
+            if any(fnmatch.fnmatch(relative, exclude) for exclude in excludePatterns or []):
+                continue
+            name = candidate.name.lower()
+            if fnmatch.fnmatch(name, pattern.lower()) if is_glob else pattern.lower() in name:
+                matches.append(str(candidate))
+        return "\n".join(matches) if matches else "No matches found"
+
+    @tool(parse_docstring=True)
+    @raises_tool_errors
+    def grep_files(path: str, pattern: str, ignoreCase: bool = True) -> str:
+        """Search file contents under a directory for a regular expression.
+
+        Use this to find which files mention a term before reading them.
+
+        Args:
+            path: Directory (or single file) to search
+            pattern: Regular expression to look for
+            ignoreCase: Whether matching ignores case
+
+        Returns:
+            Matching lines as 'path:line: text', one per line
+        """
+        root = sandbox.validate(path)
+        try:
+            regex = re.compile(pattern.encode("utf-8"), re.IGNORECASE if ignoreCase else 0)
+        except re.error as e:
+            raise ToolException(f"Invalid pattern: {e}")
+
+        matches = []
+        for candidate in ([root] if root.is_file() else sandbox.walk(root)):
+            if not candidate.is_file():
+                continue
+            handle, mm = _mapped(candidate)
+            if mm is None:
+                continue
+            with handle, mm:
+                last_line_end, line_number, counted_to = -1, 1, 0
+                for match in regex.finditer(mm):
+                    line_start = mm.rfind(b"\n", 0, match.start()) + 1
+                    if line_start <= last_line_end:
+                        continue  # One hit per line
+                    line_end = mm.find(b"\n", match.start())
+                    line_end = len(mm) if line_end == -1 else line_end
+                    line_number += mm[counted_to:line_start].count(b"\n")
+                    counted_to = line_start
+                    text = mm[line_start:line_end].decode("utf-8", errors="replace").strip()
+                    matches.append(f"{candidate}:{line_number}: {text[:300]}")
+                    last_line_end = line_end
+                    if len(matches) >= max_grep_matches:
+                        return "\n".join(matches) + "\n[Match limit reached]"
+        return "\n".join(matches) if matches else "No matches found"
+
+    tools = [
+        list_allowed_directories, list_directory, list_directory_with_sizes, directory_tree,
+        get_file_info, read_text_file, read_file, read_multiple_files, read_file_range,
+        search_files, grep_files,
+    ]
+    for fs_tool in tools:
+        # Return sandbox and I/O errors to the model instead of failing the run
+        fs_tool.handle_tool_error = True
+    return tools
+
+def build_local_search_tool(directory: Path):
+    """Create the search_local_files tool over a persistent passage index.
+
+    The index is refreshed incrementally before every search: files are only
+    re-read when their mtime or size changed, and only re-indexed when their
+    content hash changed.
+
+    Args:
+        directory: Directory whose files are indexed
+
+    Returns:
+        LangChain tool returning ranked passages with file/offset citations
+    """
+    index = get_corpus_index(directory)
+
+    @tool(parse_docstring=True)
+    def search_local_files(query: str) -> str:
+        """Search the contents of all local research files and return the most relevant passages.
+
+        Use this first to find where a topic is covered instead of listing
+        directories and reading every file. Each passage cites its file and
+        byte range; to read more around it, call read_file_range with that path
+        and an offset near the range.
+
+        Args:
+            query: Keywords or a natural-language question describing what to find
+
+        Returns:
+            Ranked passages with file and offset citations
+        """
+        index.refresh()
+        passages = index.search(query, k=local_search_passages)
+        if not passages:
+            return "No relevant passages found. Try different keywords or list the directory."
+
+        output = f"Top {len(passages)} passages for: {query}\n"
+        for i, passage in enumerate(passages, 1):
+            path = index.root / passage.path
+            output += f"\n--- PASSAGE {i}: {path} [bytes {passage.start}-{passage.end}] (score {passage.score:.2f}) ---\n"
+            output += passage.text.strip() + "\n"
+        return output
+
+    return search_local_files
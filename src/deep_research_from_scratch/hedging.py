@@ -0,0 +1,190 @@
+"""Hedged Requests for Latency-Critical Model Calls.
+
+This module implements an opt-in hedging policy for model calls that sit on the
+critical path of every run (the supervisor decision and the final report writer).
+If a call has not returned by its learned p95 latency, a duplicate request is sent,
+optionally to an alternate model, and whichever finishes first wins. The slower
+request is cancelled, and a hedge budget caps how often duplicates are fired.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any
+
+from langchain.chat_models import init_chat_model
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURATION =====
+
+# Hedging is disabled unless explicitly enabled for the deployment
+hedge_llm_calls = os.environ.get("HEDGE_LLM_CALLS", "false").lower() == "true"
+
+# Optional alternate model for hedged requests, e.g. "google_genai:gemini-2.5-flash".
+# When empty the duplicate request is sent to the primary model again.
+hedge_alternate_model = os.environ.get("HEDGE_ALTERNATE_MODEL", "")
+
+# Latency quantile after which a hedge is fired
+hedge_quantile = 0.95
+
+# Delay used until enough latency samples have been observed to learn the quantile
+hedge_default_delay = float(os.environ.get("HEDGE_DEFAULT_DELAY_SECONDS", "60"))
+
+# Number of samples required before the learned quantile replaces the default delay
+hedge_min_samples = 20
+
+# Maximum fraction of calls that may fire a hedge (spend cap)
+hedge_budget_ratio = float(os.environ.get("HEDGE_BUDGET_RATIO", "0.1"))
+
+# ===== LATENCY TRACKING =====
+
+class LatencyTracker:
+    """Rolling window of observed call latencies used to learn the hedge delay."""
+
+    def __init__(self, window: int = 200):
+        """Create a tracker keeping the last `window` latencies."""
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        """Record a single observed latency in seconds."""
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        """Return the q-quantile of the window, or None if it is empty."""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+class HedgeBudget:
+    """Spend cap limiting hedges to a fraction of all calls.
+
+    A small burst allowance lets the first slow calls hedge before the ratio
+    has enough calls behind it to permit any.
+    """
+
+    def __init__(self, ratio: float, burst: int = 1):
+        """Create a budget allowing `ratio` hedges per call plus `burst`."""
+        self.ratio = ratio
+        self.burst = burst
+        self.calls = 0
+        self.hedges = 0
+
+    def record_call(self) -> None:
+        """Count a primary call against the budget."""
+        self.calls += 1
+
+    def try_acquire(self) -> bool:
+        """Reserve one hedge if the budget allows it."""
+        if self.hedges >= self.ratio * self.calls + self.burst:
+            return False
+        self.hedges += 1
+        return True
+
+# ===== HEDGED MODEL =====
+
+class HedgedModel:
+    """Chat model wrapper that hedges slow async calls.
+
+    Only `ainvoke` is hedged; sync `invoke` calls go straight to the primary
+    model since they cannot be cancelled once started.
+    """
+
+    def __init__(
+        self,
+        primary: Any,
+        alternate: Any | None = None,
+        name: str = "model",
+        tracker: LatencyTracker | None = None,
+        budget: HedgeBudget | None = None,
+    ):
+        """Wrap `primary`, hedging to `alternate` (or itself) when it runs slow."""
+        self.primary = primary
+        self.alternate = alternate
+        self.name = name
+        self.tracker = tracker or LatencyTracker()
+        self.budget = budget or HedgeBudget(hedge_budget_ratio)
+        self.hedges_won = 0
+
+    def bind_tools(self, tools: list, **kwargs) -> "HedgedModel":
+        """Bind tools to both models, sharing latency history and budget."""
+        return HedgedModel(
+            self.primary.bind_tools(tools, **kwargs),
+            self.alternate.bind_tools(tools, **kwargs) if self.alternate is not None else None,
+            name=self.name,
+            tracker=self.tracker,
+            budget=self.budget,
+        )
+
+    def hedge_delay(self) -> float:
+        """Return how long to wait on the primary request before hedging."""
+        if len(self.tracker.samples) < hedge_min_samples:
+            return hedge_default_delay
+        return self.tracker.quantile(hedge_quantile)
+
+    def invoke(self, input: Any, config: dict | None = None, **kwargs) -> Any:
+        """Invoke the primary model synchronously without hedging."""
+        return self.primary.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: dict | None = None, **kwargs) -> Any:
+        """Invoke the model, firing a duplicate request if the primary is slow.
+
+        Args:
+            input: Messages or prompt passed to the underlying model
+            config: Optional runnable config forwarded to both requests
+
+        Returns:
+            Response from whichever request completed first successfully
+        """
+        start = time.monotonic()
+        self.budget.record_call()
+        primary = asyncio.ensure_future(self.primary.ainvoke(input, config, **kwargs))
+        tasks = {primary}
+
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+            if not done and self.budget.try_acquire():
+                backup_model = self.alternate if self.alternate is not None else self.primary
+                logger.info("Hedging slow %s call after %.1fs", self.name, time.monotonic() - start)
+                tasks.add(asyncio.ensure_future(backup_model.ainvoke(input, config, **kwargs)))
+
+            # Take the first successful response; fall back to the other request on failure
+            # Both requests can finish in the same wait, so check all of them before failing
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = [task for task in done if task.exception() is None]
+                if succeeded:
+                    winner = primary if primary in succeeded else succeeded[0]
+                    if winner is not primary:
+                        self.hedges_won += 1
+                    self.tracker.record(time.monotonic() - start)
+                    return winner.result()
+                if not tasks:
+                    raise (primary if primary in done else next(iter(done))).exception()
+        finally:
+            # Cancel the losing request (or both, if the caller was cancelled)
+            for task in tasks:
+                task.cancel()
+
+def with_hedging(model: Any, name: str, tools: list | None = None, **alternate_kwargs) -> Any:
+    """Wrap a model in a hedging policy when hedging is enabled.
+
+    Args:
+        model: Primary chat model
+        name: Name used in logs for this call site
+        tools: Optional tools to bind to both the primary and alternate model
+        **alternate_kwargs: Extra arguments for initializing the alternate model
+
+    Returns:
+        The hedged model, or the (tool-bound) primary model when hedging is disabled
+    """
+    if not hedge_llm_calls:
+        return model.bind_tools(tools) if tools else model
+
+    alternate = init_chat_model(hedge_alternate_model, **alternate_kwargs) if hedge_alternate_model else None
+    hedged = HedgedModel(model, alternate, name=name)
+    return hedged.bind_tools(tools) if tools else hedged
@@ -0,0 +1,232 @@
+"""Adaptive Research Depth Under Load.
+
+Research depth is normally fixed: three results per search query, six
+supervisor iterations, three parallel researchers, and the tool-call budgets in
+the prompts. When the process is near its provider quota or its queues back
+up, every run keeps asking for the same amount of work and all of them slow
+down together.
+
+With adaptive depth enabled, a controller reads the load signals already in the
+metrics registry every few seconds:
+- Backlog: work waiting for a scheduler slot (`scheduler_queued`), against
+  DEPTH_BACKLOG_SLO
+- Latency: p95 of search and extract calls since the last evaluation
+  (`provider_request_seconds`), against DEPTH_LATENCY_SLO_SECONDS. Model calls
+  are left out, as their latency follows the length of their output
+- Rate limiting: share of provider calls answered with 429 since the last
+  evaluation (`provider_requests_total`), against DEPTH_RATE_LIMIT_SLO
+
+Each breached evaluation lowers the depth one level (full -> reduced ->
+minimal): fewer results per query, fewer supervisor iterations, fewer parallel
+researchers and a hard cap on each researcher's search rounds. Depth is
+restored one level at a time after RECOVERY_EVALUATIONS healthy evaluations in
+a row, so it does not flap at the edge of an SLO.
+
+Runs read the depth at every supervisor turn and search, so long runs follow
+the load as it changes. Each run's depth decisions are logged once per change,
+with the signals behind them, and counted in metrics.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import ensure_config
+
+from deep_research_from_scratch.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURATION =====
+
+# Adaptive depth is opt-in; when off, every run uses full depth
+adaptive_depth = os.environ.get("ADAPTIVE_DEPTH", "false").lower() == "true"
+
+# Queued scheduler work (supervisor turns, researchers and provider calls) tolerated
+depth_backlog_slo = float(os.environ.get("DEPTH_BACKLOG_SLO", "8"))
+
+# p95 latency of search and extract calls tolerated, in seconds
+depth_latency_slo = float(os.environ.get("DEPTH_LATENCY_SLO_SECONDS", "10"))
+
+# Share of provider calls rate limited (HTTP 429) tolerated
+depth_rate_limit_slo = float(os.environ.get("DEPTH_RATE_LIMIT_SLO", "0.05"))
+
+# Seconds between evaluations of the load signals
+EVALUATION_INTERVAL = 10.0
+
+# Healthy evaluations in a row before depth is restored by one level
+RECOVERY_EVALUATIONS = 3
+
+# Provider calls needed in a window before its latency and 429 share are trusted
+MIN_WINDOW_REQUESTS = 5
+
+# Runs whose last decision is remembered for logging
+MAX_TRACKED_RUNS = 1024
+
+# ===== DATA STRUCTURES =====
+
+@dataclass(frozen=True)
+class ResearchDepth:
+    """Depth limits applied to a run."""
+    name: str
+    max_results: int
+    max_researcher_iterations: int
+    max_concurrent_researchers: int
+    # Search rounds per researcher; None leaves it to the prompt's tool-call budget
+    max_researcher_tool_rounds: int | None
+
+    def cap_results(self, max_results: int) -> int:
+        """Limit a search's results per query to this depth."""
+        return min(max_results, self.max_results)
+
+# Depth levels from full (the fixed defaults) to minimal
+DEPTH_LEVELS = (
+    ResearchDepth("full", max_results=3, max_researcher_iterations=6, max_concurrent_researchers=3, max_researcher_tool_rounds=None),
+    ResearchDepth("reduced", max_results=2, max_researcher_iterations=4, max_concurrent_researchers=2, max_researcher_tool_rounds=4),
+    ResearchDepth("minimal", max_results=1, max_researcher_iterations=2, max_concurrent_researchers=1, max_researcher_tool_rounds=2),
+)
+
+FULL_DEPTH = DEPTH_LEVELS[0]
+
+@dataclass
+class LoadSignals:
+    """Load signals of one evaluation window."""
+    backlog: float = 0.0
+    p95_latency: float | None = None
+    rate_limited: float | None = None
+
+    def breaches(self) -> list[str]:
+        """Describe each SLO the signals breach."""
+        reasons = []
+        if self.backlog > depth_backlog_slo:
+            reasons.append(f"backlog {self.backlog:g} > {depth_backlog_slo:g}")
+        if self.p95_latency is not None and self.p95_latency > depth_latency_slo:
+            reasons.append(f"search p95 {self.p95_latency:g}s > {depth_latency_slo:g}s")
+        if self.rate_limited is not None and self.rate_limited > depth_rate_limit_slo:
+            reasons.append(f"429 share {self.rate_limited:.0%} > {depth_rate_limit_slo:.0%}")
+        return reasons
+
+    def describe(self) -> str:
+        """Summarize the signals for log messages."""
+        latency = "n/a" if self.p95_latency is None else f"{self.p95_latency:g}s"
+        rate_limited = "n/a" if self.rate_limited is None else f"{self.rate_limited:.0%}"
+        return f"backlog {self.backlog:g}, search p95 {latency}, 429 share {rate_limited}"
+
+# ===== CONTROLLER =====
+
+def p95(bounds: tuple, counts: list, total: int) -> float:
+    """Estimate the 95th percentile from cumulative histogram buckets (upper bound of its bucket)."""
+    for bound, count in zip(bounds, counts):
+        if count >= 0.95 * total:
+            return float(bound)
+    return float("inf")
+
+class DepthController:
+    """Lowers and restores research depth from the load signals in the metrics registry."""
+
+    def __init__(self, levels: tuple = DEPTH_LEVELS):
+        """Create a controller starting at full depth (the first of `levels`)."""
+        self.levels = levels
+        self.level = 0
+        self.signals = LoadSignals()
+        self.reason = "initial"
+        self._healthy = 0
+        self._evaluated = 0.0
+        self._lock = threading.Lock()
+        self._latency = ((), [], 0)
+        self._requests: dict = {}
+        self._runs: OrderedDict[str, str] = OrderedDict()
+
+    def read_signals(self) -> LoadSignals:
+        """Read the current backlog and the latency and 429 share since the previous read."""
+        backlog = sum(metrics.series("scheduler_queued").values())
+
+        bounds, counts, total = metrics.histogram("provider_request_seconds", kind="search")
+        _, extract_counts, extract_total = metrics.histogram("provider_request_seconds", kind="extract")
+        counts = [a + b for a, b in zip(counts, extract_counts)]
+        total += extract_total
+        _, previous_counts, previous_total = self._latency
+        self._latency = (bounds, counts, total)
+        window_counts = [a - b for a, b in zip(counts, previous_counts or [0] * len(counts))]
+        window_total = total - previous_total
+
+        requests = metrics.series("provider_requests_total")
+        window = {labels: value - self._requests.get(labels, 0.0) for labels, value in requests.items()}
+        self._requests = requests
+        window_requests = sum(window.values())
+        window_429 = sum(value for labels, value in window.items() if ("status", "429") in labels)
+
+        return LoadSignals(
+            backlog=backlog,
+            p95_latency=p95(bounds, window_counts, window_total) if window_total >= MIN_WINDOW_REQUESTS else None,
+            rate_limited=window_429 / window_requests if window_requests >= MIN_WINDOW_REQUESTS else None,
+        )
+
+    def evaluate(self) -> ResearchDepth:
+        """Re-evaluate the load at most once per interval and return the current depth."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._evaluated < EVALUATION_INTERVAL:
+                return self.levels[self.level]
+            self._evaluated = now
+            self.signals = self.read_signals()
+            breaches = self.signals.breaches()
+            previous = self.level
+            if breaches:
+                self._healthy = 0
+                self.level = min(self.level + 1, len(self.levels) - 1)
+                self.reason = "; ".join(breaches)
+            else:
+                self._healthy += 1
+                if self.level and self._healthy >= RECOVERY_EVALUATIONS:
+                    self._healthy = 0
+                    self.level -= 1
+                    self.reason = f"load eased for {RECOVERY_EVALUATIONS} evaluations"
+            depth = self.levels[self.level]
+        if self.level != previous:
+            logger.warning("Research depth %s -> %s (%s)", self.levels[previous].name, depth.name, self.signals.describe())
+            metrics.inc("depth_changes_total", depth=depth.name)
+        metrics.set_gauge("research_depth_level", self.level)
+        return depth
+
+    def depth_for_run(self, run: str) -> ResearchDepth:
+        """Return the current depth for a run, logging the run's decision when it changes."""
+        depth = self.evaluate()
+        with self._lock:
+            changed = self._runs.get(run) != depth.name
+            self._runs[run] = depth.name
+            self._runs.move_to_end(run)
+            while len(self._runs) > MAX_TRACKED_RUNS:
+                self._runs.popitem(last=False)
+            reason, signals = self.reason, self.signals
+        if changed:
+            logger.info(
+                "Run %s: research depth %s (results/query %d, iterations %d, researchers %d, researcher rounds %s) - %s; %s",
+                run, depth.name, depth.max_results, depth.max_researcher_iterations, depth.max_concurrent_researchers,
+                depth.max_researcher_tool_rounds or "prompt", reason, signals.describe(),
+            )
+            metrics.inc("depth_decisions_total", depth=depth.name)
+        return depth
+
+depth_controller = DepthController()
+
+def run_depth(config: RunnableConfig | None = None) -> ResearchDepth:
+    """Get the research depth for the current run (full depth unless ADAPTIVE_DEPTH is on).
+
+    Args:
+        config: Run config; defaults to the config of the running graph
+
+    Returns:
+        Depth limits for the run's next supervisor turn, researcher round or search
+    """
+    if not adaptive_depth:
+        return FULL_DEPTH
+    thread_id = ensure_config(config).get("configurable", {}).get("thread_id", "default")
+    return depth_controller.depth_for_run(str(thread_id))
+
+metrics.describe("research_depth_level", "Adaptive research depth level (0 full, 1 reduced, 2 minimal)")
+metrics.describe("depth_decisions_total", "Per-run research depth decisions by depth")
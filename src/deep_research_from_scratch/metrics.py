@@ -0,0 +1,269 @@
+"""In-Process Metrics Registry.
+
+This module provides a small, thread-safe registry of labelled counters, gauges
+and histograms that the research agents use to report operational numbers such
+as cached vs uncached input tokens, cache hit ratios, in-flight runs, queued
+research and provider latencies.
+
+The registry renders the Prometheus text exposition format, served at /metrics
+by the LangGraph server (see metrics_app.py). Runs and model token usage are
+instrumented through a LangChain configure hook, so every graph reports them.
+"""
+
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+# ===== CONFIGURATION =====
+
+# Prefix of every exported metric name
+metric_prefix = "deep_research_"
+
+# Histogram buckets in seconds, from fast searches to full research runs
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+# ===== REGISTRY =====
+
+class MetricsRegistry:
+    """Thread-safe registry of counters, gauges and histograms keyed by metric name and label set."""
+
+    def __init__(self):
+        """Create an empty registry."""
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.gauges = defaultdict(float)
+        self.histograms: dict[tuple, list] = {}
+        self.buckets: dict[str, tuple] = {}
+        self.descriptions: dict[str, str] = {}
+        self.collectors: list[Callable[[MetricsRegistry], None]] = []
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return (name, tuple(sorted((key, str(value)) for key, value in labels.items())))
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        """Increment a counter by the given value."""
+        with self._lock:
+            self.counters[self._key(name, labels)] += value
+
+    def get(self, name: str, **labels) -> float:
+        """Return the current value of a counter (0 if never incremented)."""
+        with self._lock:
+            return self.counters.get(self._key(name, labels), 0.0)
+
+    def snapshot(self) -> dict:
+        """Return a copy of all counters as {(name, labels): value}."""
+        with self._lock:
+            return dict(self.counters)
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        """Set a gauge to a value."""
+        with self._lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def add_gauge(self, name: str, delta: float, **labels) -> None:
+        """Move a gauge up or down."""
+        with self._lock:
+            self.gauges[self._key(name, labels)] += delta
+
+    def get_gauge(self, name: str, **labels) -> float:
+        """Return the current value of a gauge (0 if never set)."""
+        with self._lock:
+            return self.gauges.get(self._key(name, labels), 0.0)
+
+    @contextmanager
+    def track(self, name: str, **labels):
+        """Count the block as in progress on a gauge while it runs."""
+        self.add_gauge(name, 1, **labels)
+        try:
+            yield
+        finally:
+            self.add_gauge(name, -1, **labels)
+
+    def observe(self, name: str, value: float, buckets: tuple | None = None, **labels) -> None:
+        """Record an observation in a histogram."""
+        with self._lock:
+            bounds = self.buckets.setdefault(name, tuple(buckets or DEFAULT_BUCKETS))
+            key = self._key(name, labels)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(bounds), 0.0, 0]
+            for i, bound in enumerate(bounds):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def series(self, name: str) -> dict:
+        """Return all counter and gauge series of a metric as {((label, value), ...): value}."""
+        with self._lock:
+            return {
+                labels: value
+                for series in (self.counters, self.gauges)
+                for (metric, labels), value in series.items() if metric == name
+            }
+
+    def histogram(self, name: str, **labels) -> tuple[tuple, list, int]:
+        """Return (bounds, bucket counts, count) of a histogram, summed over series with the given labels."""
+        wanted = {(key, str(value)) for key, value in labels.items()}
+        with self._lock:
+            bounds = self.buckets.get(name, ())
+            counts, total = [0] * len(bounds), 0
+            for (metric, series_labels), (series_counts, _, count) in self.histograms.items():
+                if metric == name and wanted <= set(series_labels):
+                    counts = [a + b for a, b in zip(counts, series_counts)]
+                    total += count
+        return bounds, counts, total
+
+    def describe(self, name: str, text: str) -> None:
+        """Set the HELP text of a metric."""
+        self.descriptions[name] = text
+
+    def register_collector(self, collector: Callable[["MetricsRegistry"], None]) -> None:
+        """Register a function that refreshes computed gauges before each export."""
+        self.collectors.append(collector)
+
+    # ----- exposition -----
+
+    @staticmethod
+    def _value(value: float) -> str:
+        """Format a sample value without losing precision (integers stay integers)."""
+        value = float(value)
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return str(int(value)) if value.is_integer() else repr(value)
+
+    @staticmethod
+    def _labels(labels: tuple, extra: tuple | None = None) -> str:
+        pairs = list(labels) + list(extra or ())
+        if not pairs:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+        return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        for collector in self.collectors:
+            collector(self)
+
+        with self._lock:
+            families: dict[str, tuple[str, list]] = {}
+            for kind, series in (("counter", self.counters), ("gauge", self.gauges)):
+                for (name, labels), value in sorted(series.items()):
+                    families.setdefault(name, (kind, []))[1].append(f"{metric_prefix}{name}{self._labels(labels)} {self._value(value)}")
+            for (name, labels), (counts, total, count) in sorted(self.histograms.items()):
+                lines = families.setdefault(name, ("histogram", []))[1]
+                full_name = metric_prefix + name
+                for bound, bucket_count in zip(self.buckets[name], counts):
+                    lines.append(f"{full_name}_bucket{self._labels(labels, (('le', f'{bound:g}'),))} {bucket_count}")
+                lines.append(f"{full_name}_bucket{self._labels(labels, (('le', '+Inf'),))} {count}")
+                lines.append(f"{full_name}_sum{self._labels(labels)} {self._value(total)}")
+                lines.append(f"{full_name}_count{self._labels(labels)} {count}")
+
+            output = []
+            for name in sorted(families):
+                kind, lines = families[name]
+                if name in self.descriptions:
+                    output.append(f"# HELP {metric_prefix}{name} {self.descriptions[name]}")
+                output.append(f"# TYPE {metric_prefix}{name} {kind}")
+                output.extend(lines)
+        return "\n".join(output) + "\n"
+
+# Process-wide registry shared by all graphs
+metrics = MetricsRegistry()
+
+# ===== GRAPH INSTRUMENTATION =====
+
+class RunMetricsHandler(BaseCallbackHandler):
+    """Callback handler reporting in-flight runs, run durations and model token usage."""
+
+    run_inline = True
+
+    def __init__(self, window_seconds: float = 60.0):
+        """Create a handler whose tokens-per-minute gauge covers the last `window_seconds`."""
+        self._lock = threading.Lock()
+        self._runs: dict[UUID, tuple[str, float]] = {}
+        self._models: dict[UUID, str] = {}
+        self._tokens: deque = deque()
+        self.window_seconds = window_seconds
+
+    def on_chain_start(self, serialized: Any, inputs: Any, *, run_id: UUID, parent_run_id: UUID | None = None, metadata: dict | None = None, **kwargs: Any) -> None:
+        """Count a root run as in flight."""
+        if parent_run_id is not None:
+            return
+        graph = str((metadata or {}).get("graph_id") or kwargs.get("name") or "unknown")
+        with self._lock:
+            self._runs[run_id] = (graph, time.monotonic())
+        metrics.add_gauge("runs_in_flight", 1, graph=graph)
+
+    def _finish_run(self, run_id: UUID, status: str) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        graph, started = run
+        metrics.add_gauge("runs_in_flight", -1, graph=graph)
+        metrics.observe("run_duration_seconds", time.monotonic() - started, graph=graph, status=status)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        """Record a completed root run."""
+        self._finish_run(run_id, "completed")
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        """Record a failed root run."""
+        self._finish_run(run_id, "failed")
+
+    def on_chat_model_start(self, serialized: Any, messages: Any, *, run_id: UUID, metadata: dict | None = None, **kwargs: Any) -> None:
+        """Remember the model of a chat model call."""
+        with self._lock:
+            self._models[run_id] = str((metadata or {}).get("ls_model_name", "unknown"))
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        """Count a model call's input and output tokens."""
+        with self._lock:
+            model = self._models.pop(run_id, "unknown")
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        metrics.inc("llm_tokens_total", input_tokens, model=model, type="input")
+        metrics.inc("llm_tokens_total", output_tokens, model=model, type="output")
+        with self._lock:
+            self._tokens.append((time.monotonic(), input_tokens + output_tokens))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        """Forget a failed model call."""
+        with self._lock:
+            self._models.pop(run_id, None)
+
+    def collect(self, registry: MetricsRegistry) -> None:
+        """Refresh the tokens-per-minute gauge from the sliding window."""
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            while self._tokens and self._tokens[0][0] < cutoff:
+                self._tokens.popleft()
+            tokens = sum(count for _, count in self._tokens)
+        registry.set_gauge("llm_tokens_per_minute", tokens * 60.0 / self.window_seconds)
+
+run_metrics_handler = RunMetricsHandler()
+metrics.register_collector(run_metrics_handler.collect)
+
+run_metrics_handler_var: ContextVar[RunMetricsHandler | None] = ContextVar("run_metrics_handler", default=run_metrics_handler)
+register_configure_hook(run_metrics_handler_var, inheritable=True)
+
+metrics.describe("runs_in_flight", "Graph runs currently executing")
+metrics.describe("run_duration_seconds", "Duration of graph runs")
+metrics.describe("llm_tokens_total", "Model input and output tokens")
+metrics.describe("llm_tokens_per_minute", "Model tokens over the last minute")
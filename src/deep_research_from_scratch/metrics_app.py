@@ -0,0 +1,50 @@
+"""Prometheus Scrape Endpoint for the Research Server.
+
+A Starlette app mounted next to the LangGraph API (see the "http" entry in
+langgraph.json), so `langgraph dev` / `langgraph up` serve the process's
+metrics registry at:
+
+    GET /metrics   (Prometheus text exposition format)
+
+Starlette ships with the LangGraph server; this module is only imported by it.
+Metrics of researchers running on worker processes (EXECUTION_BACKEND=workers)
+stay in those processes and are not included.
+
+The app's lifespan also runs the periodic checkpoint compaction (see
+checkpointing.py) when CHECKPOINT_COMPACTION_INTERVAL_HOURS is set.
+"""
+
+import asyncio
+import contextlib
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from deep_research_from_scratch.checkpointing import (
+    compaction_interval_hours,
+    run_periodic_compaction,
+)
+from deep_research_from_scratch.metrics import metrics
+
+# Content type of the Prometheus text format
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    """Render the metrics registry for a Prometheus scrape."""
+    return PlainTextResponse(metrics.render_prometheus(), headers={"Content-Type": PROMETHEUS_CONTENT_TYPE})
+
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette):
+    """Run periodic checkpoint compaction for the lifetime of the server."""
+    task = asyncio.create_task(run_periodic_compaction()) if compaction_interval_hours > 0 else None
+    try:
+        yield
+    finally:
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+app = Starlette(routes=[Route("/metrics", metrics_endpoint)], lifespan=lifespan)
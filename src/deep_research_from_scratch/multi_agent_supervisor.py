@@ -10,29 +10,35 @@ The supervisor uses parallel research execution to improve efficiency while
 maintaining isolated context windows for each research topic.
 """
 
-import asyncio
-
 from typing_extensions import Literal
 
 from langchain.chat_models import init_chat_model
 from langchain_core.messages import (
     HumanMessage, 
     BaseMessage, 
-    SystemMessage, 
     ToolMessage,
     filter_messages
 )
+from langchain_core.runnables.config import ensure_config
 from langgraph.graph import StateGraph, START, END
 from langgraph.types import Command
 
+from deep_research_from_scratch.cancellation import gather_cancellable
+from deep_research_from_scratch.execution_backend import InProcessBackend, get_execution_backend
+from deep_research_from_scratch.convergence import convergence_action, convergence_advice, has_converged, measure_gain, record_gain
+from deep_research_from_scratch.hedging import with_hedging
+from deep_research_from_scratch.load_control import FULL_DEPTH, run_depth
+from deep_research_from_scratch.prefetch import prefetch_scope
+from deep_research_from_scratch.metrics import metrics
+from deep_research_from_scratch.prompt_cache import build_cached_prompt, record_prompt_usage, split_prompt
 from deep_research_from_scratch.prompts import lead_researcher_prompt
-from deep_research_from_scratch.research_agent import researcher_agent
+from deep_research_from_scratch.scheduler import provider_slot, run_priority, scheduler
 from deep_research_from_scratch.state_multi_agent_supervisor import (
     SupervisorState, 
     ConductResearch, 
     ResearchComplete
 )
-from deep_research_from_scratch.utils import get_today_str, think_tool
+from deep_research_from_scratch.utils import current_source_registry, get_today_str, think_tool, prefetch_research_topic
 
 def get_notes_from_tool_calls(messages: list[BaseMessage]) -> list[str]:
     """Extract research notes from ToolMessage objects in supervisor message history.
@@ -49,7 +55,8 @@ def get_notes_from_tool_calls(messages: list[BaseMessage]) -> list[str]:
     Returns:
         List of research note strings extracted from ToolMessage objects
     """
-    return [tool_msg.content for tool_msg in filter_messages(messages, include_types="tool")]
+    # Research declined under load (status "error") produced no findings
+    return [tool_msg.content for tool_msg in filter_messages(messages, include_types="tool") if tool_msg.status != "error"]
 
 # Ensure async compatibility for Jupyter environments
 try:
@@ -70,16 +77,17 @@ except ImportError:
 supervisor_tools = [ConductResearch, ResearchComplete, think_tool]
 # Primary: Google Gemini | Alternatives: "openai:gpt-4.1", "anthropic:claude-sonnet-4-20250514"
 supervisor_model = init_chat_model(model="gemini-2.5-pro", model_provider="google_genai", temperature=0.0)
-supervisor_model_with_tools = supervisor_model.bind_tools(supervisor_tools)
+# Opt-in hedging: duplicate the supervisor call if it runs past its learned p95
+supervisor_model_with_tools = with_hedging(supervisor_model, "supervisor", tools=supervisor_tools, temperature=0.0)
 
-# System constants
+# System constants (at full depth; lowered under load when ADAPTIVE_DEPTH is on)
 # Maximum number of tool call iterations for individual researcher agents
 # This prevents infinite loops and controls research depth per topic
-max_researcher_iterations = 6 # Calls to think_tool + ConductResearch
+max_researcher_iterations = FULL_DEPTH.max_researcher_iterations # Calls to think_tool + ConductResearch
 
 # Maximum number of concurrent research agents the supervisor can launch
 # This is passed to the lead_researcher_prompt to limit parallel research tasks
-max_concurrent_researchers = 3
+max_concurrent_researchers = FULL_DEPTH.max_concurrent_researchers
 
 # ===== SUPERVISOR NODES =====
 
@@ -99,16 +107,21 @@ async def supervisor(state: SupervisorState) -> Command[Literal["supervisor_tool
     """
     supervisor_messages = state.get("supervisor_messages", [])
 
-    # Prepare system message with current date and constraints
-    system_message = lead_researcher_prompt.format(
-        date=get_today_str(), 
-        max_concurrent_research_units=max_concurrent_researchers,
-        max_researcher_iterations=max_researcher_iterations
+    # Prepare system message with current date and constraints at the run's current depth;
+    # with prompt caching they are sent after the history so the prefix stays stable
+    depth = run_depth()
+    system_message, run_context = split_prompt(
+        lead_researcher_prompt,
+        date=get_today_str(),
+        max_concurrent_research_units=depth.max_concurrent_researchers,
+        max_researcher_iterations=depth.max_researcher_iterations
     )
-    messages = [SystemMessage(content=system_message)] + supervisor_messages
+    messages = build_cached_prompt(system_message, supervisor_messages, supervisor_model, run_context)
 
-    # Make decision about next research steps
-    response = await supervisor_model_with_tools.ainvoke(messages)
+    # Make decision about next research steps, in priority order with all other runs' work
+    async with scheduler.slot(run_priority(), kind="supervisor"), provider_slot("model"):
+        response = await supervisor_model_with_tools.ainvoke(messages)
+    record_prompt_usage("supervisor", system_message, response)
 
     return Command(
         goto="supervisor_tools",
@@ -144,7 +157,8 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["superviso
     should_end = False
 
     # Check exit criteria first
-    exceeded_iterations = research_iterations >= max_researcher_iterations
+    depth = run_depth()
+    exceeded_iterations = research_iterations >= depth.max_researcher_iterations
     no_tool_calls = not most_recent_message.tool_calls
     research_complete = any(
         tool_call["name"] == "ResearchComplete" 
@@ -169,6 +183,19 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["superviso
                 if tool_call["name"] == "ConductResearch"
             ]
 
+            # Under load, research beyond the reduced fan-out is declined rather than queued
+            if depth is not FULL_DEPTH:
+                for tool_call in conduct_research_calls[depth.max_concurrent_researchers:]:
+                    tool_messages.append(
+                        ToolMessage(
+                            content=f"Not researched: the system is under load and runs at most {depth.max_concurrent_researchers} research unit(s) at a time. Delegate it again later if it is still needed.",
+                            name=tool_call["name"],
+                            tool_call_id=tool_call["id"],
+                            status="error",
+                        )
+                    )
+                conduct_research_calls = conduct_research_calls[:depth.max_concurrent_researchers]
+
             # Handle think_tool calls (synchronous)
             for tool_call in think_tool_calls:
                 observation = think_tool.invoke(tool_call["args"])
@@ -182,19 +209,30 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["superviso
 
             # Handle ConductResearch calls (asynchronous)
             if conduct_research_calls:
-                # Launch parallel research agents
-                coros = [
-                    researcher_agent.ainvoke({
-                        "researcher_messages": [
-                            HumanMessage(content=tool_call["args"]["research_topic"])
-                        ],
-                        "research_topic": tool_call["args"]["research_topic"]
-                    }) 
-                    for tool_call in conduct_research_calls
-                ]
-
-                # Wait for all research to complete
-                tool_results = await asyncio.gather(*coros)
+                # Researchers run in this process or on workers, depending on EXECUTION_BACKEND
+                execution_backend = get_execution_backend()
+                thread_id = ensure_config().get("configurable", {}).get("thread_id")
+                priority = run_priority()
+
+                async def run_researcher(research_topic: str) -> dict:
+                    # Each researcher holds a scheduler slot, released even if the run is cancelled
+                    async with scheduler.slot(priority, kind="researcher"):
+                        with metrics.track("researchers_active"):
+                            return await execution_backend.run_researcher(research_topic, thread_id)
+
+                # Prefetches belong to this step: unused ones are cancelled when it ends
+                async with prefetch_scope():
+                    # Warm searches while each in-process researcher makes its first model call
+                    if isinstance(execution_backend, InProcessBackend):
+                        for tool_call in conduct_research_calls:
+                            prefetch_research_topic(tool_call["args"]["research_topic"])
+
+                    # Launch parallel research agents and wait for all research to complete;
+                    # if the run is cancelled or one researcher fails, the others are cancelled too
+                    tool_results = await gather_cancellable(
+                        run_researcher(tool_call["args"]["research_topic"])
+                        for tool_call in conduct_research_calls
+                    )
 
                 # Format research results as tool messages
                 # Each sub-agent returns compressed research findings in result["compressed_research"]
@@ -216,6 +254,21 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["superviso
                     for result in tool_results
                 ]
 
+                # Measure how much this round added over earlier rounds
+                previous_research = [
+                    msg.content for msg in filter_messages(supervisor_messages, include_types="tool")
+                    if msg.name == "ConductResearch" and msg.status != "error"
+                ]
+                gain = measure_gain(previous_research, [msg.content for msg in research_tool_messages], current_source_registry())
+                converged = has_converged(gain, first_round=not previous_research)
+                record_gain(research_iterations, gain, converged)
+
+                if converged and convergence_action == "stop":
+                    should_end = True
+                    next_step = END
+                elif converged and convergence_action == "advise":
+                    tool_messages.append(HumanMessage(content=convergence_advice(gain)))
+
         except Exception as e:
             print(f"Error in supervisor tools: {e}")
             should_end = True
@@ -226,8 +279,10 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["superviso
         return Command(
             goto=next_step,
             update={
-                "notes": get_notes_from_tool_calls(supervisor_messages),
-                "research_brief": state.get("research_brief", "")
+                # Include this round's results when research ends right after it
+                "notes": get_notes_from_tool_calls(supervisor_messages + tool_messages),
+                "research_brief": state.get("research_brief", ""),
+                "raw_notes": all_raw_notes
             }
         )
     else:
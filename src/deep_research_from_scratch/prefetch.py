@@ -0,0 +1,188 @@
+"""Speculative Search Prefetch for Delegated Research Topics.
+
+When the supervisor issues a `ConductResearch` topic, the new researcher first
+spends a full model round trip deciding on its first query. This module extracts
+likely queries from the topic text (heuristically, or with a cheap model) and
+starts the search-and-summarize pipeline in the background while that first call
+runs. A researcher's `tavily_search` whose normalized query equals a prefetched
+one takes over the warmed result.
+
+Prefetches are scoped to the supervisor step that delegated the topics: they
+run as tasks on the run's event loop, in the run's context, so their searches
+hold provider slots like any other search, and the ones no researcher used are
+cancelled with the step (or with the run).
+"""
+
+import asyncio
+import logging
+import os
+import re
+import unicodedata
+from collections import Counter
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Awaitable
+
+from langchain.chat_models import init_chat_model
+from langchain_core.messages import HumanMessage
+from pydantic import BaseModel, Field
+
+from deep_research_from_scratch.metrics import metrics
+from deep_research_from_scratch.scheduler import provider_slot
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURATION =====
+
+# Prefetching is opt-in since speculative searches may go unused
+speculative_prefetch = os.environ.get("SPECULATIVE_PREFETCH", "false").lower() == "true"
+
+# Optional cheap model for query extraction, e.g. "google_genai:gemini-2.5-flash-lite".
+# When empty, a keyword heuristic is used instead.
+prefetch_query_model = os.environ.get("PREFETCH_QUERY_MODEL", "")
+
+# Number of candidate queries prefetched per research topic
+max_prefetch_queries = 2
+
+# Fraction of the shorter query's terms that must overlap for two candidates to count as duplicates
+prefetch_match_threshold = 0.6
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have how in into is it its of on or that the their
+this to was were what when where which who why will with about between including such
+research investigate find information details detailed specific provide identify
+""".split())
+
+# ===== QUERY NORMALIZATION =====
+
+def query_terms(query: str) -> list[str]:
+    """Split a query into lowercase content terms without punctuation or stopwords."""
+    return [t for t in re.findall(r"[a-z0-9]+", query.lower()) if t not in STOPWORDS]
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for cache keys.
+
+    Case (casefold), Unicode compatibility forms (NFKC) and runs of whitespace
+    are normalized; word order, symbols such as "C++" and "C#", and non-Latin
+    scripts are kept, so distinct queries never share a key.
+    """
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+def term_overlap(a: str, b: str) -> float:
+    """Return the overlap coefficient between the content terms of two queries."""
+    terms_a, terms_b = set(query_terms(a)), set(query_terms(b))
+    if not terms_a or not terms_b:
+        return 0.0
+    return len(terms_a & terms_b) / min(len(terms_a), len(terms_b))
+
+# ===== QUERY EXTRACTION =====
+
+class PrefetchQueries(BaseModel):
+    """Schema for candidate search queries extracted from a research topic."""
+    queries: list[str] = Field(description="Short web search queries a researcher would run first for this topic.")
+
+async def extract_candidate_queries(topic: str, max_queries: int = max_prefetch_queries) -> list[str]:
+    """Extract likely first search queries from a research topic.
+
+    Args:
+        topic: Research topic text issued by the supervisor
+        max_queries: Maximum number of queries to return
+
+    Returns:
+        List of candidate search queries
+    """
+    if prefetch_query_model:
+        try:
+            model = init_chat_model(prefetch_query_model, temperature=0.0).with_structured_output(PrefetchQueries)
+            async with provider_slot("model"):
+                response = await model.ainvoke([HumanMessage(content=(
+                    f"List up to {max_queries} concise web search queries to start researching this topic:\n\n{topic}"
+                ))])
+            return response.queries[:max_queries]
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Prefetch query model failed, falling back to heuristic: %s", e)
+
+    # Heuristic: the lead sentence's key terms, then the most frequent terms of the rest
+    candidates = []
+    lead_sentence, _, remainder = topic.strip().partition(". ")
+    lead_terms = query_terms(lead_sentence)[:10]
+    if lead_terms:
+        candidates.append(" ".join(lead_terms))
+    frequent_terms = [term for term, _ in Counter(query_terms(remainder)).most_common(8)]
+    if frequent_terms:
+        candidates.append(" ".join(frequent_terms))
+
+    # Drop candidates that would match an earlier one anyway
+    unique = []
+    for query in candidates:
+        if all(term_overlap(query, other) < prefetch_match_threshold for other in unique):
+            unique.append(query)
+    return unique[:max_queries]
+
+# ===== SPECULATIVE CACHE =====
+
+class SpeculativeSearchCache:
+    """Speculative searches of one supervisor step, running as tasks on its event loop."""
+
+    def __init__(self):
+        """Create an empty cache with no speculative searches."""
+        self.entries: dict[tuple, asyncio.Task] = {}
+        self.tasks: set[asyncio.Task] = set()
+
+    def spawn(self, coroutine: Awaitable) -> asyncio.Task:
+        """Run a coroutine as a task owned by this cache, cancelled when the cache is closed."""
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def start(self, query: str, max_results: int, topic: str, search: Awaitable[str]) -> None:
+        """Start a speculative search unless the same normalized query is already prefetched."""
+        key = (normalize_query(query), max_results, topic)
+        if key in self.entries:
+            search.close()
+            return
+        self.entries[key] = self.spawn(search)
+
+    def take(self, query: str, max_results: int, topic: str) -> asyncio.Task | None:
+        """Remove and return the prefetched search for exactly this normalized query, if any.
+
+        The caller owns the returned task: each prefetch is used at most once.
+        """
+        task = self.entries.pop((normalize_query(query), max_results, topic), None)
+        if task is not None:
+            self.tasks.discard(task)
+        return task
+
+    async def aclose(self) -> None:
+        """Cancel the prefetches no researcher took over and wait for them to finish."""
+        self.entries.clear()
+        pending = list(self.tasks)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            metrics.inc("prefetches_unused_total", len(pending))
+
+# Prefetch cache of the current supervisor step, inherited by its researchers
+current_speculative_cache: ContextVar[SpeculativeSearchCache | None] = ContextVar("speculative_search_cache", default=None)
+
+@asynccontextmanager
+async def prefetch_scope():
+    """Scope speculative searches to a block, e.g. the researchers of one supervisor step.
+
+    Yields the scope's cache (None when SPECULATIVE_PREFETCH is off). Unused
+    prefetches are cancelled when the block exits, including by cancellation.
+    """
+    if not speculative_prefetch:
+        yield None
+        return
+    cache = SpeculativeSearchCache()
+    token = current_speculative_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        current_speculative_cache.reset(token)
+        await cache.aclose()
@@ -0,0 +1,236 @@
+"""Automatic Profile Capture for Slow Runs.
+
+Occasionally a full research run takes far longer than normal, and by the time
+anyone notices there is nothing left to look at. With slow-run profiling
+enabled, every run of the full agent is observed cheaply:
+- A callback handler records a per-node timeline (start, end and duration of
+  every graph node, including the supervisor's and researchers' subgraph nodes)
+- Once a run has taken half of PROFILE_THRESHOLD_SECONDS, a sampler thread
+  takes stack samples of all threads at a low rate and aggregates them as
+  collapsed stacks. Samples are not attributed to a run (that would mean
+  walking every frame's locals), so runs sampled at the same time share them
+- When a run exceeds PROFILE_THRESHOLD_SECONDS, its profile is written to
+  PROFILE_DIR/<thread_id>/: `<timestamp>.collapsed` (flamegraph.pl / speedscope
+  compatible) and `<timestamp>.timeline.json`. A profile is first written when
+  the threshold is crossed, so hung runs are captured too, and rewritten when
+  the run ends
+
+Runs that finish in under half the threshold only cost the node bookkeeping;
+nothing is sampled or written.
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from deep_research_from_scratch.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURATION =====
+
+# Slow-run profiling is opt-in
+profile_slow_runs = os.environ.get("PROFILE_SLOW_RUNS", "false").lower() == "true"
+
+# Runs slower than this are profiled, in seconds
+profile_threshold_seconds = float(os.environ.get("PROFILE_THRESHOLD_SECONDS", "600"))
+
+# Directory holding one sub-directory of profiles per thread_id
+profile_dir = Path(os.environ.get("PROFILE_DIR", ".langgraph_api/profiles"))
+
+# Seconds between stack samples
+profile_sample_interval = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", "0.5"))
+
+# Runs are sampled once they have taken this share of the threshold
+SAMPLE_AFTER_RATIO = 0.5
+
+# Frames of the idle event loop, reported as a single "[idle]" frame
+IDLE_FRAMES = {"select", "poll", "epoll", "_run_once", "wait"}
+
+# ===== DATA STRUCTURES =====
+
+@dataclass
+class NodeSpan:
+    """One execution of a graph node."""
+    node: str
+    started: float
+    ended: float | None = None
+    error: str | None = None
+
+@dataclass
+class RunProfile:
+    """Timeline and stack samples of one run."""
+    thread_id: str
+    started_at: float
+    started: float
+    spans: dict = field(default_factory=dict)
+    samples: Counter = field(default_factory=Counter)
+    children: set = field(default_factory=set)
+    written: bool = False
+
+    def timeline(self, now: float) -> list[dict]:
+        """Return the node spans in start order, with offsets from the run's start."""
+        rows = []
+        for span in sorted(self.spans.values(), key=lambda span: span.started):
+            ended = span.ended if span.ended is not None else now
+            rows.append({
+                "node": span.node,
+                "start_seconds": round(span.started - self.started, 3),
+                "duration_seconds": round(ended - span.started, 3),
+                "finished": span.ended is not None,
+                **({"error": span.error} if span.error else {}),
+            })
+        return rows
+
+# ===== PROFILER =====
+
+def node_path(metadata: dict) -> str:
+    """Turn a checkpoint namespace like "a:uuid|b:uuid" into "a/b"."""
+    namespace = metadata.get("langgraph_checkpoint_ns") or metadata.get("langgraph_node", "")
+    return "/".join(re.sub(r":.*$", "", part) for part in namespace.split("|"))
+
+def collapse_stack(frame) -> str:
+    """Render a stack as a collapsed-stack line ("outer;...;inner")."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        names.append(f"{module}:{code.co_name}")
+        frame = frame.f_back
+    names.reverse()
+    if names and names[-1].rsplit(":", 1)[-1] in IDLE_FRAMES:
+        return "[idle]"
+    return ";".join(names)
+
+class SlowRunProfiler(BaseCallbackHandler):
+    """Callback handler that profiles runs and writes profiles of slow ones."""
+
+    run_inline = True
+
+    def __init__(self, threshold_seconds: float = profile_threshold_seconds, directory: Path = profile_dir):
+        """Create a profiler writing profiles of runs slower than the threshold under `directory`."""
+        self.threshold_seconds = threshold_seconds
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._runs: dict[UUID, RunProfile] = {}
+        self._roots: dict[UUID, UUID] = {}
+        self._sampler: threading.Thread | None = None
+
+    # ----- timeline -----
+
+    def on_chain_start(self, serialized: Any, inputs: Any, *, run_id: UUID, parent_run_id: UUID | None = None, metadata: dict | None = None, **kwargs: Any) -> None:
+        """Start profiling a root run, or track a chain of a profiled run and open its node span."""
+        metadata = metadata or {}
+        with self._lock:
+            if parent_run_id is None:
+                self._runs[run_id] = RunProfile(str(metadata.get("thread_id", "default")), time.time(), time.monotonic())
+                self._roots[run_id] = run_id
+                self._ensure_sampler()
+                return
+            root = self._roots.get(parent_run_id)
+            if root is None:
+                return
+            self._roots[run_id] = root
+            self._runs[root].children.add(run_id)
+            # Node runs are named after their node; other chains (subgraphs, tools) only pass through
+            if metadata.get("langgraph_node") and kwargs.get("name") == metadata["langgraph_node"]:
+                self._runs[root].spans[run_id] = NodeSpan(node_path(metadata), time.monotonic())
+
+    def _finish(self, run_id: UUID, error: BaseException | None = None) -> None:
+        with self._lock:
+            root = self._roots.pop(run_id, None)
+            if root is None:
+                return
+            profile = self._runs[root]
+            span = profile.spans.get(run_id)
+            if span is not None:
+                span.ended = time.monotonic()
+                span.error = type(error).__name__ if error else None
+            if root != run_id:
+                profile.children.discard(run_id)
+                return
+            del self._runs[root]
+            # Chains that never reported their end (e.g. cancelled ones) go with their run
+            for child in profile.children:
+                self._roots.pop(child, None)
+        elapsed = time.monotonic() - profile.started
+        if elapsed >= self.threshold_seconds:
+            self.write_profile(profile)
+            logger.warning("Slow run %s took %.1fs; profile written to %s", profile.thread_id, elapsed, self.directory / profile.thread_id)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        """Close a node span, or finish a root run."""
+        self._finish(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        """Close a failed node span, or finish a failed root run."""
+        self._finish(run_id, error)
+
+    # ----- sampling -----
+
+    def _ensure_sampler(self) -> None:
+        if self._sampler is None or not self._sampler.is_alive():
+            self._sampler = threading.Thread(target=self._sample, name="slow-run-profiler", daemon=True)
+            self._sampler.start()
+
+    def _sample(self) -> None:
+        """Sample all threads while runs near or past the threshold are active."""
+        me = threading.get_ident()
+        sample_after = SAMPLE_AFTER_RATIO * self.threshold_seconds
+        while True:
+            time.sleep(profile_sample_interval)
+            now = time.monotonic()
+            with self._lock:
+                profiles = [profile for profile in self._runs.values() if now - profile.started >= sample_after]
+            if not profiles:
+                continue
+            stacks = [collapse_stack(frame) for ident, frame in sys._current_frames().items() if ident != me]
+            with self._lock:
+                for profile in profiles:
+                    profile.samples.update(stacks)
+            for profile in profiles:
+                if not profile.written and now - profile.started >= self.threshold_seconds:
+                    self.write_profile(profile)
+
+    # ----- artifacts -----
+
+    def write_profile(self, profile: RunProfile) -> Path:
+        """Write the collapsed stacks and node timeline of a run."""
+        directory = self.directory / re.sub(r"[^\w.-]", "_", profile.thread_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = directory / time.strftime("%Y%m%dT%H%M%S", time.localtime(profile.started_at))
+        now = time.monotonic()
+        with self._lock:
+            samples = list(profile.samples.items())
+            timeline = profile.timeline(now)
+        stem.with_suffix(".collapsed").write_text(
+            "".join(f"{stack} {count}\n" for stack, count in sorted(samples)), encoding="utf-8"
+        )
+        stem.with_suffix(".timeline.json").write_text(json.dumps({
+            "thread_id": profile.thread_id,
+            "elapsed_seconds": round(now - profile.started, 3),
+            "threshold_seconds": self.threshold_seconds,
+            "sample_interval_seconds": profile_sample_interval,
+            "nodes": timeline,
+        }, indent=2), encoding="utf-8")
+        if not profile.written:
+            metrics.inc("slow_runs_profiled_total")
+        profile.written = True
+        return stem
+
+def with_profiling(graph):
+    """Attach the slow-run profiler to a compiled graph when profiling is enabled."""
+    if not profile_slow_runs:
+        return graph
+    return graph.with_config(callbacks=[SlowRunProfiler()])
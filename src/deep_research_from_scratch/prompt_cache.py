@@ -0,0 +1,139 @@
+"""Prompt Prefix Caching for the Stable System Prompts.
+
+The researcher, compression and supervisor prompts are large, fixed prefixes that
+are resent on every call and by every sub-agent. This module keeps those prefixes
+byte-stable at the head of each request so the provider can serve them from its
+context cache, and reports cached vs uncached input tokens to the metrics registry.
+Values that change between runs (today's date, the supervisor's depth limits under
+load) are moved out of the prefix into a trailing run context message.
+
+Backends:
+- "provider": Relies on the provider's own caching. Gemini 2.5 caches stable
+  prefixes implicitly; Anthropic models get an explicit `cache_control` marker on
+  the system prompt. Cached token counts come from the response usage metadata.
+- "local": A stand-in that simulates cache hits for stable prefixes, so caching
+  behavior and metrics can be exercised without a provider.
+"""
+
+import hashlib
+import os
+import time
+from typing import Any, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from deep_research_from_scratch.metrics import metrics
+
+# ===== CONFIGURATION =====
+
+# Prompt caching is opt-in
+prompt_caching = os.environ.get("PROMPT_CACHING", "false").lower() == "true"
+
+# Backend used for cache accounting: "provider" or "local"
+prompt_cache_backend = os.environ.get("PROMPT_CACHE_BACKEND", "provider")
+
+# How long the local stand-in keeps a prefix warm
+local_cache_ttl_seconds = 300
+
+# ===== LOCAL STAND-IN =====
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the token count of a text (about 4 characters per token)."""
+    return max(1, len(text) // 4)
+
+class LocalPromptCache:
+    """Simulated provider cache keyed by the hash of the prompt prefix."""
+
+    def __init__(self, ttl_seconds: float = local_cache_ttl_seconds):
+        """Create an empty cache whose entries stay warm for `ttl_seconds`."""
+        self.ttl_seconds = ttl_seconds
+        self.entries: dict[str, float] = {}
+
+    def lookup(self, prefix: str) -> bool:
+        """Return True on a simulated cache hit and refresh the entry's TTL."""
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        now = time.monotonic()
+        hit = self.entries.get(key, 0.0) > now
+        self.entries[key] = now + self.ttl_seconds
+        return hit
+
+local_prompt_cache = LocalPromptCache()
+
+# ===== PROMPT CONSTRUCTION =====
+
+def _is_anthropic(model: Any) -> bool:
+    # Tool-bound models wrap the chat model in a RunnableBinding
+    model = getattr(model, "bound", model)
+    return "anthropic" in type(model).__name__.lower()
+
+def split_prompt(template: str, **values: Any) -> tuple[str, str | None]:
+    """Format a prompt template into a stable prefix and a run context message.
+
+    With caching enabled, each placeholder in the prefix points to the run context
+    instead of holding its value, so the prefix is byte-identical across runs.
+
+    Args:
+        template: Prompt template with `{name}` placeholders
+        **values: Values of the placeholders for this call
+
+    Returns:
+        The system prompt and the run context text (None when caching is off,
+        in which case the values are formatted into the prompt as usual)
+    """
+    if not prompt_caching:
+        return template.format(**values), None
+    stable = template.format(**{name: f"<{name} from the run context>" for name in values})
+    context = "Run context:\n" + "\n".join(f"- {name}: {value}" for name, value in values.items())
+    return stable, context
+
+def build_cached_prompt(
+    system_prompt: str,
+    messages: Sequence[BaseMessage],
+    model: Any = None,
+    run_context: str | None = None,
+) -> list[BaseMessage]:
+    """Build a request with the system prompt as a stable, cacheable prefix.
+
+    Args:
+        system_prompt: Fixed system prompt shared by all calls of a node
+        messages: Conversation history appended after the prefix
+        model: Model the request is sent to, used to pick provider cache markers
+        run_context: Per-call values from `split_prompt`, sent after the history
+
+    Returns:
+        Message list to send to the model
+    """
+    if prompt_caching and prompt_cache_backend == "provider" and _is_anthropic(model):
+        system_message = SystemMessage(content=[
+            {"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}
+        ])
+    else:
+        system_message = SystemMessage(content=system_prompt)
+    trailing = [HumanMessage(content=run_context)] if run_context else []
+    return [system_message] + list(messages) + trailing
+
+# ===== METRICS =====
+
+def record_prompt_usage(node: str, system_prompt: str, response: BaseMessage | None) -> None:
+    """Record cached and uncached input tokens for a model call.
+
+    Args:
+        node: Name of the calling node, used as a metric label
+        system_prompt: The cacheable prefix sent with the request
+        response: Model response carrying usage metadata, if any
+    """
+    if not prompt_caching:
+        return
+
+    usage = getattr(response, "usage_metadata", None) or {}
+    input_tokens = usage.get("input_tokens", 0)
+
+    if prompt_cache_backend == "local":
+        prefix_tokens = estimate_tokens(system_prompt)
+        cached = prefix_tokens if local_prompt_cache.lookup(system_prompt) else 0
+        input_tokens = max(input_tokens, prefix_tokens)
+    else:
+        cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+
+    metrics.inc("llm_input_tokens_total", cached, node=node, cache="cached")
+    metrics.inc("llm_input_tokens_total", max(0, input_tokens - cached), node=node, cache="uncached")
@@ -44,19 +44,7 @@ For the verification message when no clarification is needed:
 - Keep the message concise and professional
 """
 
-transform_messages_into_research_topic_prompt = """You will be given a set of messages that have been exchanged so far between yourself and the user. 
-Your job is to translate these messages into a more detailed and concrete research question that will be used to guide the research.
-
-The messages that have been exchanged so far between yourself and the user are:
-<Messages>
-{messages}
-</Messages>
-
-Today's date is {date}.
-
-You will return a single research question that will be used to guide the research.
-
-Guidelines:
+research_brief_guidelines = """Guidelines:
 1. Maximize Specificity and Detail
 - Include all known user preferences and explicitly list key attributes or dimensions to consider.
 - It is important that all details from the user are included in the instructions.
@@ -87,6 +75,53 @@ Guidelines:
 - If the query is in a specific language, prioritize sources published in that language.
 """
 
+transform_messages_into_research_topic_prompt = """You will be given a set of messages that have been exchanged so far between yourself and the user. 
+Your job is to translate these messages into a more detailed and concrete research question that will be used to guide the research.
+
+The messages that have been exchanged so far between yourself and the user are:
+<Messages>
+{messages}
+</Messages>
+
+Today's date is {date}.
+
+You will return a single research question that will be used to guide the research.
+
+""" + research_brief_guidelines
+
+clarify_and_write_brief_prompt = """These are the messages that have been exchanged so far from the user asking for the report:
+<Messages>
+{messages}
+</Messages>
+
+Today's date is {date}.
+
+You have two jobs, done in a single response:
+1. Assess whether you need to ask a clarifying question, or if the user has already provided enough information for you to start research.
+2. If no clarification is needed, translate the messages into a detailed and concrete research question that will be used to guide the research.
+
+IMPORTANT: If you can see in the messages history that you have already asked a clarifying question, you almost always do not need to ask another one. Only ask another question if ABSOLUTELY NECESSARY.
+
+If there are acronyms, abbreviations, or unknown terms, ask the user to clarify.
+If you need to ask a question, follow these guidelines:
+- Be concise while gathering all necessary information
+- Use bullet points or numbered lists if appropriate for clarity, in markdown formatting
+- Don't ask for unnecessary information, or information that the user has already provided
+
+If you need to ask a clarifying question, return:
+"need_clarification": true,
+"question": "<your clarifying question>",
+"verification": "",
+"research_brief": ""
+
+If you do not need to ask a clarifying question, return:
+"need_clarification": false,
+"question": "",
+"verification": "<acknowledgement that you will now start research, briefly summarizing what you understood>",
+"research_brief": "<the research question, written following the research brief guidelines below>"
+
+Research brief """ + research_brief_guidelines
+
 research_agent_prompt =  """You are a research assistant conducting research on the user's input topic. For context, today's date is {date}.
 
 <Task>
@@ -95,9 +130,10 @@ You can use any of the tools provided to you to find resources that can help ans
 </Task>
 
 <Available Tools>
-You have access to two main tools:
+You have access to three main tools:
 1. **tavily_search**: For conducting web searches to gather information
-2. **think_tool**: For reflection and strategic planning during research
+2. **tavily_search_batch**: For running several distinct queries in one call when you want to cover multiple angles at once (each query counts as one search tool call against your budget; at most {max_batch_queries} queries per call)
+3. **think_tool**: For reflection and strategic planning during research
 
 **CRITICAL: Use think_tool after each search to reflect on results and plan next steps**
 </Available Tools>
@@ -202,6 +238,7 @@ You can use any of the tools provided to you to find and read files that help an
 
 <Available Tools>
 You have access to file system tools and thinking tools:
+- **search_local_files**: Find the most relevant passages across all local files in one call (with file and offset citations)
 - **list_allowed_directories**: See what directories you can access
 - **list_directory**: List files in directories
 - **read_file**: Read individual files
@@ -216,8 +253,8 @@ You have access to file system tools and thinking tools:
 Think like a human researcher with access to a document library. Follow these steps:
 
 1. **Read the question carefully** - What specific information does the user need?
-2. **Explore available files** - Use list_allowed_directories and list_directory to understand what's available
-3. **Identify relevant files** - Use search_files if needed to find documents matching the topic
+2. **Search first** - Use search_local_files to find relevant passages before listing or reading whole files
+3. **Explore and identify relevant files** - Use list_directory or search_files if the passages are not enough
 4. **Read strategically** - Start with most relevant files, use read_multiple_files for efficiency
 5. **After reading, pause and assess** - Do I have enough to answer? What's still missing?
 6. **Stop when you can answer confidently** - Don't keep reading for perfection
@@ -443,6 +480,75 @@ Format the report in clear markdown with proper structure and include source ref
 </Citation Rules>
 """
 
+refresh_research_prompt = """A report on the following research brief was written on {previous_date}. Your job now is to update it, not to redo it.
+
+<Research Brief>
+{research_brief}
+</Research Brief>
+
+<Existing Report Sections>
+{section_titles}
+</Existing Report Sections>
+
+<Changed Sources>
+These sources of the report have changed or could no longer be fetched since it was written:
+{changed_sources}
+</Changed Sources>
+
+Delegate research ONLY for:
+- Developments since {previous_date} that matter to the brief (new releases, figures, events, announcements)
+- What the changed sources now say, where the report relied on them
+
+Do NOT delegate research for ground the report already covers and that is unlikely to have changed. If nothing needs updating, call ResearchComplete right away.
+"""
+
+refresh_plan_prompt = """A report on the research brief below was written on {previous_date}. New research has been done since. Decide which sections of the report the new findings affect.
+
+<Research Brief>
+{research_brief}
+</Research Brief>
+
+<Report Sections>
+{sections}
+</Report Sections>
+
+<New Findings>
+{findings}
+</New Findings>
+
+<Changed Sources>
+{changed_sources}
+</Changed Sources>
+
+Select a section only if the new findings add to it, contradict it, or make it outdated. Sections the findings do not touch must not be selected.
+If some findings fit no existing section, give a title for one new section to hold them; otherwise leave the title empty.
+"""
+
+refresh_section_prompt = """You are updating one section of a research report written on {previous_date}. Today's date is {date}.
+
+<Research Brief>
+{research_brief}
+</Research Brief>
+
+<Section>
+{section}
+</Section>
+
+<New Findings>
+{findings}
+</New Findings>
+
+<Changed Sources>
+{changed_sources}
+</Changed Sources>
+
+Rewrite the section so that it is accurate as of today:
+- Integrate the new findings that are relevant to this section, and correct or remove statements that are outdated or relied on changed sources the findings contradict
+- Keep everything that is still accurate, in the same style, structure and language
+- Keep existing citations such as [3] exactly as they are; cite the new findings with the citation numbers they already carry, which are listed under their sources
+- Start with the section's ## heading and return only the section, without commentary and without a Sources list
+"""
+
 BRIEF_CRITERIA_PROMPT = """
 <role>
 You are an expert research brief evaluator specializing in assessing whether generated research briefs accurately capture user-specified criteria without loss of important details.
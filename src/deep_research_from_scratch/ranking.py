@@ -0,0 +1,52 @@
+"""Local Relevance Scoring for Search Results.
+
+This module implements vectorized BM25 scoring with NumPy. It is used to rank
+search snippets against the query so that only the most relevant pages have
+their raw content fetched and summarized.
+"""
+
+import re
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase a text and split it into alphanumeric tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def bm25_scores(query: str, documents: list[str], k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    """Score documents against a query with Okapi BM25.
+
+    Args:
+        query: Search query
+        documents: Texts to score
+        k1: Term frequency saturation parameter
+        b: Document length normalization parameter
+
+    Returns:
+        Array of scores aligned with `documents`
+    """
+    query_terms = list(dict.fromkeys(tokenize(query)))
+    if not documents or not query_terms:
+        return np.zeros(len(documents))
+
+    # Term frequency matrix restricted to the query vocabulary
+    vocabulary = {term: i for i, term in enumerate(query_terms)}
+    tf = np.zeros((len(documents), len(vocabulary)))
+    doc_lengths = np.zeros(len(documents))
+    for row, document in enumerate(documents):
+        tokens = tokenize(document)
+        doc_lengths[row] = len(tokens)
+        columns = [vocabulary[token] for token in tokens if token in vocabulary]
+        np.add.at(tf[row], columns, 1)
+
+    document_frequency = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((len(documents) - document_frequency + 0.5) / (document_frequency + 0.5))
+    average_length = doc_lengths.mean() or 1.0
+    norm = k1 * (1 - b + b * doc_lengths / average_length)
+    return ((tf * (k1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+def rank_documents(query: str, documents: list[str]) -> list[int]:
+    """Return document indices ordered from most to least relevant."""
+    return np.argsort(-bm25_scores(query, documents), kind="stable").tolist()
@@ -0,0 +1,246 @@
+"""Persistent Archive of Completed Research Runs.
+
+A report refresh (see report_refresh.py) starts from a previous run instead of
+from scratch, so completed runs are kept in a SQLite archive:
+- The research brief, final report and compressed notes of the run
+- The report's sources (from its Sources list and inline links), each with the
+  time it was last fetched and a fingerprint of its content, taken from the
+  run's source registry when the page was fetched
+- Runs are keyed by thread_id and indexed by their brief (Unicode and
+  whitespace normalized), so a refresh can name a run or just repeat the brief
+
+Runs of the full agent are archived when REPORT_ARCHIVE is on; refreshes always
+archive their result, so the next refresh starts from the latest report.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from langchain_core.runnables.config import ensure_config
+
+from deep_research_from_scratch.metrics import metrics
+from deep_research_from_scratch.source_registry import get_source_registry
+
+# ===== CONFIGURATION =====
+
+# Archiving full agent runs is opt-in
+report_archive_enabled = os.environ.get("REPORT_ARCHIVE", "false").lower() == "true"
+
+# SQLite file of the archive
+report_archive_path = Path(os.environ.get("REPORT_ARCHIVE_PATH", ".langgraph_api/report_archive.sqlite"))
+
+SOURCES_HEADING_PATTERN = re.compile(r"^#{1,3}\s*(sources|references)\b", re.IGNORECASE | re.MULTILINE)
+SOURCE_LINE_PATTERN = re.compile(r"^\s*[-*]?\s*\[(S?\d+)\][.:]?\s*(.*?)[\s:–-]*(https?://\S+?)[.,;)]*\s*$")
+INLINE_LINK_PATTERN = re.compile(r"\[([^\]]+)\]\((https?://[^)\s]+)\)")
+CITATION_PATTERN = re.compile(r"\[(S?\d+(?:\s*,\s*S?\d+)*)\]")
+SECTION_PATTERN = re.compile(r"^## ", re.MULTILINE)
+
+# Sources whose content goes stale quickly: news, prices and markets, releases, dated URLs
+TIME_SENSITIVE_PATTERN = re.compile(
+    r"news|press|blog|/20\d\d[/-]|price|pricing|stock|market|earnings|quarter|release|changelog|announce|latest|update",
+    re.IGNORECASE,
+)
+
+# Version of the brief_key scheme; older archives are re-keyed when opened
+BRIEF_KEY_VERSION = 1
+
+# ===== DATA STRUCTURES =====
+
+@dataclass
+class ArchivedSource:
+    """A source of an archived report."""
+    source_id: str | None
+    url: str
+    title: str
+    checked_at: float
+    fingerprint: list = field(default_factory=list)
+
+    @property
+    def time_sensitive(self) -> bool:
+        """Whether the source looks time-sensitive (news, prices, releases) from its URL or title."""
+        return bool(TIME_SENSITIVE_PATTERN.search(self.url) or TIME_SENSITIVE_PATTERN.search(self.title))
+
+@dataclass
+class ArchivedRun:
+    """A completed run: its brief, report, notes and sources."""
+    thread_id: str
+    research_brief: str
+    created_at: float
+    report: str
+    notes: list = field(default_factory=list)
+    sources: list = field(default_factory=list)
+
+    @property
+    def date(self) -> str:
+        """The run's creation date, formatted like the prompts' dates."""
+        return time.strftime("%a %b %-d, %Y", time.localtime(self.created_at))
+
+    def to_dict(self) -> dict:
+        """Return the run as a JSON-serializable dict."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ArchivedRun":
+        """Rebuild a run from `to_dict` output."""
+        return cls(**{**data, "sources": [ArchivedSource(**source) for source in data.get("sources", [])]})
+
+# ===== REPORT PARSING =====
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL for matching sources across runs."""
+    return url.rstrip(".,;:").rstrip("/").lower()
+
+def split_report(report: str) -> tuple[str, list[str], str]:
+    """Split a report into its preamble, its ## sections and its Sources block."""
+    sources_match = SOURCES_HEADING_PATTERN.search(report)
+    body, sources_block = (report[:sources_match.start()], report[sources_match.start():]) if sources_match else (report, "")
+    starts = [match.start() for match in SECTION_PATTERN.finditer(body)]
+    if not starts:
+        return body.strip(), [], sources_block.strip()
+    sections = [body[start:end].strip() for start, end in zip(starts, starts[1:] + [len(body)])]
+    return body[:starts[0]].strip(), sections, sources_block.strip()
+
+def join_report(preamble: str, sections: list[str], sources_block: str) -> str:
+    """Reassemble a report split by `split_report`."""
+    return "\n\n".join(part for part in [preamble, *sections, sources_block] if part) + "\n"
+
+def section_title(section: str) -> str:
+    """Return the title of a ## section."""
+    return section.splitlines()[0].lstrip("#").strip() if section else ""
+
+def parse_sources(report: str) -> list[tuple[str | None, str, str]]:
+    """Return the (id, url, title) of each source listed or linked in a report."""
+    _, _, sources_block = split_report(report)
+    sources = {}
+    for line in sources_block.splitlines():
+        match = SOURCE_LINE_PATTERN.match(line)
+        if match:
+            source_id, title, url = match.groups()
+            sources.setdefault(normalize_url(url), (source_id, url, title.strip() or url))
+    for title, url in INLINE_LINK_PATTERN.findall(report):
+        sources.setdefault(normalize_url(url), (None, url, title))
+    return list(sources.values())
+
+def cites_source(text: str, source: dict) -> bool:
+    """Return True if a report section cites a source, by citation ID or by URL."""
+    if source.get("source_id"):
+        for group in CITATION_PATTERN.findall(text):
+            if source["source_id"] in (source_id.strip() for source_id in group.split(",")):
+                return True
+    return normalize_url(source["url"]) in {normalize_url(url) for _, url in INLINE_LINK_PATTERN.findall(text)}
+
+# ===== ARCHIVE =====
+
+def brief_key(research_brief: str) -> str:
+    """Key a brief by its exact text, with Unicode forms (NFKC) and whitespace normalized."""
+    normalized = " ".join(unicodedata.normalize("NFKC", research_brief).split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+class ReportArchive:
+    """SQLite archive of completed runs keyed by thread_id."""
+
+    def __init__(self, path: Path):
+        """Create an archive backed by the SQLite file at `path`, opened on first use."""
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS report_archive "
+                "(thread_id TEXT PRIMARY KEY, brief_key TEXT, created_at REAL, record TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS report_archive_brief ON report_archive (brief_key, created_at)")
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] < BRIEF_KEY_VERSION:
+                self._rekey()
+        return self._conn
+
+    def _rekey(self) -> None:
+        """Recompute the brief keys of runs archived under an older key scheme."""
+        rows = self._conn.execute("SELECT thread_id, record FROM report_archive").fetchall()
+        self._conn.executemany(
+            "UPDATE report_archive SET brief_key = ? WHERE thread_id = ?",
+            [(brief_key(json.loads(record)["research_brief"]), thread_id) for thread_id, record in rows],
+        )
+        self._conn.execute(f"PRAGMA user_version = {BRIEF_KEY_VERSION}")
+        self._conn.commit()
+
+    def save(self, run: ArchivedRun) -> None:
+        """Store a run, replacing an earlier record of the same thread."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO report_archive (thread_id, brief_key, created_at, record) VALUES (?, ?, ?, ?)",
+                (run.thread_id, brief_key(run.research_brief), run.created_at, json.dumps(run.to_dict())),
+            )
+            conn.commit()
+        metrics.inc("archived_runs_total")
+
+    def load(self, thread_id: str) -> ArchivedRun | None:
+        """Return the archived run of a thread, if any."""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT record FROM report_archive WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+        return ArchivedRun.from_dict(json.loads(row[0])) if row else None
+
+    def latest(self, research_brief: str) -> ArchivedRun | None:
+        """Return the most recent archived run with the same brief, if any."""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT record FROM report_archive WHERE brief_key = ? ORDER BY created_at DESC LIMIT 1",
+                (brief_key(research_brief),),
+            ).fetchone()
+        return ArchivedRun.from_dict(json.loads(row[0])) if row else None
+
+report_archive = ReportArchive(report_archive_path)
+
+async def archive_run(research_brief: str, report: str, notes: list[str], previous_sources: list[ArchivedSource] | None = None) -> ArchivedRun:
+    """Archive the current run's report, notes and sources.
+
+    Sources fetched in this run take their fingerprint from the run's source
+    registry; other sources keep their previous record, if there is one.
+
+    Args:
+        research_brief: Brief of the run
+        report: Final report
+        notes: Compressed research notes behind the report
+        previous_sources: Sources of the run this one refreshed
+
+    Returns:
+        The archived run
+    """
+    config = ensure_config()
+    registry = get_source_registry(config)
+    previous = {normalize_url(source.url): source for source in previous_sources or []}
+    now = time.time()
+    sources = []
+    for source_id, url, title in parse_sources(report):
+        fingerprint = registry.fingerprint(url)
+        if fingerprint is None and normalize_url(url) in previous:
+            earlier = previous[normalize_url(url)]
+            sources.append(ArchivedSource(source_id, url, title, earlier.checked_at, earlier.fingerprint))
+        else:
+            sources.append(ArchivedSource(source_id, url, title, now, fingerprint or []))
+    run = ArchivedRun(
+        thread_id=str(config.get("configurable", {}).get("thread_id", f"run-{int(now)}")),
+        research_brief=research_brief,
+        created_at=now,
+        report=report,
+        notes=list(notes),
+        sources=sources,
+    )
+    await asyncio.to_thread(report_archive.save, run)
+    return run
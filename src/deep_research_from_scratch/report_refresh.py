@@ -0,0 +1,436 @@
+"""Incremental Report Refresh.
+
+Users often re-run the same brief days later to get updates, and a new run
+redoes every search, summary and compression. The `report_refresh` graph
+updates a previous report instead, reusing what is still valid:
+1. The previous run is loaded from the report archive (see report_archive.py),
+   by thread_id (`refresh_from`) or as the latest run with the same brief.
+   Without one, a full run is done and archived for next time
+2. Only stale sources are fetched again: time-sensitive ones (news, prices,
+   releases, dated URLs) after REFRESH_TIME_SENSITIVE_STALE_HOURS, the others
+   after REFRESH_STALE_HOURS. A source whose content fingerprint moved, or that
+   can no longer be fetched, is changed
+3. The supervisor gets the report's outline and the changed sources, is asked
+   to research only developments since the report and what changed, and has
+   REFRESH_MAX_ITERATIONS iterations to do it
+4. One planning call picks the sections the new findings affect, and every
+   section citing a changed source is affected too. Only those sections are
+   rewritten, in parallel; the rest of the report is kept verbatim. Sources of
+   the new findings are renumbered into the report's numbering, and the ones
+   the rewritten sections cite are appended to its Sources list. Findings that
+   fit no section get a new one
+5. The refreshed run is archived, so the next refresh starts from it
+
+When nothing is stale and nothing new is found, the report is returned as is,
+for the cost of one supervisor call.
+
+The refresh is available as the `report_refresh` graph (input: `research_brief`
+and/or `refresh_from`) and from the command line:
+
+    python -m deep_research_from_scratch.report_refresh "<research brief>"
+    python -m deep_research_from_scratch.report_refresh --from <thread_id>
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Literal
+
+from langchain.chat_models import init_chat_model
+from langchain_core.messages import HumanMessage
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Command
+
+from deep_research_from_scratch.load_control import run_depth
+from deep_research_from_scratch.metrics import metrics
+from deep_research_from_scratch.multi_agent_supervisor import supervisor_agent
+from deep_research_from_scratch.prompts import (
+    refresh_plan_prompt,
+    refresh_research_prompt,
+    refresh_section_prompt,
+)
+from deep_research_from_scratch.report_archive import (
+    CITATION_PATTERN,
+    SOURCE_LINE_PATTERN,
+    SOURCES_HEADING_PATTERN,
+    ArchivedRun,
+    ArchivedSource,
+    archive_run,
+    cites_source,
+    join_report,
+    normalize_url,
+    report_archive,
+    section_title,
+    split_report,
+)
+from deep_research_from_scratch.research_agent_full import (
+    consolidate_notes,
+    final_report_generation,
+)
+from deep_research_from_scratch.scheduler import provider_slot
+from deep_research_from_scratch.source_registry import (
+    SourceRegistry,
+    content_fingerprint,
+    fingerprint_similarity,
+    get_source_registry,
+)
+from deep_research_from_scratch.state_refresh import (
+    RefreshInputState,
+    RefreshState,
+    SectionUpdatePlan,
+)
+from deep_research_from_scratch.utils import get_today_str, search_provider
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURATION =====
+
+# Sources are fetched again once they are older than this, in hours
+refresh_stale_hours = float(os.environ.get("REFRESH_STALE_HOURS", "720"))
+
+# Same for time-sensitive sources (news, prices, releases, dated URLs)
+refresh_time_sensitive_stale_hours = float(os.environ.get("REFRESH_TIME_SENSITIVE_STALE_HOURS", "24"))
+
+# Supervisor iterations a refresh may use for delta research
+refresh_max_iterations = int(os.environ.get("REFRESH_MAX_ITERATIONS", "2"))
+
+# Pages whose fingerprints overlap less than this have changed
+changed_similarity_threshold = 0.9
+
+# URLs per extract call when re-fetching stale sources
+EXTRACT_BATCH_SIZE = 20
+
+# Characters of each section shown to the planning call
+SECTION_EXCERPT_CHARS = 400
+
+# Primary: Google Gemini | Alternatives: "openai:gpt-4.1", "anthropic:claude-sonnet-4-20250514"
+refresh_model = init_chat_model(model="gemini-2.5-pro", model_provider="google_genai", temperature=0.0, max_tokens=32000)
+
+# ===== SOURCE RECHECK =====
+
+def is_stale(source: ArchivedSource, now: float) -> bool:
+    """Return True if a source is due to be fetched again."""
+    max_age_hours = refresh_time_sensitive_stale_hours if source.time_sensitive else refresh_stale_hours
+    return now - source.checked_at >= max_age_hours * 3600
+
+async def recheck_sources(sources: list[ArchivedSource]) -> list[dict]:
+    """Fetch stale sources again and return the ones that changed.
+
+    Rechecked sources get a new fetch time and fingerprint in place. A source
+    archived without a fingerprint (its page was never fetched in full) gets
+    one now and counts as unverified rather than changed.
+
+    Returns:
+        Changed sources as dicts with source_id, url, title and status
+        ("changed" or "unavailable")
+    """
+    now = time.time()
+    stale = [source for source in sources if is_stale(source, now)]
+    changed = []
+    for start in range(0, len(stale), EXTRACT_BATCH_SIZE):
+        batch = stale[start:start + EXTRACT_BATCH_SIZE]
+        try:
+            async with provider_slot("extract"):
+                extracted = await search_provider.aextract(urls=[source.url for source in batch])
+            contents = {item.get("url"): item.get("raw_content") for item in extracted.get("results", [])}
+        except Exception as e:
+            # A failed fetch says nothing about the sources; they are rechecked next time
+            logger.warning("Failed to recheck sources: %s", e)
+            continue
+
+        for source in batch:
+            content = contents.get(source.url)
+            if not content:
+                status = "unavailable"
+            else:
+                fingerprint = content_fingerprint(content)
+                if not source.fingerprint:
+                    status = "unverified"
+                elif fingerprint_similarity(source.fingerprint, fingerprint) < changed_similarity_threshold:
+                    status = "changed"
+                else:
+                    status = "unchanged"
+                source.fingerprint = fingerprint
+                source.checked_at = now
+            metrics.inc("refresh_sources_rechecked_total", status=status)
+            if status in ("changed", "unavailable"):
+                changed.append({"source_id": source.source_id, "url": source.url, "title": source.title, "status": status})
+
+    logger.info("Rechecked %d of %d sources: %d changed or unavailable", len(stale), len(sources), len(changed))
+    return changed
+
+def describe_changed_sources(changed: list[dict]) -> str:
+    """List changed sources for the refresh prompts."""
+    if not changed:
+        return "None"
+    lines = []
+    for source in changed:
+        label = f"[{source['source_id']}] " if source["source_id"] else ""
+        lines.append(f"- {label}{source['title']}: {source['url']} ({source['status']})")
+    return "\n".join(lines)
+
+# ===== SOURCE NUMBERING =====
+
+def number_finding_sources(notes: list[str], sources_block: str, registry: SourceRegistry) -> tuple[str, list[tuple[str, str, str]]]:
+    """Renumber the sources cited by new findings into the previous report's numbering.
+
+    Each note cites its own numbered source list ([1] Title: URL), or stable
+    IDs of this run's source registry ([S3]). Sources the report already lists
+    keep their report ID; the others get the next free IDs in the report's
+    style. Citations of sources a note does not list are dropped.
+
+    Args:
+        notes: Compressed notes of the refresh's research
+        sources_block: Sources block of the previous report
+        registry: Source registry of the refresh run
+
+    Returns:
+        The findings with rewritten citations followed by their sources, and the
+        (id, url, title) of the sources the report does not list yet
+    """
+    report_ids = {}
+    for line in sources_block.splitlines():
+        match = SOURCE_LINE_PATTERN.match(line)
+        if match:
+            report_ids.setdefault(normalize_url(match.group(3)), match.group(1))
+    prefix = "S" if any(source_id.startswith("S") for source_id in report_ids.values()) else ""
+    next_number = max((int(source_id.lstrip("S")) for source_id in report_ids.values()), default=0) + 1
+    new_sources, cited = [], {}
+
+    def report_id(url: str, title: str) -> str:
+        nonlocal next_number
+        key = normalize_url(url)
+        if key not in report_ids:
+            report_ids[key] = f"{prefix}{next_number}"
+            next_number += 1
+            new_sources.append((report_ids[key], url, title))
+        cited.setdefault(report_ids[key], (url, title))
+        return report_ids[key]
+
+    findings = []
+    for note in notes:
+        listed, body = {}, []
+        for line in note.splitlines():
+            match = SOURCE_LINE_PATTERN.match(line)
+            if match:
+                source_id, title, url = match.groups()
+                listed[source_id] = (url, title.strip() or url)
+            elif not SOURCES_HEADING_PATTERN.match(line):
+                body.append(line)
+
+        def rewrite(match, listed=listed) -> str:
+            ids = []
+            for source_id in (part.strip() for part in match.group(1).split(",")):
+                entry = registry.get(source_id) if source_id not in listed else None
+                source = listed.get(source_id) or (entry and (entry.url, entry.title))
+                if source:
+                    ids.append(report_id(*source))
+            return f"[{', '.join(dict.fromkeys(ids))}]" if ids else ""
+
+        findings.append(CITATION_PATTERN.sub(rewrite, "\n".join(body)).strip())
+
+    text = "\n\n".join(finding for finding in findings if finding)
+    if cited:
+        text += "\n\nSources of the new findings:\n" + "\n".join(f"[{source_id}] {title}: {url}" for source_id, (url, title) in cited.items())
+    return text, new_sources
+
+def append_sources(sources_block: str, sections: list[str], new_sources: list[tuple[str, str, str]]) -> str:
+    """Add the new sources cited by the given sections to a report's Sources block."""
+    cited = {source_id.strip() for section in sections for group in CITATION_PATTERN.findall(section) for source_id in group.split(",")}
+    added = [(source_id, url, title) for source_id, url, title in new_sources if source_id in cited]
+    if not added:
+        return sources_block
+    bullet = "- " if any(line.lstrip().startswith(("-", "*")) for line in sources_block.splitlines()[1:]) else ""
+    lines = [f"{bullet}[{source_id}] {title}: {url}" for source_id, url, title in added]
+    return "\n".join([sources_block or "### Sources", *lines])
+
+# ===== REFRESH NODES =====
+
+async def load_previous_run(state: RefreshState) -> Command[Literal["recheck_stale_sources", "supervisor_subgraph"]]:
+    """Load the run to refresh, or fall back to a full run when there is none."""
+    research_brief = state.get("research_brief", "")
+    refresh_from = state.get("refresh_from")
+    if refresh_from:
+        previous = await asyncio.to_thread(report_archive.load, refresh_from)
+    else:
+        previous = await asyncio.to_thread(report_archive.latest, research_brief)
+
+    if previous is None:
+        if not research_brief:
+            raise ValueError(f"No archived run {refresh_from!r} to refresh")
+        logger.info("No archived report for this brief; running full research")
+        metrics.inc("report_refreshes_total", outcome="full_run")
+        return Command(
+            goto="supervisor_subgraph",
+            update={
+                "research_brief": research_brief,
+                "previous_run": None,
+                "supervisor_messages": [HumanMessage(content=f"{research_brief}.")],
+            },
+        )
+
+    return Command(
+        goto="recheck_stale_sources",
+        update={"research_brief": research_brief or previous.research_brief, "previous_run": previous.to_dict()},
+    )
+
+async def recheck_stale_sources(state: RefreshState):
+    """Fetch stale sources again and hand the supervisor a delta research task."""
+    previous = ArchivedRun.from_dict(state["previous_run"])
+    changed = await recheck_sources(previous.sources)
+
+    _, sections, _ = split_report(previous.report)
+    research_prompt = refresh_research_prompt.format(
+        previous_date=previous.date,
+        research_brief=state["research_brief"],
+        section_titles="\n".join(f"- {section_title(section)}" for section in sections) or "(none)",
+        changed_sources=describe_changed_sources(changed),
+    )
+
+    return {
+        "previous_run": previous.to_dict(),
+        "changed_sources": changed,
+        "supervisor_messages": [HumanMessage(content=research_prompt)],
+        # Start close to the iteration limit so the supervisor only has room for the deltas
+        "research_iterations": max(0, run_depth().max_researcher_iterations - refresh_max_iterations),
+    }
+
+def route_after_research(state: RefreshState) -> Literal["refresh_sections", "consolidate_notes"]:
+    """Refresh the previous report, or write a new one after a full run."""
+    return "refresh_sections" if state.get("previous_run") else "consolidate_notes"
+
+async def plan_section_updates(previous: ArchivedRun, research_brief: str, sections: list[str], findings: str, changed: list[dict]) -> SectionUpdatePlan:
+    """Ask the model which sections the new findings affect."""
+    outline = "\n\n".join(
+        f"{i}. {section_title(section)}\n{section[:SECTION_EXCERPT_CHARS]}" for i, section in enumerate(sections, 1)
+    )
+    structured_model = refresh_model.with_structured_output(SectionUpdatePlan)
+    async with provider_slot("model"):
+        return await structured_model.ainvoke([HumanMessage(content=refresh_plan_prompt.format(
+            previous_date=previous.date,
+            research_brief=research_brief,
+            sections=outline,
+            findings=findings,
+            changed_sources=describe_changed_sources(changed),
+        ))])
+
+async def rewrite_section(previous: ArchivedRun, research_brief: str, section: str, findings: str, changed: list[dict]) -> str:
+    """Rewrite one section with the new findings, keeping it on failure."""
+    try:
+        async with provider_slot("model"):
+            response = await refresh_model.ainvoke([HumanMessage(content=refresh_section_prompt.format(
+                previous_date=previous.date,
+                date=get_today_str(),
+                research_brief=research_brief,
+                section=section,
+                findings=findings,
+                changed_sources=describe_changed_sources(changed),
+            ))])
+        return str(response.content).strip() or section
+    except Exception as e:
+        logger.warning("Failed to rewrite section %r: %s", section_title(section), e)
+        return section
+
+async def refresh_sections(state: RefreshState):
+    """Rewrite the report sections affected by new findings or changed sources.
+
+    The other sections are kept verbatim.
+    """
+    previous = ArchivedRun.from_dict(state["previous_run"])
+    research_brief = state["research_brief"]
+    changed = state.get("changed_sources", [])
+    preamble, sections, sources_block = split_report(previous.report)
+    notes = [note for note in state.get("notes", []) if note.strip()]
+    findings, new_sources = number_finding_sources(notes, sources_block, get_source_registry())
+
+    affected = {i for i, section in enumerate(sections) if any(cites_source(section, source) for source in changed)}
+    new_section_title = ""
+    if findings:
+        plan = await plan_section_updates(previous, research_brief, sections, findings, changed)
+        affected |= {number - 1 for number in plan.sections_to_update if 1 <= number <= len(sections)}
+        new_section_title = plan.new_section_title.strip()
+
+    if not affected and not new_section_title:
+        logger.info("Report is still current; nothing rewritten")
+        metrics.inc("report_refreshes_total", outcome="unchanged")
+        metrics.inc("refresh_sections_total", len(sections), outcome="kept")
+        return {"final_report": previous.report, "messages": ["The report is still current: " + previous.report]}
+
+    # Rewrite affected sections (and write the new one) concurrently
+    targets = sorted(affected)
+    drafts = [sections[i] for i in targets] + ([f"## {new_section_title}\n\n(New section.)"] if new_section_title else [])
+    rewritten = await asyncio.gather(*(
+        rewrite_section(previous, research_brief, draft, findings or "None", changed) for draft in drafts
+    ))
+    for i, text in zip(targets, rewritten):
+        sections[i] = text
+    if new_section_title:
+        sections.append(rewritten[-1])
+
+    rewritten_sections = [sections[i] for i in targets] + ([sections[-1]] if new_section_title else [])
+    report = join_report(preamble, sections, append_sources(sources_block, rewritten_sections, new_sources))
+    logger.info(
+        "Refreshed report: %d of %d sections rewritten%s, %d changed sources",
+        len(targets), len(sections) - bool(new_section_title), " plus a new section" if new_section_title else "", len(changed),
+    )
+    metrics.inc("report_refreshes_total", outcome="refreshed")
+    metrics.inc("refresh_sections_total", len(targets), outcome="rewritten")
+    metrics.inc("refresh_sections_total", len(sections) - len(targets) - bool(new_section_title), outcome="kept")
+    metrics.inc("refresh_sections_total", bool(new_section_title), outcome="added")
+
+    return {"final_report": report, "messages": ["Here is the refreshed report: " + report]}
+
+async def archive_refreshed_report(state: RefreshState):
+    """Archive the report, all notes and the sources so the next refresh starts here."""
+    previous = ArchivedRun.from_dict(state["previous_run"]) if state.get("previous_run") else None
+    await archive_run(
+        state["research_brief"],
+        state["final_report"],
+        (previous.notes if previous else []) + list(state.get("notes", [])),
+        previous.sources if previous else None,
+    )
+    return {}
+
+# ===== GRAPH CONSTRUCTION =====
+
+refresh_builder = StateGraph(RefreshState, input_schema=RefreshInputState)
+refresh_builder.add_node("load_previous_run", load_previous_run)
+refresh_builder.add_node("recheck_stale_sources", recheck_stale_sources)
+refresh_builder.add_node("supervisor_subgraph", supervisor_agent)
+refresh_builder.add_node("refresh_sections", refresh_sections)
+refresh_builder.add_node("consolidate_notes", consolidate_notes)
+refresh_builder.add_node("final_report_generation", final_report_generation)
+refresh_builder.add_node("archive_refreshed_report", archive_refreshed_report)
+
+refresh_builder.add_edge(START, "load_previous_run")
+refresh_builder.add_edge("recheck_stale_sources", "supervisor_subgraph")
+refresh_builder.add_conditional_edges("supervisor_subgraph", route_after_research, ["refresh_sections", "consolidate_notes"])
+refresh_builder.add_edge("consolidate_notes", "final_report_generation")
+refresh_builder.add_edge("final_report_generation", "archive_refreshed_report")
+refresh_builder.add_edge("refresh_sections", "archive_refreshed_report")
+refresh_builder.add_edge("archive_refreshed_report", END)
+
+report_refresh = refresh_builder.compile()
+
+# ===== COMMAND LINE =====
+
+async def main(research_brief: str | None, refresh_from: str | None) -> None:
+    """Refresh a report and write it to stdout."""
+    inputs = {key: value for key, value in (("research_brief", research_brief), ("refresh_from", refresh_from)) if value}
+    started = time.monotonic()
+    result = await report_refresh.ainvoke(inputs, config={"configurable": {"thread_id": f"refresh-{int(time.time())}"}})
+    sys.stdout.write(result["final_report"] + "\n")
+    logger.info("Refreshed in %.1fs", time.monotonic() - started)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh a previous research report")
+    parser.add_argument("research_brief", nargs="?", help="Brief of the report to refresh (latest archived run)")
+    parser.add_argument("--from", dest="refresh_from", help="thread_id of the archived run to refresh")
+    args = parser.parse_args()
+    if not args.research_brief and not args.refresh_from:
+        parser.error("give a research brief or --from")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args.research_brief, args.refresh_from))
@@ -5,21 +5,29 @@ This module implements a research agent that can perform iterative web searches
 and synthesis to answer complex research questions.
 """
 
+import asyncio
+
 from pydantic import BaseModel, Field
 from typing_extensions import Literal
 
 from langgraph.graph import StateGraph, START, END
-from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage, filter_messages
+from langchain_core.messages import HumanMessage, ToolMessage, filter_messages
 from langchain.chat_models import init_chat_model
 
+from deep_research_from_scratch.blob_store import externalize, externalize_tool_messages, hydrate_messages
+from deep_research_from_scratch.load_control import run_depth
+from deep_research_from_scratch.metrics import metrics
+from deep_research_from_scratch.prompt_cache import build_cached_prompt, record_prompt_usage, split_prompt
+from deep_research_from_scratch.scheduler import provider_slot
+from deep_research_from_scratch.source_registry import source_registry_enabled, with_source_id_rules
 from deep_research_from_scratch.state_research import ResearcherState, ResearcherOutputState
-from deep_research_from_scratch.utils import tavily_search, get_today_str, think_tool
+from deep_research_from_scratch.utils import batch_queries, max_batch_queries, tavily_search, tavily_search_batch, get_today_str, think_tool
 from deep_research_from_scratch.prompts import research_agent_prompt, compress_research_system_prompt, compress_research_human_message
 
 # ===== CONFIGURATION =====
 
 # Set up tools and model binding
-tools = [tavily_search, think_tool]
+tools = [tavily_search, tavily_search_batch, think_tool]
 tools_by_name = {tool.name: tool for tool in tools}
 
 # Initialize models - Primary: Google Gemini | Alternatives: OpenAI, Anthropic
@@ -28,9 +36,12 @@ model_with_tools = model.bind_tools(tools)
 summarization_model = init_chat_model(model="gemini-2.5-pro", model_provider="google_genai", temperature=0.0)  # Alternatives: "openai:gpt-4.1-mini", "anthropic:claude-haiku-3-5-20241022"
 compress_model = init_chat_model(model="gemini-2.5-pro", model_provider="google_genai", temperature=0.0, max_tokens=32000)  # Alternatives: "openai:gpt-4.1", "anthropic:claude-sonnet-4-20250514"
 
+# Researcher system prompt with the batch size limit of tavily_search_batch filled in
+researcher_prompt = research_agent_prompt.replace("{max_batch_queries}", str(max_batch_queries))
+
 # ===== AGENT NODES =====
 
-def llm_call(state: ResearcherState):
+async def llm_call(state: ResearcherState):
     """Analyze current state and decide on next actions.
 
     The model analyzes the current conversation state and decides whether to:
@@ -39,27 +50,34 @@ def llm_call(state: ResearcherState):
 
     Returns updated state with the model's response.
     """
-    return {
-        "researcher_messages": [
-            model_with_tools.invoke(
-                [SystemMessage(content=research_agent_prompt)] + state["researcher_messages"]
-            )
-        ]
-    }
+    # The system prompt is kept as a stable prefix so providers can cache it
+    messages = build_cached_prompt(researcher_prompt, hydrate_messages(state["researcher_messages"]), model)
+    async with provider_slot("model"):
+        response = await model_with_tools.ainvoke(messages)
+    record_prompt_usage("llm_call", researcher_prompt, response)
+
+    return {"researcher_messages": [response]}
 
-def tool_node(state: ResearcherState):
+async def tool_node(state: ResearcherState):
     """Execute all tool calls from the previous LLM response.
 
     Executes all tool calls from the previous LLM responses.
     Returns updated state with tool execution results.
     """
     tool_calls = state["researcher_messages"][-1].tool_calls
-
-    # Execute all tool calls
-    observations = []
     for tool_call in tool_calls:
-        tool = tools_by_name[tool_call["name"]]
-        observations.append(tool.invoke(tool_call["args"]))
+        metrics.inc("researcher_tool_calls_total", tool=tool_call["name"])
+
+    # Under load, searches past the researcher's round budget are declined
+    out_of_budget = tool_budget_exhausted(state["researcher_messages"][:-1])
+
+    async def run_tool(tool_call: dict) -> str:
+        if out_of_budget and tool_call["name"] != "think_tool":
+            return "Search budget reached: the system is under load. Answer with the information you have gathered."
+        return await tools_by_name[tool_call["name"]].ainvoke(tool_call["args"])
+
+    # Execute all tool calls concurrently; cancelling the run cancels them all
+    observations = await asyncio.gather(*(run_tool(tool_call) for tool_call in tool_calls))
 
     # Create tool message outputs
     tool_outputs = [
@@ -70,34 +88,57 @@ def tool_node(state: ResearcherState):
         ) for observation, tool_call in zip(observations, tool_calls)
     ]
 
-    return {"researcher_messages": tool_outputs}
+    # Keep large search outputs out of state; only blob references are checkpointed
+    return {"researcher_messages": externalize_tool_messages(tool_outputs)}
 
-def compress_research(state: ResearcherState) -> dict:
+async def compress_research(state: ResearcherState) -> dict:
     """Compress research findings into a concise summary.
 
     Takes all the research messages and tool outputs and creates
     a compressed summary suitable for the supervisor's decision-making.
     """
 
-    system_message = compress_research_system_prompt.format(date=get_today_str())
-    messages = [SystemMessage(content=system_message)] + state.get("researcher_messages", []) + [HumanMessage(content=compress_research_human_message)]
-    response = compress_model.invoke(messages)
+    researcher_messages = hydrate_messages(state.get("researcher_messages", []))
+    system_message, run_context = split_prompt(compress_research_system_prompt, date=get_today_str())
+    if source_registry_enabled:
+        # Cite the run's stable source IDs instead of renumbering sources
+        system_message = with_source_id_rules(system_message)
+    messages = build_cached_prompt(system_message, researcher_messages + [HumanMessage(content=compress_research_human_message)], compress_model, run_context)
+    async with provider_slot("model"):
+        response = await compress_model.ainvoke(messages)
+    record_prompt_usage("compress_research", system_message, response)
 
     # Extract raw notes from tool and AI messages
     raw_notes = [
         str(m.content) for m in filter_messages(
-            state["researcher_messages"], 
+            researcher_messages, 
             include_types=["tool", "ai"]
         )
     ]
 
     return {
         "compressed_research": str(response.content),
-        "raw_notes": ["\n".join(raw_notes)]
+        "raw_notes": [externalize("\n".join(raw_notes))]
     }
 
 # ===== ROUTING LOGIC =====
 
+def tool_round_cost(tool_calls: list) -> int:
+    """Count a tool round against the budget: one, or one per search query it ran."""
+    searches = 0
+    for tool_call in tool_calls:
+        if tool_call["name"] == "tavily_search_batch":
+            searches += len(batch_queries(tool_call["args"].get("queries", [])))
+        elif tool_call["name"] != "think_tool":
+            searches += 1
+    return max(searches, 1)
+
+def tool_budget_exhausted(messages: list) -> bool:
+    """Return True once the tool rounds in the messages reach the researcher's budget at the current depth."""
+    max_rounds = run_depth().max_researcher_tool_rounds
+    rounds = sum(tool_round_cost(message.tool_calls) for message in messages if getattr(message, "tool_calls", None))
+    return max_rounds is not None and rounds >= max_rounds
+
 def should_continue(state: ResearcherState) -> Literal["tool_node", "compress_research"]:
     """Determine whether to continue research or provide final answer.
 
@@ -117,6 +158,15 @@ def should_continue(state: ResearcherState) -> Literal["tool_node", "compress_re
     # Otherwise, we have a final answer
     return "compress_research"
 
+def after_tools(state: ResearcherState) -> Literal["llm_call", "compress_research"]:
+    """Loop back to the model, or compress once the tool round budget is used up under load.
+
+    Returns:
+        "llm_call": Continue the research loop
+        "compress_research": Stop and compress research
+    """
+    return "compress_research" if tool_budget_exhausted(state["researcher_messages"]) else "llm_call"
+
 # ===== GRAPH CONSTRUCTION =====
 
 # Build the agent workflow
@@ -137,7 +187,14 @@ agent_builder.add_conditional_edges(
         "compress_research": "compress_research", # Provide final answer
     },
 )
-agent_builder.add_edge("tool_node", "llm_call") # Loop back for more research
+agent_builder.add_conditional_edges(
+    "tool_node",
+    after_tools,
+    {
+        "llm_call": "llm_call", # Loop back for more research
+        "compress_research": "compress_research", # Tool round budget used up under load
+    },
+)
 agent_builder.add_edge("compress_research", END)
 
 # Compile the agent
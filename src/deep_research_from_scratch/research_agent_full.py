@@ -6,6 +6,7 @@ This module integrates all components of the research system:
 - User clarification and scoping
 - Research brief generation  
 - Multi-agent research coordination
+- Notes consolidation
 - Final report generation
 
 The system orchestrates the complete research workflow from initial user
@@ -15,6 +16,14 @@ input through final report delivery.
 from langchain_core.messages import HumanMessage
 from langgraph.graph import StateGraph, START, END
 
+from deep_research_from_scratch.consolidation import consolidate_notes_enabled, consolidate_notes_text
+from deep_research_from_scratch.hedging import with_hedging
+from deep_research_from_scratch.metrics import metrics
+from deep_research_from_scratch.prompt_cache import estimate_tokens
+from deep_research_from_scratch.profiling import with_profiling
+from deep_research_from_scratch.report_archive import archive_run, report_archive_enabled
+from deep_research_from_scratch.scheduler import provider_slot
+from deep_research_from_scratch.source_registry import get_source_registry, source_registry_enabled, with_source_id_rules
 from deep_research_from_scratch.utils import get_today_str
 from deep_research_from_scratch.prompts import final_report_generation_prompt
 from deep_research_from_scratch.state_scope import AgentState, AgentInputState
@@ -26,10 +35,27 @@ from deep_research_from_scratch.multi_agent_supervisor import supervisor_agent
 from langchain.chat_models import init_chat_model
 # Primary: Google Gemini | Alternatives: "openai:gpt-4.1", "anthropic:claude-sonnet-4-20250514"
 writer_model = init_chat_model(model="gemini-2.5-pro", model_provider="google_genai", temperature=0.0, max_tokens=32000)
+# Opt-in hedging: duplicate the writer call if it runs past its learned p95
+writer_model = with_hedging(writer_model, "final_report_generation", temperature=0.0, max_tokens=32000)
 
-# ===== FINAL REPORT GENERATION =====
+# Histogram buckets for the size of final reports, in estimated tokens
+REPORT_TOKEN_BUCKETS = (500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+# ===== NOTES CONSOLIDATION =====
+
+def consolidate_notes(state: AgentState):
+    """Consolidate the sub-agents' notes before the final report is written.
+
+    Deduplicates the notes into a compact evidence set with a global source
+    table, so the writer prompt does not repeat facts and URLs.
+    """
+    if not consolidate_notes_enabled:
+        return {"consolidated_notes": None}
 
-from deep_research_from_scratch.state_scope import AgentState
+    consolidated = consolidate_notes_text(state.get("notes", []))
+    return {"consolidated_notes": consolidated.render()}
+
+# ===== FINAL REPORT GENERATION =====
 
 async def final_report_generation(state: AgentState):
     """
@@ -40,19 +66,36 @@ async def final_report_generation(state: AgentState):
 
     notes = state.get("notes", [])
 
-    findings = "\n".join(notes)
+    findings = state.get("consolidated_notes") or "\n".join(notes)
 
     final_report_prompt = final_report_generation_prompt.format(
         research_brief=state.get("research_brief", ""),
         findings=findings,
         date=get_today_str()
     )
+    if source_registry_enabled:
+        final_report_prompt = with_source_id_rules(final_report_prompt)
+
+    async with provider_slot("model"):
+        final_report = await writer_model.ainvoke([HumanMessage(content=final_report_prompt)])
+    report = final_report.content
+
+    # Render the bibliography once, from the stable IDs cited in the report
+    if source_registry_enabled:
+        bibliography = get_source_registry().render_bibliography(report)
+        if bibliography:
+            report = report.rstrip() + "\n\n" + bibliography
+
+    metrics.inc("final_reports_total")
+    metrics.observe("final_report_tokens", estimate_tokens(report), buckets=REPORT_TOKEN_BUCKETS)
 
-    final_report = await writer_model.ainvoke([HumanMessage(content=final_report_prompt)])
+    # Keep the run so a later refresh can start from it
+    if report_archive_enabled:
+        await archive_run(state.get("research_brief", ""), report, notes)
 
     return {
-        "final_report": final_report.content, 
-        "messages": ["Here is the final report: " + final_report.content],
+        "final_report": report, 
+        "messages": ["Here is the final report: " + report],
     }
 
 # ===== GRAPH CONSTRUCTION =====
@@ -63,13 +106,15 @@ deep_researcher_builder = StateGraph(AgentState, input_schema=AgentInputState)
 deep_researcher_builder.add_node("clarify_with_user", clarify_with_user)
 deep_researcher_builder.add_node("write_research_brief", write_research_brief)
 deep_researcher_builder.add_node("supervisor_subgraph", supervisor_agent)
+deep_researcher_builder.add_node("consolidate_notes", consolidate_notes)
 deep_researcher_builder.add_node("final_report_generation", final_report_generation)
 
 # Add workflow edges
 deep_researcher_builder.add_edge(START, "clarify_with_user")
 deep_researcher_builder.add_edge("write_research_brief", "supervisor_subgraph")
-deep_researcher_builder.add_edge("supervisor_subgraph", "final_report_generation")
+deep_researcher_builder.add_edge("supervisor_subgraph", "consolidate_notes")
+deep_researcher_builder.add_edge("consolidate_notes", "final_report_generation")
 deep_researcher_builder.add_edge("final_report_generation", END)
 
-# Compile the full workflow
-agent = deep_researcher_builder.compile()
+# Compile the full workflow (profiled when slow, if PROFILE_SLOW_RUNS is set)
+agent = with_profiling(deep_researcher_builder.compile())
@@ -13,6 +13,7 @@ Key features:
 - Research compression for efficient processing
 - Lazy MCP client initialization for LangGraph Platform compatibility
 - WSL support using Windows Node.js via cmd.exe
+- Optional in-process filesystem tools (FILESYSTEM_TOOLS_BACKEND=native) with the same tool names
 """
 
 import os
@@ -21,16 +22,25 @@ import platform
 from typing_extensions import Literal
 
 from langchain.chat_models import init_chat_model
-from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage, filter_messages
+from langchain_core.messages import HumanMessage, ToolMessage, filter_messages
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langgraph.graph import StateGraph, START, END
 
+from deep_research_from_scratch.blob_store import externalize, externalize_tool_messages, hydrate_messages
+from deep_research_from_scratch.cassette import intercept
+from deep_research_from_scratch.filesystem_tools import build_filesystem_tools, build_local_search_tool
+from deep_research_from_scratch.prompt_cache import build_cached_prompt, record_prompt_usage
+from deep_research_from_scratch.scheduler import provider_slot
 from deep_research_from_scratch.prompts import research_agent_prompt_with_mcp, compress_research_system_prompt, compress_research_human_message
 from deep_research_from_scratch.state_research import ResearcherState, ResearcherOutputState
 from deep_research_from_scratch.utils import get_today_str, think_tool, get_current_dir, convert_path_for_mcp
 
 # ===== CONFIGURATION =====
 
+# Filesystem tool backend, selectable per deployment:
+# "mcp" launches the Node.js MCP filesystem server; "native" uses in-process Python tools
+filesystem_backend = os.environ.get("FILESYSTEM_TOOLS_BACKEND", "mcp")
+
 # Determine command and args based on platform (WSL needs Windows Node.js)
 files_path = convert_path_for_mcp(get_current_dir() / "files")
 
@@ -62,6 +72,22 @@ def get_mcp_client():
         _client = MultiServerMCPClient(mcp_config)
     return _client
 
+# Native tools are built once; they are sandboxed to the same files directory
+_native_tools = None
+
+# Ranked passage search over an incremental index of the files directory
+search_local_files = build_local_search_tool(get_current_dir() / "files")
+
+async def get_filesystem_tools() -> list:
+    """Get the filesystem tools from the configured backend, plus local passage search."""
+    global _native_tools
+    if filesystem_backend == "native":
+        if _native_tools is None:
+            _native_tools = build_filesystem_tools([get_current_dir() / "files"])
+        return _native_tools + [search_local_files]
+    client = get_mcp_client()
+    return await client.get_tools() + [search_local_files]
+
 # Initialize models - Primary: Google Gemini | Alternatives: OpenAI, Anthropic
 compress_model = init_chat_model(model="gemini-2.5-pro", model_provider="google_genai", temperature=0.0, max_tokens=32000)  # Alternatives: "openai:gpt-4.1", "anthropic:claude-sonnet-4-20250514"
 model = init_chat_model(model="gemini-2.5-pro", model_provider="google_genai", temperature=0.0)  # Alternatives: "openai:gpt-4.1", "anthropic:claude-sonnet-4-20250514"
@@ -78,9 +104,8 @@ async def llm_call(state: ResearcherState):
 
     Returns updated state with model response.
     """
-    # Get available tools from MCP server
-    client = get_mcp_client()
-    mcp_tools = await client.get_tools()
+    # Get available tools from MCP server (or the native backend)
+    mcp_tools = await get_filesystem_tools()
 
     # Use MCP tools for local document access
     tools = mcp_tools + [think_tool]
@@ -88,14 +113,14 @@ async def llm_call(state: ResearcherState):
     # Initialize model with tool binding
     model_with_tools = model.bind_tools(tools)
 
-    # Process user input with system prompt
-    return {
-        "researcher_messages": [
-            model_with_tools.invoke(
-                [SystemMessage(content=research_agent_prompt_with_mcp.format(date=get_today_str()))] + state["researcher_messages"]
-            )
-        ]
-    }
+    # Process user input with system prompt kept as a stable, cacheable prefix
+    system_prompt = research_agent_prompt_with_mcp.format(date=get_today_str())
+    messages = build_cached_prompt(system_prompt, hydrate_messages(state["researcher_messages"]), model)
+    async with provider_slot("model"):
+        response = await model_with_tools.ainvoke(messages)
+    record_prompt_usage("llm_call", system_prompt, response)
+
+    return {"researcher_messages": [response]}
 
 async def tool_node(state: ResearcherState):
     """Execute tool calls using MCP tools.
@@ -112,9 +137,8 @@ async def tool_node(state: ResearcherState):
 
     async def execute_tools():
         """Execute all tool calls. MCP tools require async execution."""
-        # Get fresh tool references from MCP server
-        client = get_mcp_client()
-        mcp_tools = await client.get_tools()
+        # Get fresh tool references from MCP server (or the native backend)
+        mcp_tools = await get_filesystem_tools()
         tools = mcp_tools + [think_tool]
         tools_by_name = {tool.name: tool for tool in tools}
 
@@ -126,8 +150,8 @@ async def tool_node(state: ResearcherState):
                 # think_tool is sync, use regular invoke
                 observation = tool.invoke(tool_call["args"])
             else:
-                # MCP tools are async, use ainvoke
-                observation = await tool.ainvoke(tool_call["args"])
+                # MCP tools are async, use ainvoke (recorded or replayed in cassette mode)
+                observation = await intercept("tool", tool_call["name"], tool_call["args"], lambda: tool.ainvoke(tool_call["args"]))
             observations.append(observation)
 
         # Format results as tool messages
@@ -144,9 +168,10 @@ async def tool_node(state: ResearcherState):
 
     messages = await execute_tools()
 
-    return {"researcher_messages": messages}
+    # Keep large file contents out of state; only blob references are checkpointed
+    return {"researcher_messages": externalize_tool_messages(messages)}
 
-def compress_research(state: ResearcherState) -> dict:
+async def compress_research(state: ResearcherState) -> dict:
     """Compress research findings into a concise summary.
 
     Takes all the research messages and tool outputs and creates
@@ -156,22 +181,25 @@ def compress_research(state: ResearcherState) -> dict:
     file-based research content from MCP tools.
     """
 
+    researcher_messages = hydrate_messages(state.get("researcher_messages", []))
     system_message = compress_research_system_prompt.format(date=get_today_str())
-    messages = [SystemMessage(content=system_message)] + state.get("researcher_messages", []) + [HumanMessage(content=compress_research_human_message)]
+    messages = build_cached_prompt(system_message, researcher_messages + [HumanMessage(content=compress_research_human_message)], compress_model)
 
-    response = compress_model.invoke(messages)
+    async with provider_slot("model"):
+        response = await compress_model.ainvoke(messages)
+    record_prompt_usage("compress_research", system_message, response)
 
     # Extract raw notes from tool and AI messages
     raw_notes = [
         str(m.content) for m in filter_messages(
-            state["researcher_messages"], 
+            researcher_messages, 
             include_types=["tool", "ai"]
         )
     ]
 
     return {
         "compressed_research": str(response.content),
-        "raw_notes": ["\n".join(raw_notes)]
+        "raw_notes": [externalize("\n".join(raw_notes))]
     }
 
 # ===== ROUTING LOGIC =====
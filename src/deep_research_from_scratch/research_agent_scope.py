@@ -7,8 +7,16 @@ This module implements the scoping phase of the research workflow, where we:
 
 The workflow uses structured output to make deterministic decisions about
 whether sufficient context exists to proceed with research.
+
+Scoping modes (SCOPING_MODE environment variable):
+- "sequential": clarification, then brief generation - two model round trips (default)
+- "single": one structured call returns both the decision and the brief
+- "speculative": the brief is generated in parallel with clarification and
+  cancelled as soon as clarification decides to ask a question
 """
 
+import asyncio
+import os
 from datetime import datetime
 from typing_extensions import Literal
 
@@ -17,8 +25,11 @@ from langchain_core.messages import HumanMessage, AIMessage, get_buffer_string
 from langgraph.graph import StateGraph, START, END
 from langgraph.types import Command
 
-from deep_research_from_scratch.prompts import clarify_with_user_instructions, transform_messages_into_research_topic_prompt
-from deep_research_from_scratch.state_scope import AgentState, ClarifyWithUser, ResearchQuestion, AgentInputState
+from deep_research_from_scratch.cancellation import cancel_grace_seconds
+from deep_research_from_scratch.metrics import metrics
+from deep_research_from_scratch.scheduler import provider_slot
+from deep_research_from_scratch.prompts import clarify_with_user_instructions, clarify_and_write_brief_prompt, transform_messages_into_research_topic_prompt
+from deep_research_from_scratch.state_scope import AgentState, ClarifyWithUser, ClarifyWithUserAndBrief, ResearchQuestion, AgentInputState
 
 # ===== UTILITY FUNCTIONS =====
 
@@ -36,60 +47,114 @@ model = init_chat_model(
     temperature=0.0
 )
 
+# Scoping mode: "sequential", "single" or "speculative"
+scoping_mode = os.environ.get("SCOPING_MODE", "sequential")
+
+# ===== MODEL CALLS =====
+
+async def generate_research_brief(messages) -> str:
+    """Generate a research brief from the conversation history."""
+    # Set up structured output model
+    structured_output_model = model.with_structured_output(ResearchQuestion)
+
+    # Generate research brief from conversation history
+    async with provider_slot("model"):
+        response = await structured_output_model.ainvoke([
+            HumanMessage(content=transform_messages_into_research_topic_prompt.format(
+                messages=get_buffer_string(messages),
+                date=get_today_str()
+            ))
+        ])
+    return response.research_brief
+
+async def assess_clarification(messages) -> ClarifyWithUser:
+    """Decide whether a clarifying question is needed."""
+    # Set up structured output model
+    structured_output_model = model.with_structured_output(ClarifyWithUser)
+
+    # Invoke the model with clarification instructions
+    async with provider_slot("model"):
+        return await structured_output_model.ainvoke([
+            HumanMessage(content=clarify_with_user_instructions.format(
+                messages=get_buffer_string(messages=messages),
+                date=get_today_str()
+            ))
+        ])
+
+async def assess_clarification_with_brief(messages) -> ClarifyWithUserAndBrief:
+    """Decide whether a clarifying question is needed and write the brief in one call."""
+    structured_output_model = model.with_structured_output(ClarifyWithUserAndBrief)
+    async with provider_slot("model"):
+        return await structured_output_model.ainvoke([
+            HumanMessage(content=clarify_and_write_brief_prompt.format(
+                messages=get_buffer_string(messages=messages),
+                date=get_today_str()
+            ))
+        ])
+
 # ===== WORKFLOW NODES =====
 
-def clarify_with_user(state: AgentState) -> Command[Literal["write_research_brief", "__end__"]]:
+async def clarify_with_user(state: AgentState) -> Command[Literal["write_research_brief", "__end__"]]:
     """
     Determine if the user's request contains sufficient information to proceed with research.
 
     Uses structured output to make deterministic decisions and avoid hallucination.
     Routes to either research brief generation or ends with a clarification question.
+    In the "single" and "speculative" scoping modes the brief is produced here as
+    well and handed to write_research_brief, which then makes no model call.
     """
-    # Set up structured output model
-    structured_output_model = model.with_structured_output(ClarifyWithUser)
-
-    # Invoke the model with clarification instructions
-    response = structured_output_model.invoke([
-        HumanMessage(content=clarify_with_user_instructions.format(
-            messages=get_buffer_string(messages=state["messages"]), 
-            date=get_today_str()
-        ))
-    ])
+    pending_research_brief = None
+
+    if scoping_mode == "single":
+        response = await assess_clarification_with_brief(state["messages"])
+        pending_research_brief = response.research_brief or None
+    elif scoping_mode == "speculative":
+        # Write the brief while clarification is assessed; it is cancelled if a question is asked
+        brief_task = asyncio.ensure_future(generate_research_brief(state["messages"]))
+        try:
+            response = await assess_clarification(state["messages"])
+        except BaseException:
+            brief_task.cancel()
+            raise
+        if response.need_clarification:
+            brief_task.cancel()
+            await asyncio.wait([brief_task], timeout=cancel_grace_seconds)
+            metrics.inc("speculative_briefs_total", outcome="discarded")
+        else:
+            pending_research_brief = await brief_task
+            metrics.inc("speculative_briefs_total", outcome="used")
+    else:
+        response = await assess_clarification(state["messages"])
 
     # Route based on clarification need
     if response.need_clarification:
         return Command(
             goto=END, 
-            update={"messages": [AIMessage(content=response.question)]}
+            update={"messages": [AIMessage(content=response.question)], "pending_research_brief": None}
         )
     else:
         return Command(
             goto="write_research_brief", 
-            update={"messages": [AIMessage(content=response.verification)]}
+            update={"messages": [AIMessage(content=response.verification)], "pending_research_brief": pending_research_brief}
         )
 
-def write_research_brief(state: AgentState):
+async def write_research_brief(state: AgentState):
     """
     Transform the conversation history into a comprehensive research brief.
 
     Uses structured output to ensure the brief follows the required format
-    and contains all necessary details for effective research.
+    and contains all necessary details for effective research. A brief already
+    produced by clarify_with_user is used as is.
     """
-    # Set up structured output model
-    structured_output_model = model.with_structured_output(ResearchQuestion)
-
-    # Generate research brief from conversation history
-    response = structured_output_model.invoke([
-        HumanMessage(content=transform_messages_into_research_topic_prompt.format(
-            messages=get_buffer_string(state.get("messages", [])),
-            date=get_today_str()
-        ))
-    ])
+    research_brief = state.get("pending_research_brief")
+    if not research_brief:
+        research_brief = await generate_research_brief(state.get("messages", []))
 
     # Update state with generated research brief and pass it to the supervisor
     return {
-        "research_brief": response.research_brief,
-        "supervisor_messages": [HumanMessage(content=f"{response.research_brief}.")]
+        "research_brief": research_brief,
+        "pending_research_brief": None,
+        "supervisor_messages": [HumanMessage(content=f"{research_brief}.")]
     }
 
 # ===== GRAPH CONSTRUCTION =====
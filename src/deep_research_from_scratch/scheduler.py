@@ -0,0 +1,237 @@
+"""Global Priority Scheduling of Research Work.
+
+Interactive chat runs and background batch jobs share the same provider quota
+and event loop. All their work goes through priority-aware schedulers with a
+fixed number of slots:
+- `scheduler`: supervisor turns and sub-agent launches, across all runs in the
+  process (MAX_ACTIVE_RESEARCHERS slots)
+- `provider_scheduler`: individual search, extract and model calls
+  (MAX_ACTIVE_PROVIDER_CALLS slots). It is a separate pool because provider
+  calls are made by work that already holds a `scheduler` slot
+
+Each run belongs to a priority class, read from `configurable.priority` of the
+run config: "interactive", "normal" (the default) or "bulk" (the default for
+batch jobs). When slots are busy, freed slots are granted by weighted fair
+queuing: each class receives slots in proportion to its weight
+(PRIORITY_WEIGHTS), in arrival order within a class, and a class that was idle
+does not bank credit for later. Queued bulk work is preempted outright: while
+interactive work is waiting, no bulk waiter is granted a slot.
+
+Slots are released in a finally block, so cancelled work frees its slot (or
+leaves the queue) immediately.
+"""
+
+import asyncio
+import os
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import ensure_config
+
+from deep_research_from_scratch.metrics import metrics
+
+# ===== CONFIGURATION =====
+
+PRIORITY_CLASSES = ("interactive", "normal", "bulk")
+
+# Supervisor turns and researchers allowed to run at once across all runs in this process
+max_active_researchers = int(os.environ.get("MAX_ACTIVE_RESEARCHERS", "12"))
+
+# Search, extract and model calls allowed in flight at once across all runs in this process
+max_active_provider_calls = int(os.environ.get("MAX_ACTIVE_PROVIDER_CALLS", "16"))
+
+# Priority class of runs that do not set `configurable.priority`
+default_priority = os.environ.get("DEFAULT_PRIORITY", "normal")
+
+def parse_weights(spec: str) -> dict[str, float]:
+    """Parse "interactive=8,normal=4,bulk=1" into per-class weights."""
+    weights = {"interactive": 8.0, "normal": 4.0, "bulk": 1.0}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        if name.strip() in weights and value.strip():
+            weights[name.strip()] = max(float(value), 0.01)
+    return weights
+
+# Share of freed slots each class receives while several classes are waiting
+priority_weights = parse_weights(os.environ.get("PRIORITY_WEIGHTS", ""))
+
+# ===== PRIORITY CLASSES =====
+
+def normalize_priority(priority) -> str:
+    """Map a configured priority to a known class, falling back to the default."""
+    priority = str(priority).strip().lower()
+    return priority if priority in PRIORITY_CLASSES else default_priority
+
+def run_priority(config: RunnableConfig | None = None, default: str | None = None) -> str:
+    """Return the priority class of the current run.
+
+    The class is read from `configurable.priority` of the run config, so it
+    reaches every node, tool and sub-agent of the run.
+
+    Args:
+        config: Run config; defaults to the config of the enclosing graph run
+        default: Class to use when the run does not set one
+    """
+    config = ensure_config(config)
+    return normalize_priority(config.get("configurable", {}).get("priority", default or default_priority))
+
+# ===== SCHEDULER =====
+
+@dataclass
+class _ClassQueue:
+    waiters: deque = field(default_factory=deque)
+    # Virtual time of the class's next grant; advances by 1 / weight per grant
+    virtual_time: float = 0.0
+
+@dataclass
+class _LoopState:
+    in_use: int = 0
+    # Virtual time of the last grant, used to start newly backlogged classes
+    virtual_time: float = 0.0
+    queues: dict = field(default_factory=lambda: {name: _ClassQueue() for name in PRIORITY_CLASSES})
+
+class PriorityScheduler:
+    """Weighted fair slots shared by all runs, with one set of queues per event loop."""
+
+    def __init__(self, capacity: int, name: str = "researcher", weights: dict[str, float] | None = None):
+        """Create a scheduler granting `capacity` concurrent slots, split by class `weights`."""
+        self.capacity = capacity
+        self.name = name
+        self.weights = weights or priority_weights
+        self._states = weakref.WeakKeyDictionary()
+
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        if loop not in self._states:
+            self._states[loop] = _LoopState()
+        return self._states[loop]
+
+    @staticmethod
+    def _prune(queue: _ClassQueue) -> None:
+        while queue.waiters and queue.waiters[0].done():
+            queue.waiters.popleft()
+
+    @property
+    def in_use(self) -> int:
+        """Slots held in the current event loop."""
+        return self._state().in_use
+
+    def queued(self, priority: str | None = None) -> int:
+        """Waiters queued in the current event loop, optionally for one class."""
+        queues = self._state().queues
+        names = [priority] if priority else PRIORITY_CLASSES
+        return sum(1 for name in names for future in queues[name].waiters if not future.done())
+
+    def _next_class(self, state: _LoopState) -> str | None:
+        for queue in state.queues.values():
+            self._prune(queue)
+        backlogged = [name for name, queue in state.queues.items() if queue.waiters]
+        if not backlogged:
+            return None
+
+        def choose(names: list[str]) -> str:
+            return min(names, key=lambda name: (state.queues[name].virtual_time, PRIORITY_CLASSES.index(name)))
+
+        chosen = choose(backlogged)
+        # Preemption: queued bulk work waits while interactive work is queued
+        if chosen == "bulk" and "interactive" in backlogged:
+            metrics.inc("scheduler_preemptions_total", scheduler=self.name, priority="bulk")
+            backlogged.remove("bulk")
+            chosen = choose(backlogged)
+        return chosen
+
+    def _grant_next(self, state: _LoopState) -> None:
+        while state.in_use < self.capacity:
+            name = self._next_class(state)
+            if name is None:
+                return
+            queue = state.queues[name]
+            future = queue.waiters.popleft()
+            state.virtual_time = queue.virtual_time
+            queue.virtual_time += 1.0 / self.weights[name]
+            state.in_use += 1
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, priority: str = "normal", kind: str = "researcher"):
+        """Hold a slot for the duration of the block.
+
+        Args:
+            priority: Priority class of the work ("interactive", "normal" or "bulk")
+            kind: Kind of work, for metrics (e.g. "supervisor", "researcher", "search", "model")
+        """
+        priority = normalize_priority(priority)
+        state = self._state()
+        started = time.monotonic()
+        if state.in_use < self.capacity and not self.queued():
+            state.in_use += 1
+        else:
+            queue = state.queues[priority]
+            self._prune(queue)
+            if not queue.waiters:
+                # A newly backlogged class starts at the current virtual time instead of banking idle credit
+                queue.virtual_time = max(queue.virtual_time, state.virtual_time)
+            future = asyncio.get_running_loop().create_future()
+            queue.waiters.append(future)
+            metrics.add_gauge("scheduler_queued", 1, scheduler=self.name, kind=kind, priority=priority)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Granted just as we were cancelled: hand the slot on
+                    state.in_use -= 1
+                    self._grant_next(state)
+                raise
+            finally:
+                metrics.add_gauge("scheduler_queued", -1, scheduler=self.name, kind=kind, priority=priority)
+        metrics.add_gauge("scheduler_slots_in_use", 1, scheduler=self.name)
+        metrics.inc("scheduler_wait_seconds_total", time.monotonic() - started, scheduler=self.name, kind=kind, priority=priority)
+        metrics.inc("scheduler_grants_total", scheduler=self.name, kind=kind, priority=priority)
+        try:
+            yield
+        finally:
+            state.in_use -= 1
+            metrics.add_gauge("scheduler_slots_in_use", -1, scheduler=self.name)
+            self._grant_next(state)
+
+# Process-wide schedulers shared by all graphs
+scheduler = PriorityScheduler(max_active_researchers, name="researcher")
+provider_scheduler = PriorityScheduler(max_active_provider_calls, name="provider")
+
+def error_status(error: BaseException) -> str:
+    """Classify a provider error for metrics ("429" for rate limiting, else the HTTP status or "error")."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    message = str(error).lower()
+    if status == 429 or "429" in message or "resource_exhausted" in message or "rate limit" in message:
+        return "429"
+    return str(status) if status else "error"
+
+@asynccontextmanager
+async def provider_slot(kind: str):
+    """Hold a provider-call slot at the current run's priority, timing the call.
+
+    The call's latency (excluding the wait for a slot) and outcome are reported
+    as `provider_request_seconds` and `provider_requests_total`.
+
+    Args:
+        kind: Kind of provider call, for metrics ("search", "extract" or "model")
+    """
+    async with provider_scheduler.slot(run_priority(), kind=kind):
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            metrics.inc("provider_requests_total", kind=kind, status=error_status(e))
+            metrics.observe("provider_request_seconds", time.monotonic() - started, kind=kind)
+            raise
+        metrics.inc("provider_requests_total", kind=kind, status="ok")
+        metrics.observe("provider_request_seconds", time.monotonic() - started, kind=kind)
+
+metrics.describe("scheduler_queued", "Work waiting for a scheduler slot (kind=researcher is queued ConductResearch work)")
+metrics.describe("scheduler_slots_in_use", "Scheduler slots currently held")
+metrics.describe("provider_requests_total", "Search, extract and model calls by outcome (status=429 is rate limiting)")
+metrics.describe("provider_request_seconds", "Latency of search, extract and model calls, excluding scheduling wait")
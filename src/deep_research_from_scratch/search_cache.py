@@ -0,0 +1,268 @@
+"""Query-Level Search Result Cache.
+
+Identical or trivially different queries (case, whitespace, Unicode compatibility
+forms) otherwise hit Tavily again, both within a run and across users. This
+module caches raw search responses in front of `tavily_search_multiple`:
+- Keys are the normalized query plus topic, max_results and whether raw content
+  was requested
+- A persistent SQLite tier survives restarts and is shared by all runs on the host
+- An in-memory LRU tier in front of it serves hot queries without disk access
+- Entries expire with topic-specific TTLs (short for news, long for general)
+- Hits and misses per tier are reported to the metrics registry
+- Async callers are served from memory inline; SQLite reads and writes run in
+  worker threads so they never block the event loop
+
+It also provides a cache of webpage summaries keyed by a hash of the page
+content, and single-flight deduplication of identical in-flight requests. Batch
+runs (see batch.py) switch all of this on for their jobs with `shared_caches`,
+so overlapping briefs in one batch share searches and summaries.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from deep_research_from_scratch.metrics import metrics
+from deep_research_from_scratch.prefetch import normalize_query
+
+# ===== CONFIGURATION =====
+
+# Result caching is opt-in
+search_cache_enabled = os.environ.get("SEARCH_CACHE", "false").lower() == "true"
+
+# SQLite file for the persistent tier
+search_cache_path = Path(os.environ.get("SEARCH_CACHE_PATH", ".langgraph_api/search_cache.sqlite"))
+
+# Time-to-live per search topic, in seconds
+search_cache_ttls = {
+    "news": 60 * 60,
+    "finance": 6 * 60 * 60,
+    "general": 7 * 24 * 60 * 60,
+}
+
+# Number of responses kept in the in-memory LRU tier
+search_cache_memory_size = 512
+
+# Time-to-live of webpage summaries, in seconds (identical content, identical summary)
+summary_cache_ttl = 30 * 24 * 60 * 60
+
+# Set by batch runs to share caches across their jobs even when SEARCH_CACHE is off
+shared_caches: contextvars.ContextVar[bool] = contextvars.ContextVar("shared_caches", default=False)
+
+def caches_active() -> bool:
+    """Return True if search and summary caching applies to the current run."""
+    return search_cache_enabled or shared_caches.get()
+
+# ===== CACHE =====
+
+class SearchResultCache:
+    """Two-tier (memory LRU + SQLite) cache of raw search responses."""
+
+    def __init__(self, path: Path, memory_size: int = search_cache_memory_size):
+        """Create a cache whose SQLite tier lives at `path`; the database is opened on first use."""
+        self.path = Path(path)
+        self.memory_size = memory_size
+        self.memory: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache (key TEXT PRIMARY KEY, expires_at REAL, response TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS search_cache_expiry ON search_cache (expires_at)")
+        return self._conn
+
+    @staticmethod
+    def make_key(query: str, topic: str, max_results: int, include_raw_content: bool) -> str:
+        """Build the cache key for a search request."""
+        return json.dumps([normalize_query(query), topic, max_results, include_raw_content])
+
+    def _memory_get(self, key: str, metric: str):
+        """Return a live memory-tier entry and count the hit; the caller holds the lock."""
+        entry = self.memory.get(key)
+        if entry and entry[0] > time.time():
+            self.memory.move_to_end(key)
+            metrics.inc(metric, result="memory_hit")
+            return entry[1]
+        return None
+
+    def _remember(self, key: str, expires_at: float, response: dict) -> None:
+        self.memory[key] = (expires_at, response)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def get(self, query: str, topic: str, max_results: int, include_raw_content: bool) -> dict | None:
+        """Return a cached response, or None on a miss or expired entry."""
+        key = self.make_key(query, topic, max_results, include_raw_content)
+        now = time.time()
+        with self._lock:
+            response = self._memory_get(key, "search_cache_requests_total")
+            if response is not None:
+                return response
+
+            row = self._connection().execute(
+                "SELECT expires_at, response FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row and row[0] > now:
+                response = json.loads(row[1])
+                self._remember(key, row[0], response)
+                metrics.inc("search_cache_requests_total", result="disk_hit")
+                return response
+
+        metrics.inc("search_cache_requests_total", result="miss")
+        return None
+
+    def put(self, query: str, topic: str, max_results: int, include_raw_content: bool, response: dict) -> None:
+        """Store a search response with the TTL for its topic."""
+        key = self.make_key(query, topic, max_results, include_raw_content)
+        expires_at = time.time() + search_cache_ttls.get(topic, search_cache_ttls["general"])
+        with self._lock:
+            self._remember(key, expires_at, response)
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, expires_at, response) VALUES (?, ?, ?)",
+                (key, expires_at, json.dumps(response)),
+            )
+            conn.execute("DELETE FROM search_cache WHERE expires_at <= ?", (time.time(),))
+            conn.commit()
+
+    async def aget(self, query: str, topic: str, max_results: int, include_raw_content: bool) -> dict | None:
+        """Async `get`: memory hits are served inline, disk lookups run in a worker thread."""
+        with self._lock:
+            response = self._memory_get(self.make_key(query, topic, max_results, include_raw_content), "search_cache_requests_total")
+        if response is not None:
+            return response
+        return await asyncio.to_thread(self.get, query, topic, max_results, include_raw_content)
+
+    async def aput(self, query: str, topic: str, max_results: int, include_raw_content: bool, response: dict) -> None:
+        """Async `put`, writing to SQLite in a worker thread."""
+        await asyncio.to_thread(self.put, query, topic, max_results, include_raw_content, response)
+
+class SummaryCache:
+    """Two-tier (memory LRU + SQLite) cache of webpage summaries keyed by content hash."""
+
+    def __init__(self, cache: SearchResultCache, ttl_seconds: float = summary_cache_ttl):
+        """Create a summary cache sharing the SQLite database of `cache`."""
+        self.cache = cache
+        self.ttl_seconds = ttl_seconds
+        self._table_ready = False
+
+    @staticmethod
+    def make_key(content: str) -> str:
+        """Build the cache key for a page's raw content."""
+        return "summary:" + hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = self.cache._connection()
+        if not self._table_ready:
+            conn.execute("CREATE TABLE IF NOT EXISTS summary_cache (key TEXT PRIMARY KEY, expires_at REAL, summary TEXT)")
+            self._table_ready = True
+        return conn
+
+    def get(self, content: str) -> str | None:
+        """Return a cached summary of the content, or None."""
+        key = self.make_key(content)
+        now = time.time()
+        with self.cache._lock:
+            summary = self.cache._memory_get(key, "summary_cache_requests_total")
+            if summary is not None:
+                return summary
+            row = self._connection().execute(
+                "SELECT expires_at, summary FROM summary_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row and row[0] > now:
+                self.cache._remember(key, row[0], row[1])
+                metrics.inc("summary_cache_requests_total", result="disk_hit")
+                return row[1]
+        metrics.inc("summary_cache_requests_total", result="miss")
+        return None
+
+    def put(self, content: str, summary: str) -> None:
+        """Store the summary of a page's content."""
+        key = self.make_key(content)
+        expires_at = time.time() + self.ttl_seconds
+        with self.cache._lock:
+            self.cache._remember(key, expires_at, summary)
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO summary_cache (key, expires_at, summary) VALUES (?, ?, ?)",
+                (key, expires_at, summary),
+            )
+            conn.commit()
+
+    async def aget(self, content: str) -> str | None:
+        """Async `get`: memory hits are served inline, disk lookups run in a worker thread."""
+        with self.cache._lock:
+            summary = self.cache._memory_get(self.make_key(content), "summary_cache_requests_total")
+        if summary is not None:
+            return summary
+        return await asyncio.to_thread(self.get, content)
+
+    async def aput(self, content: str, summary: str) -> None:
+        """Async `put`, writing to SQLite in a worker thread."""
+        await asyncio.to_thread(self.put, content, summary)
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key.
+
+    The shared call is cancelled only when every caller waiting on it has been
+    cancelled.
+    """
+
+    def __init__(self, name: str):
+        """Create a single-flight group; `name` labels its metrics."""
+        self.name = name
+        self._calls = weakref.WeakKeyDictionary()
+
+    async def run(self, key: str, factory: Callable[[], Awaitable]):
+        """Await the in-flight call for `key`, starting it with `factory` if there is none."""
+        calls = self._calls.setdefault(asyncio.get_running_loop(), {})
+        entry = calls.get(key)
+        if entry is None:
+            entry = calls[key] = [asyncio.ensure_future(factory()), 0]
+            entry[0].add_done_callback(lambda _, entry=entry: calls.pop(key, None) if calls.get(key) is entry else None)
+        else:
+            metrics.inc("singleflight_shared_total", call=self.name)
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        except asyncio.CancelledError:
+            if entry[1] == 1 and not entry[0].done():
+                entry[0].cancel()
+            raise
+        finally:
+            entry[1] -= 1
+
+def search_cache_hit_ratio() -> float:
+    """Return the fraction of cache lookups served from either tier."""
+    hits = sum(metrics.get("search_cache_requests_total", result=result) for result in ("memory_hit", "disk_hit"))
+    total = hits + metrics.get("search_cache_requests_total", result="miss")
+    return hits / total if total else 0.0
+
+def collect_cache_ratios(registry) -> None:
+    """Export search and summary cache hit ratios as gauges."""
+    for name in ("search_cache", "summary_cache"):
+        hits = sum(registry.get(f"{name}_requests_total", result=result) for result in ("memory_hit", "disk_hit"))
+        total = hits + registry.get(f"{name}_requests_total", result="miss")
+        registry.set_gauge(f"{name}_hit_ratio", hits / total if total else 0.0)
+
+metrics.register_collector(collect_cache_ratios)
+
+search_cache = SearchResultCache(search_cache_path)
+summary_cache = SummaryCache(search_cache)
+inflight_searches = SingleFlight("search")
+inflight_summaries = SingleFlight("summary")
@@ -0,0 +1,175 @@
+"""Pluggable Search Providers.
+
+`tavily_search` and the rest of the search pipeline dispatch through a search
+provider instead of a hardwired Tavily client. Every provider returns responses
+in Tavily's shape, so deduplication, ranking, summarization and formatting work
+unchanged:
+
+    {"query": str, "results": [{"url", "title", "content", "score", "raw_content"}]}
+
+Providers expose sync methods and async counterparts (`asearch`, `aextract`).
+The async methods are what the research tools use, so that cancelling a run
+aborts in-flight requests instead of leaving them running in worker threads.
+
+Available providers (selected with the SEARCH_PROVIDER environment variable):
+- "tavily": Tavily web search (default)
+- "local": BM25 search over a local directory of documents (LOCAL_CORPUS_DIR),
+  for offline runs, load tests and research over private document dumps
+"""
+
+import asyncio
+import os
+import weakref
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from deep_research_from_scratch.corpus_index import corpus_index_dir, get_corpus_index
+
+# ===== CONFIGURATION =====
+
+# Search backend: "tavily" or "local"
+search_provider_name = os.environ.get("SEARCH_PROVIDER", "tavily")
+
+# Directory of documents searched by the local provider
+local_corpus_dir = Path(os.environ.get("LOCAL_CORPUS_DIR", "corpus"))
+
+# ===== PROVIDERS =====
+
+class SearchProvider(ABC):
+    """Interface for search backends used by the research tools."""
+
+    @abstractmethod
+    def search(self, query: str, max_results: int = 3, include_raw_content: bool = True, topic: str = "general") -> dict:
+        """Search for a query and return a Tavily-shaped response."""
+
+    @abstractmethod
+    def extract(self, urls: list[str]) -> dict:
+        """Fetch raw content for URLs and return {"results": [{"url", "raw_content"}]}."""
+
+    async def asearch(self, query: str, max_results: int = 3, include_raw_content: bool = True, topic: str = "general") -> dict:
+        """Async search; runs the sync search in a thread unless overridden."""
+        return await asyncio.to_thread(self.search, query, max_results, include_raw_content, topic)
+
+    async def aextract(self, urls: list[str]) -> dict:
+        """Async extract; runs the sync extract in a thread unless overridden."""
+        return await asyncio.to_thread(self.extract, urls)
+
+class TavilySearchProvider(SearchProvider):
+    """Tavily web search. The clients are created on first use."""
+
+    def __init__(self):
+        """Create a provider; the Tavily clients are created on first use."""
+        self._client = None
+        # Async clients hold a connection pool bound to an event loop, so keep one per loop
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self):
+        """Get or initialize the Tavily client lazily."""
+        if self._client is None:
+            from tavily import TavilyClient
+            self._client = TavilyClient()
+        return self._client
+
+    def search(self, query: str, max_results: int = 3, include_raw_content: bool = True, topic: str = "general") -> dict:
+        """Search the web with Tavily."""
+        return self.client.search(query, max_results=max_results, include_raw_content=include_raw_content, topic=topic)
+
+    def extract(self, urls: list[str]) -> dict:
+        """Fetch raw page content with Tavily extract."""
+        return self.client.extract(urls=urls)
+
+    @property
+    def async_client(self):
+        """Get or initialize the async Tavily client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_clients:
+            from tavily import AsyncTavilyClient
+            self._async_clients[loop] = AsyncTavilyClient()
+        return self._async_clients[loop]
+
+    async def asearch(self, query: str, max_results: int = 3, include_raw_content: bool = True, topic: str = "general") -> dict:
+        """Search the web with the async Tavily client."""
+        return await self.async_client.search(query, max_results=max_results, include_raw_content=include_raw_content, topic=topic)
+
+    async def aextract(self, urls: list[str]) -> dict:
+        """Fetch raw page content with the async Tavily client."""
+        return await self.async_client.extract(urls=urls)
+
+class LocalCorpusSearchProvider(SearchProvider):
+    """BM25 search over a local document directory.
+
+    Results are documents ranked by their best-matching passage. The snippet is
+    that passage and the raw content is the full document. The `topic` filter
+    has no meaning for a local corpus and is ignored.
+    """
+
+    def __init__(self, root: Path, index_dir: Path = corpus_index_dir):
+        """Create a provider over the corpus at `root`, indexed under `index_dir`."""
+        self.index = get_corpus_index(root, index_dir)
+
+    def _url(self, rel_path: str) -> str:
+        return (self.index.root / rel_path).as_uri()
+
+    def _read(self, url: str) -> str | None:
+        prefix = self.index.root.as_uri() + "/"
+        if not url.startswith(prefix):
+            return None
+        path = (self.index.root / url[len(prefix):]).resolve()
+        if not path.is_relative_to(self.index.root) or not path.is_file():
+            return None
+        return path.read_text(encoding="utf-8", errors="replace")
+
+    @staticmethod
+    def _title(rel_path: str, text: str) -> str:
+        for line in text.splitlines():
+            if line.strip():
+                return line.strip().lstrip("#").strip()[:120]
+        return Path(rel_path).name
+
+    def search(self, query: str, max_results: int = 3, include_raw_content: bool = True, topic: str = "general") -> dict:
+        """Search the local corpus, refreshing the index for changed files first."""
+        self.index.refresh()
+
+        # Over-fetch passages so that several documents are represented
+        results = {}
+        for passage in self.index.search(query, k=max_results * 5):
+            if passage.path in results:
+                continue
+            text = self._read(self._url(passage.path)) or ""
+            results[passage.path] = {
+                "url": self._url(passage.path),
+                "title": self._title(passage.path, text),
+                "content": passage.text.strip(),
+                "score": passage.score,
+                "raw_content": text if include_raw_content else None,
+            }
+            if len(results) == max_results:
+                break
+
+        return {"query": query, "results": list(results.values())}
+
+    def extract(self, urls: list[str]) -> dict:
+        """Read full documents for file URLs inside the corpus directory."""
+        results, failed = [], []
+        for url in urls:
+            text = self._read(url)
+            if text is None:
+                failed.append({"url": url, "error": "Not a document in the local corpus"})
+            else:
+                results.append({"url": url, "raw_content": text})
+        return {"results": results, "failed_results": failed}
+
+_provider: SearchProvider | None = None
+
+def get_search_provider() -> SearchProvider:
+    """Get or initialize the configured search provider lazily."""
+    global _provider
+    if _provider is None:
+        if search_provider_name == "local":
+            _provider = LocalCorpusSearchProvider(local_corpus_dir)
+        elif search_provider_name == "tavily":
+            _provider = TavilySearchProvider()
+        else:
+            raise ValueError(f"Unknown SEARCH_PROVIDER: {search_provider_name}")
+    return _provider
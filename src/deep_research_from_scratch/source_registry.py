@@ -0,0 +1,391 @@
+"""Run-Scoped Source Registry with Stable Citation IDs.
+
+Without a registry every researcher numbers its search results from 1, the
+compression step renumbers them, and the final report renumbers them again,
+repeating full URLs in every prompt along the way. With the registry enabled:
+- Each URL gets a short ID (S1, S2, ...) the first time any sub-agent sees it,
+  shared by all sub-agents of the same run (keyed by the ID of the root run, so
+  every run of a chat thread starts from S1)
+- Registries of runs with a thread are written through to SQLite next to the
+  server's checkpoints, so a run the server resumes after a restart keeps its
+  IDs; IDs are allocated in SQLite transactions, so they never collide
+- Search tool output shows the URL only when a source is new; sources seen
+  before are referred to by ID
+- Compressed notes and the final report cite sources as [S3] and list no URLs
+- The bibliography is rendered once, from the registry, under the final report
+
+Every run's registry also keeps a content fingerprint of each page it fetched,
+whether or not stable IDs are enabled, so a later report refresh (see
+report_refresh.py) can tell whether a page changed since.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import ensure_config
+from langchain_core.tracers.context import register_configure_hook
+
+from deep_research_from_scratch.ranking import tokenize
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURATION =====
+
+# Stable source IDs are opt-in
+source_registry_enabled = os.environ.get("SOURCE_REGISTRY", "false").lower() == "true"
+
+# Number of runs whose registries are kept in memory
+max_registries = 256
+
+# SQLite file the registries of runs with stable IDs are persisted to
+source_registry_path = Path(os.environ.get("SOURCE_REGISTRY_PATH", ".langgraph_api/source_registry.sqlite"))
+
+# Size of content fingerprints (bottom-k sketch of word shingles) and shingle length in words
+FINGERPRINT_SIZE = 64
+SHINGLE_WORDS = 5
+
+SOURCE_ID_PATTERN = re.compile(r"\[(S\d+(?:\s*,\s*S\d+)*)\]")
+# Source IDs in citations and in the "SOURCE S3" headers of search tool output
+SOURCE_ID_REFERENCE_PATTERN = re.compile(r"\[S\d+(?:\s*,\s*S\d+)*\]|SOURCE S\d+\b")
+SOURCE_ID_TOKEN_PATTERN = re.compile(r"S\d+")
+CITATION_RULES_PATTERN = re.compile(r"<Citation Rules>.*?</Citation Rules>", re.DOTALL)
+
+SOURCE_ID_CITATION_RULES = """<Citation Rules>
+- Every source already has a stable ID such as S3, shown in the search results as "SOURCE S3"
+- Cite sources inline with their IDs in square brackets, e.g. [S3] or [S3, S7]
+- Never renumber sources, never invent IDs, and do not write out URLs
+- Do NOT add a Sources or References section; the bibliography is added automatically from the IDs you cite
+- These rules take precedence over any other instructions above about citation formats, URLs or source lists
+</Citation Rules>"""
+
+# ===== DATA STRUCTURES =====
+
+@dataclass
+class SourceEntry:
+    """A registered source."""
+    source_id: str
+    url: str
+    title: str
+
+# ===== CONTENT FINGERPRINTS =====
+
+def content_fingerprint(text: str) -> list[int]:
+    """Sketch a page as the smallest hashes of its word shingles.
+
+    Unlike a hash of the raw text, the sketch tolerates formatting differences
+    between fetches (search vs extract, whitespace, markup) while still
+    changing when the wording of the page changes.
+    """
+    words = tokenize(text)
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(len(words) - SHINGLE_WORDS + 1, 1))}
+    hashes = {int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big") for shingle in shingles}
+    return sorted(hashes)[:FINGERPRINT_SIZE]
+
+def fingerprint_similarity(a: list[int], b: list[int]) -> float:
+    """Estimate the shingle overlap (Jaccard similarity) of two pages from their fingerprints."""
+    if not a or not b:
+        return 0.0
+    set_a, set_b = set(a), set(b)
+    union_sketch = sorted(set_a | set_b)[:FINGERPRINT_SIZE]
+    return sum(1 for value in union_sketch if value in set_a and value in set_b) / len(union_sketch)
+
+# ===== PERSISTENCE =====
+
+class RegistryStore:
+    """SQLite store of the sources and fingerprints of each run's registry.
+
+    Rows carry the thread_id of their run, so a pruned thread's registries can be
+    deleted with it.
+    """
+
+    def __init__(self, path: Path):
+        """Create a store backed by the SQLite file at `path`, opened on first use."""
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Autocommit mode; ID allocation opens its own write transaction
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS run_sources "
+                "(run_key TEXT, thread_id TEXT, number INTEGER, url_key TEXT, url TEXT, title TEXT, "
+                "PRIMARY KEY (run_key, number), UNIQUE (run_key, url_key))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS run_fingerprints "
+                "(run_key TEXT, thread_id TEXT, url_key TEXT, fingerprint TEXT, PRIMARY KEY (run_key, url_key))"
+            )
+        return self._conn
+
+    def load(self, run_key: str) -> tuple[list[SourceEntry], dict[str, list[int]]]:
+        """Return the persisted sources (in ID order) and fingerprints of a run."""
+        with self._lock:
+            conn = self._connection()
+            sources = conn.execute(
+                "SELECT number, url, title FROM run_sources WHERE run_key = ? ORDER BY number", (run_key,)
+            ).fetchall()
+            fingerprints = conn.execute(
+                "SELECT url_key, fingerprint FROM run_fingerprints WHERE run_key = ?", (run_key,)
+            ).fetchall()
+        entries = [SourceEntry(f"S{number}", url, title) for number, url, title in sources]
+        return entries, {url_key: json.loads(fingerprint) for url_key, fingerprint in fingerprints}
+
+    def allocate(self, run_key: str, thread_id: str, url_key: str, url: str, title: str) -> tuple[SourceEntry, bool]:
+        """Return the run's entry for a URL, allocating the next ID if it has none.
+
+        The lookup and the allocation run in one write transaction, so processes
+        sharing the file never hand out the same ID twice.
+
+        Returns:
+            The entry and whether this call allocated it
+        """
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT number, url, title FROM run_sources WHERE run_key = ? AND url_key = ?", (run_key, url_key)
+                ).fetchone()
+                allocated = row is None
+                if allocated:
+                    (number,) = conn.execute(
+                        "SELECT COALESCE(MAX(number), 0) + 1 FROM run_sources WHERE run_key = ?", (run_key,)
+                    ).fetchone()
+                    conn.execute(
+                        "INSERT INTO run_sources (run_key, thread_id, number, url_key, url, title) VALUES (?, ?, ?, ?, ?, ?)",
+                        (run_key, thread_id, number, url_key, url, title),
+                    )
+                    row = (number, url, title)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        number, url, title = row
+        return SourceEntry(f"S{number}", url, title), allocated
+
+    def set_fingerprint(self, run_key: str, thread_id: str, url_key: str, fingerprint: list[int]) -> None:
+        """Persist the fingerprint of a fetched page."""
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO run_fingerprints (run_key, thread_id, url_key, fingerprint) VALUES (?, ?, ?, ?)",
+                (run_key, thread_id, url_key, json.dumps(fingerprint)),
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete the registries of all runs of a thread, e.g. when the thread is pruned."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM run_sources WHERE thread_id = ?", (thread_id,))
+            conn.execute("DELETE FROM run_fingerprints WHERE thread_id = ?", (thread_id,))
+
+# ===== REGISTRY =====
+
+class SourceRegistry:
+    """Thread-safe mapping from URLs to stable short source IDs.
+
+    Given a store, the run's key and its thread_id, the registry starts from the
+    run's persisted state, allocates IDs in the store and writes fingerprints
+    through to it.
+    """
+
+    def __init__(self, store: RegistryStore | None = None, run_key: str | None = None, thread_id: str | None = None):
+        """Create an empty registry, or load the persisted one of `run_key` from `store`."""
+        self._lock = threading.Lock()
+        self._by_url: dict[str, SourceEntry] = {}
+        self._by_id: dict[str, SourceEntry] = {}
+        self._fingerprints: dict[str, list[int]] = {}
+        self._store = store if run_key is not None else None
+        self._run_key = run_key
+        self._thread_id = thread_id
+        if self._store is not None:
+            entries, self._fingerprints = self._store.load(run_key)
+            for entry in entries:
+                self._by_url[self._key(entry.url)] = entry
+                self._by_id[entry.source_id] = entry
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return url.rstrip("/").lower()
+
+    def register(self, url: str, title: str = "") -> tuple[str, bool]:
+        """Return the ID for a URL and whether it was newly registered."""
+        with self._lock:
+            entry = self._by_url.get(self._key(url))
+            if entry is not None:
+                return entry.source_id, False
+            if self._store is not None:
+                entry, is_new = self._store.allocate(self._run_key, self._thread_id, self._key(url), url, title or url)
+            else:
+                entry, is_new = SourceEntry(f"S{len(self._by_url) + 1}", url, title or url), True
+            self._by_url[self._key(url)] = entry
+            self._by_id[entry.source_id] = entry
+            return entry.source_id, is_new
+
+    def get(self, source_id: str) -> SourceEntry | None:
+        """Look up a source by ID."""
+        with self._lock:
+            return self._by_id.get(source_id)
+
+    def record_content(self, url: str, content: str) -> None:
+        """Remember the fingerprint of a page's raw content."""
+        self.record_fingerprint(url, content_fingerprint(content))
+
+    def record_fingerprint(self, url: str, fingerprint: list[int]) -> None:
+        """Remember the fingerprint of a page, e.g. one computed by a worker."""
+        with self._lock:
+            self._fingerprints[self._key(url)] = fingerprint
+            if self._store is not None:
+                self._store.set_fingerprint(self._run_key, self._thread_id, self._key(url), fingerprint)
+
+    def fingerprint(self, url: str) -> list[int] | None:
+        """Return the fingerprint recorded for a URL in this run, if any."""
+        with self._lock:
+            return self._fingerprints.get(self._key(url))
+
+    def fingerprints(self) -> dict[str, list[int]]:
+        """Return all fingerprints recorded in this run, keyed by normalized URL."""
+        with self._lock:
+            return dict(self._fingerprints)
+
+    def cited_ids(self, text: str) -> list[str]:
+        """Return registered IDs cited in a text, in order of first citation."""
+        ids = []
+        for group in SOURCE_ID_PATTERN.findall(text):
+            ids.extend(source_id.strip() for source_id in group.split(","))
+        return [source_id for source_id in dict.fromkeys(ids) if self.get(source_id)]
+
+    def referenced_entries(self, texts: list[str]) -> list[SourceEntry]:
+        """Return the registered sources cited or listed (as "SOURCE S3") in any of the texts."""
+        ids = [
+            token
+            for text in texts
+            for reference in SOURCE_ID_REFERENCE_PATTERN.findall(text)
+            for token in SOURCE_ID_TOKEN_PATTERN.findall(reference)
+        ]
+        return [entry for entry in map(self.get, dict.fromkeys(ids)) if entry is not None]
+
+    def adopt(self, entries: list[SourceEntry], fingerprints: dict[str, list[int]]) -> dict[str, str]:
+        """Register sources of another registry (e.g. a worker's) and return their ID mapping.
+
+        Args:
+            entries: Sources as registered by the other registry
+            fingerprints: Page fingerprints recorded by the other registry
+
+        Returns:
+            Mapping from the other registry's IDs to this registry's IDs
+        """
+        mapping = {entry.source_id: self.register(entry.url, entry.title)[0] for entry in entries}
+        for url_key, fingerprint in fingerprints.items():
+            self.record_fingerprint(url_key, fingerprint)
+        return mapping
+
+    def render_bibliography(self, text: str) -> str:
+        """Render the sources cited in a text as a markdown list."""
+        entries = [self.get(source_id) for source_id in self.cited_ids(text)]
+        if not entries:
+            return ""
+        lines = [f"- [{entry.source_id}] {entry.title}: {entry.url}" for entry in entries]
+        return "### Sources\n" + "\n".join(lines)
+
+def remap_source_ids(text: str, mapping: dict[str, str]) -> str:
+    """Rewrite the source IDs cited or listed in a text through an ID mapping."""
+    def remap_reference(match: re.Match) -> str:
+        return SOURCE_ID_TOKEN_PATTERN.sub(lambda token: mapping.get(token.group(), token.group()), match.group())
+    return SOURCE_ID_REFERENCE_PATTERN.sub(remap_reference, text)
+
+# ===== RUN LOOKUP =====
+
+# ID of the root run of the graph run executing in the current context
+current_root_run: ContextVar[str | None] = ContextVar("source_registry_root_run", default=None)
+
+class RootRunHandler(BaseCallbackHandler):
+    """Callback handler that records the root run of each graph run in its context.
+
+    It runs inline when the root chain starts, before LangGraph creates the
+    tasks of the run, so every node, tool and sub-agent of the run inherits the
+    root run's ID.
+    """
+
+    run_inline = True
+
+    def on_chain_start(self, serialized: Any, inputs: Any, *, run_id: UUID, parent_run_id: UUID | None = None, **kwargs: Any) -> None:
+        """Record a chain without a parent as the root run of the current context."""
+        if parent_run_id is None:
+            current_root_run.set(str(run_id))
+
+root_run_handler_var: ContextVar[RootRunHandler | None] = ContextVar("root_run_handler", default=RootRunHandler())
+register_configure_hook(root_run_handler_var, inheritable=True)
+
+registry_store = RegistryStore(source_registry_path)
+_registries: OrderedDict[str, SourceRegistry] = OrderedDict()
+_registries_lock = threading.Lock()
+
+def run_key_of(config: RunnableConfig) -> str | None:
+    """Return the key of a run's registry: the ID of its root run.
+
+    On the LangGraph server this is the server's run ID from the config's
+    metadata, which a run keeps when the server resumes it. Elsewhere it is the
+    ID of the root run executing in the current context.
+    """
+    run_id = config.get("metadata", {}).get("run_id") or current_root_run.get()
+    return str(run_id) if run_id is not None else None
+
+def open_source_registry(run_key: str, thread_id: str | None = None) -> SourceRegistry:
+    """Get the registry of a run, creating it if needed.
+
+    Registries of runs with a thread_id are loaded from and written through to
+    the persistent store; the others live in memory only.
+    """
+    with _registries_lock:
+        registry = _registries.get(run_key)
+        if registry is None:
+            store = registry_store if thread_id is not None else None
+            registry = _registries[run_key] = SourceRegistry(store, run_key, thread_id)
+        _registries.move_to_end(run_key)
+        while len(_registries) > max_registries:
+            _registries.popitem(last=False)
+        return registry
+
+def close_source_registry(run_key: str) -> None:
+    """Drop a run's registry from memory once the run is over."""
+    with _registries_lock:
+        _registries.pop(run_key, None)
+
+def get_source_registry(config: RunnableConfig | None = None) -> SourceRegistry:
+    """Get the registry of the current run.
+
+    Runs are identified by their root run (see `run_key_of`). When no config is
+    given, the config of the enclosing graph run is used, so tools and nodes can
+    call this without threading the config through. With stable IDs enabled,
+    registries of runs with a thread are persisted.
+    """
+    config = ensure_config(config)
+    run_key = run_key_of(config)
+    if run_key is None:
+        logger.debug("No graph run is active; using the shared default source registry")
+        run_key = "default"
+    thread_id = config.get("configurable", {}).get("thread_id")
+    persistent = source_registry_enabled and thread_id is not None and run_key != "default"
+    return open_source_registry(run_key, str(thread_id) if persistent else None)
+
+def with_source_id_rules(prompt: str) -> str:
+    """Replace a prompt's citation rules with the stable source ID rules."""
+    return CITATION_RULES_PATTERN.sub(lambda _: SOURCE_ID_CITATION_RULES, prompt)
@@ -0,0 +1,44 @@
+"""State Definitions for Incremental Report Refresh.
+
+This module defines the state objects and structured schemas used to refresh
+a previous run's report with only the research and sections that changed.
+"""
+
+from pydantic import BaseModel, Field
+from typing_extensions import NotRequired, TypedDict
+
+from deep_research_from_scratch.state_scope import AgentState
+
+
+class RefreshInputState(TypedDict):
+    """Input state for a refresh - the brief to refresh, or the run to refresh."""
+    # Research brief of the report to refresh (optional when refresh_from is given)
+    research_brief: NotRequired[str]
+    # thread_id of the run to refresh; defaults to the latest run with the same brief
+    refresh_from: NotRequired[str]
+
+class RefreshState(AgentState):
+    """State for an incremental report refresh.
+
+    Reuses the full agent's fields; `notes` only collects the delta research
+    of this refresh, the previous run's notes stay in `previous_run`.
+    """
+
+    # thread_id of the run to refresh
+    refresh_from: str | None
+    # Archived run being refreshed (None when there is none and a full run is done instead)
+    previous_run: dict | None
+    # Archived sources whose content changed or could not be fetched again
+    changed_sources: list[dict]
+    # Supervisor iteration counter, started close to the limit so a refresh delegates little
+    research_iterations: int
+
+class SectionUpdatePlan(BaseModel):
+    """Schema for choosing the report sections affected by new findings."""
+
+    sections_to_update: list[int] = Field(
+        description="Numbers of the existing sections whose content is affected by the new findings.",
+    )
+    new_section_title: str = Field(
+        description="Title of a new section for findings that fit no existing section. Empty if none is needed.",
+    )
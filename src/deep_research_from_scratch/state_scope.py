@@ -30,12 +30,16 @@ class AgentState(MessagesState):
 
     # Research brief generated from user conversation history
     research_brief: Optional[str]
+    # Brief produced together with the clarification decision, consumed by write_research_brief
+    pending_research_brief: Optional[str]
     # Messages exchanged with the supervisor agent for coordination
     supervisor_messages: Annotated[Sequence[BaseMessage], add_messages]
     # Raw unprocessed research notes collected during the research phase
     raw_notes: Annotated[list[str], operator.add] = []
     # Processed and structured notes ready for report generation
     notes: Annotated[list[str], operator.add] = []
+    # Deduplicated evidence with a global source table, used by the writer when present
+    consolidated_notes: Optional[str]
     # Final formatted research report
     final_report: str
 
@@ -54,6 +58,13 @@ class ClarifyWithUser(BaseModel):
         description="Verify message that we will start research after the user has provided the necessary information.",
     )
 
+class ClarifyWithUserAndBrief(ClarifyWithUser):
+    """Schema for the clarification decision and research brief in a single call."""
+
+    research_brief: str = Field(
+        description="A research question that will be used to guide the research. Empty if clarification is needed.",
+    )
+
 class ResearchQuestion(BaseModel):
     """Schema for structured research brief generation."""
 
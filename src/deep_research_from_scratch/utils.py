@@ -4,6 +4,8 @@ This module provides search and content processing utilities for the research ag
 including web search capabilities and content summarization tools.
 """
 
+import asyncio
+import logging
 import os
 import platform
 import subprocess
@@ -13,12 +15,29 @@ from typing_extensions import Annotated, List, Literal
 
 from langchain.chat_models import init_chat_model
 from langchain_core.messages import HumanMessage
-from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool, InjectedToolArg
-from tavily import TavilyClient
 
+from deep_research_from_scratch.prefetch import current_speculative_cache, extract_candidate_queries, normalize_query
 from deep_research_from_scratch.state_research import Summary
 from deep_research_from_scratch.prompts import summarize_webpage_prompt
+from deep_research_from_scratch.ranking import rank_documents
+from deep_research_from_scratch.cassette import with_cassette
+# Imported for its configure hook: starts loop lag monitors when LOOP_DIAGNOSTICS is set
+from deep_research_from_scratch import diagnostics  # noqa: F401
+from deep_research_from_scratch.load_control import run_depth
+from deep_research_from_scratch.metrics import metrics
+from deep_research_from_scratch.scheduler import provider_slot
+from deep_research_from_scratch.search_cache import (
+    caches_active,
+    inflight_searches,
+    inflight_summaries,
+    search_cache,
+    summary_cache,
+)
+from deep_research_from_scratch.search_providers import get_search_provider, search_provider_name
+from deep_research_from_scratch.source_registry import SourceRegistry, get_source_registry, source_registry_enabled
+
+logger = logging.getLogger(__name__)
 
 # ===== UTILITY FUNCTIONS =====
 
@@ -75,17 +94,34 @@ def convert_path_for_mcp(path: Path) -> str:
 
 # Primary: Google Gemini | Alternatives: "openai:gpt-4.1-mini", "anthropic:claude-haiku-3-5-20241022"
 summarization_model = init_chat_model(model="gemini-2.5-pro", model_provider="google_genai", temperature=0.0)
-tavily_client = TavilyClient()
+# Search backend (Tavily by default, or a local corpus); see search_providers.py
+search_provider = with_cassette(get_search_provider())
+
+# Only remote web searches are worth caching
+cacheable_provider = search_provider_name == "tavily"
+
+# Two-phase retrieval: search snippets first, rank them locally with BM25, and
+# fetch and summarize raw content only for the top-ranked hits
+two_phase_retrieval = os.environ.get("TWO_PHASE_RETRIEVAL", "false").lower() == "true"
+
+# Snippet candidates requested per query in the first phase
+two_phase_candidates = 8
+
+# Number of top-ranked results whose raw content is fetched and summarized
+two_phase_top_k = 2
+
+# Most queries one tavily_search_batch call runs; each counts as one search
+max_batch_queries = int(os.environ.get("SEARCH_BATCH_MAX_QUERIES", "4"))
 
 # ===== SEARCH FUNCTIONS =====
 
-def tavily_search_multiple(
+async def tavily_search_multiple(
     search_queries: List[str],
     max_results: int = 3,
     topic: Literal["general", "news", "finance"] = "general",
     include_raw_content: bool = True,
 ) -> List[dict]:
-    """Perform search using Tavily API for multiple queries.
+    """Perform search using the configured search provider (Tavily by default) for multiple queries.
 
     Args:
         search_queries: List of search queries to execute
@@ -97,22 +133,90 @@ def tavily_search_multiple(
         List of search result dictionaries
     """
 
-    # Execute searches sequentially. Note: yon can use AsyncTavilyClient to parallelize this step.
-    search_docs = []
-    for query in search_queries:
-        result = tavily_client.search(
-            query,
-            max_results=max_results,
-            include_raw_content=include_raw_content,
-            topic=topic
-        )
-        search_docs.append(result)
+    use_cache = cacheable_provider and caches_active()
+    metrics.inc("search_queries_total", len(search_queries), topic=topic)
+
+    async def search(query: str) -> dict:
+        # Serve repeated (normalized) queries from the result cache when enabled
+        if use_cache:
+            cached = await search_cache.aget(query, topic, max_results, include_raw_content)
+            if cached is not None:
+                return cached
+
+        async with provider_slot("search"):
+            result = await search_provider.asearch(
+                query,
+                max_results=max_results,
+                include_raw_content=include_raw_content,
+                topic=topic
+            )
+
+        if use_cache:
+            await search_cache.aput(query, topic, max_results, include_raw_content, result)
+        return result
+
+    async def search_once(query: str) -> dict:
+        # Concurrent identical searches (e.g. from other jobs of a batch) share one request
+        if not use_cache:
+            return await search(query)
+        key = search_cache.make_key(query, topic, max_results, include_raw_content)
+        return await inflight_searches.run(key, lambda: search(query))
+
+    # Execute searches concurrently; results keep the order of the queries
+    return list(await asyncio.gather(*(search_once(query) for query in search_queries)))
 
-    return search_docs
+async def rank_and_fetch_top_results(queries: List[str], search_results: List[dict], max_results: int, top_k: int) -> dict:
+    """Rank snippet-only results and fetch raw content for the most relevant ones.
 
-def summarize_webpage_content(webpage_content: str) -> str:
+    Each query's results are scored with BM25 over their title and snippet
+    against that query, then the per-query rankings are merged rank by rank, so
+    a URL found by several queries keeps its best rank. Only the top_k results
+    of each query get their raw content fetched (and later summarized); the rest
+    of its max_results keep their snippet as content.
+
+    Args:
+        queries: Search queries, aligned with `search_results`
+        search_results: Snippet-only search responses, one per query
+        max_results: Number of ranked results to keep per query
+        top_k: Number of results per query to fetch raw content for
+
+    Returns:
+        Dictionary mapping URLs to the kept results in ranked order
+    """
+    rankings = []
+    for query, response in zip(queries, search_results):
+        results = response["results"]
+        order = rank_documents(query, [f"{r['title']} {r['content']}" for r in results])
+        rankings.append([results[i] for i in order[:max_results]])
+
+    ranked = {}
+    top_urls = []
+    for rank in range(max_results):
+        for ranking in rankings:
+            if rank < len(ranking) and ranking[rank]["url"] not in ranked:
+                ranked[ranking[rank]["url"]] = ranking[rank]
+                if rank < top_k:
+                    top_urls.append(ranking[rank]["url"])
+
+    if top_urls:
+        try:
+            async with provider_slot("extract"):
+                extracted = await search_provider.aextract(urls=top_urls)
+            for item in extracted.get("results", []):
+                if item.get("url") in ranked and item.get("raw_content"):
+                    ranked[item["url"]] = {**ranked[item["url"]], "raw_content": item["raw_content"]}
+        except Exception as e:
+            logger.warning("Failed to fetch raw content: %s", e)
+
+    return ranked
+
+async def summarize_webpage_content(webpage_content: str) -> str:
     """Summarize webpage content using the configured summarization model.
 
+    Summaries are cached by content hash, and concurrent requests for the same
+    content share one model call, when caching is active for the run. If the
+    model fails, the content is truncated instead; truncations are not cached.
+
     Args:
         webpage_content: Raw webpage content to summarize
 
@@ -120,28 +224,50 @@ def summarize_webpage_content(webpage_content: str) -> str:
         Formatted summary with key excerpts
     """
     try:
-        # Set up structured output model for summarization
-        structured_model = summarization_model.with_structured_output(Summary)
+        if not caches_active():
+            return await generate_webpage_summary(webpage_content)
+
+        cached = await summary_cache.aget(webpage_content)
+        if cached is not None:
+            return cached
+
+        async def summarize_and_store() -> str:
+            summary = await generate_webpage_summary(webpage_content)
+            await summary_cache.aput(webpage_content, summary)
+            return summary
 
-        # Generate summary
-        summary = structured_model.invoke([
+        return await inflight_summaries.run(summary_cache.make_key(webpage_content), summarize_and_store)
+
+    except Exception as e:
+        print(f"Failed to summarize webpage: {str(e)}")
+        metrics.inc("webpage_summaries_total", outcome="truncated")
+        return webpage_content[:1000] + "..." if len(webpage_content) > 1000 else webpage_content
+
+async def generate_webpage_summary(webpage_content: str) -> str:
+    """Summarize webpage content with the summarization model.
+
+    Raises:
+        Exception: Any model error, so callers can fall back without caching the fallback
+    """
+    # Set up structured output model for summarization
+    structured_model = summarization_model.with_structured_output(Summary)
+
+    # Generate summary
+    async with provider_slot("model"):
+        summary = await structured_model.ainvoke([
             HumanMessage(content=summarize_webpage_prompt.format(
                 webpage_content=webpage_content,
                 date=get_today_str()
             ))
         ])
 
-        # Format summary with clear structure
-        formatted_summary = (
-            f"<summary>\n{summary.summary}\n</summary>\n\n"
-            f"<key_excerpts>\n{summary.key_excerpts}\n</key_excerpts>"
-        )
+    metrics.inc("webpage_summaries_total", outcome="summarized")
 
-        return formatted_summary
-
-    except Exception as e:
-        print(f"Failed to summarize webpage: {str(e)}")
-        return webpage_content[:1000] + "..." if len(webpage_content) > 1000 else webpage_content
+    # Format summary with clear structure
+    return (
+        f"<summary>\n{summary.summary}\n</summary>\n\n"
+        f"<key_excerpts>\n{summary.key_excerpts}\n</key_excerpts>"
+    )
 
 def deduplicate_search_results(search_results: List[dict]) -> dict:
     """Deduplicate search results by URL to avoid processing duplicate content.
@@ -162,7 +288,7 @@ def deduplicate_search_results(search_results: List[dict]) -> dict:
 
     return unique_results
 
-def process_search_results(unique_results: dict) -> dict:
+async def process_search_results(unique_results: dict) -> dict:
     """Process search results by summarizing content where available.
 
     Args:
@@ -171,28 +297,34 @@ def process_search_results(unique_results: dict) -> dict:
     Returns:
         Dictionary of processed results with summaries
     """
-    summarized_results = {}
-
-    for url, result in unique_results.items():
+    async def process(result: dict) -> dict:
         # Use existing content if no raw content for summarization
         if not result.get("raw_content"):
             content = result['content']
         else:
+            # Fingerprint the page so a later report refresh can tell whether it changed
+            registry.record_content(result['url'], result['raw_content'])
             # Summarize raw content for better processing
-            content = summarize_webpage_content(result['raw_content'])
+            content = await summarize_webpage_content(result['raw_content'])
 
-        summarized_results[url] = {
+        return {
             'title': result['title'],
             'content': content
         }
 
-    return summarized_results
+    registry = get_source_registry()
+
+    # Summarize pages concurrently; the dictionary keeps the original URL order
+    summaries = await asyncio.gather(*(process(result) for result in unique_results.values()))
+    return dict(zip(unique_results, summaries))
 
-def format_search_output(summarized_results: dict) -> str:
+def format_search_output(summarized_results: dict, registry: SourceRegistry | None = None) -> str:
     """Format search results into a well-structured string output.
 
     Args:
         summarized_results: Dictionary of processed search results
+        registry: Run's source registry; when given, sources are labelled with
+            their stable IDs and URLs are shown only for newly seen sources
 
     Returns:
         Formatted string of search results with clear source separation
@@ -203,17 +335,100 @@ def format_search_output(summarized_results: dict) -> str:
     formatted_output = "Search results: \n\n"
 
     for i, (url, result) in enumerate(summarized_results.items(), 1):
-        formatted_output += f"\n\n--- SOURCE {i}: {result['title']} ---\n"
-        formatted_output += f"URL: {url}\n\n"
+        if registry is None:
+            formatted_output += f"\n\n--- SOURCE {i}: {result['title']} ---\n"
+            formatted_output += f"URL: {url}\n\n"
+        else:
+            source_id, is_new = registry.register(url, result['title'])
+            formatted_output += f"\n\n--- SOURCE {source_id}: {result['title']} ---\n"
+            formatted_output += f"URL: {url}\n\n" if is_new else "(seen earlier in this research run)\n\n"
         formatted_output += f"SUMMARY:\n{result['content']}\n\n"
         formatted_output += "-" * 80 + "\n"
 
     return formatted_output
 
+async def run_search_pipeline(
+    queries: List[str],
+    max_results: int = 3,
+    topic: Literal["general", "news", "finance"] = "general",
+    registry: SourceRegistry | None = None,
+) -> str:
+    """Run the full search, deduplication, summarization and formatting pipeline.
+
+    Args:
+        queries: Search queries to execute concurrently
+        max_results: Maximum number of results per query
+        topic: Topic to filter results by
+        registry: Source registry used to label sources with stable IDs
+
+    Returns:
+        Formatted string of search results with summaries, deduplicated across queries
+    """
+    if two_phase_retrieval:
+        # Phase 1: snippets only, then raw content for the top-ranked hits
+        search_results = await tavily_search_multiple(
+            queries,
+            max_results=max(max_results, two_phase_candidates),
+            topic=topic,
+            include_raw_content=False,
+        )
+        unique_results = await rank_and_fetch_top_results(
+            queries, search_results, max_results, two_phase_top_k,
+        )
+    else:
+        # Execute searches for all queries
+        search_results = await tavily_search_multiple(
+            queries,
+            max_results=max_results,
+            topic=topic,
+            include_raw_content=True,
+        )
+
+        # Deduplicate results by URL to avoid processing duplicate content
+        unique_results = deduplicate_search_results(search_results)
+
+    # Process results with summarization
+    summarized_results = await process_search_results(unique_results)
+
+    # Format output for consumption
+    return format_search_output(summarized_results, registry)
+
+def current_source_registry() -> SourceRegistry | None:
+    """Get the current run's source registry, or None if stable IDs are disabled."""
+    return get_source_registry() if source_registry_enabled else None
+
+def prefetch_research_topic(
+    research_topic: str,
+    max_results: int = 3,
+    topic: Literal["general", "news", "finance"] = "general",
+) -> None:
+    """Start speculative searches for a delegated research topic in the background.
+
+    Candidate queries are extracted from the topic and run through the search
+    pipeline while the researcher's first model call is in flight. Searches run
+    as tasks of the current prefetch scope (see `prefetch_scope`), in the run's
+    context; without a scope nothing is prefetched.
+
+    Args:
+        research_topic: Topic text from a ConductResearch tool call
+        max_results: Maximum number of results per query
+        topic: Topic filter for search results
+    """
+    cache = current_speculative_cache.get()
+    if cache is None:
+        return
+    max_results = run_depth().cap_results(max_results)
+
+    async def prefetch() -> None:
+        for query in await extract_candidate_queries(research_topic):
+            cache.start(query, max_results, topic, run_search_pipeline([query], max_results, topic, current_source_registry()))
+
+    cache.spawn(prefetch())
+
 # ===== RESEARCH TOOLS =====
 
 @tool(parse_docstring=True)
-def tavily_search(
+async def tavily_search(
     query: str,
     max_results: Annotated[int, InjectedToolArg] = 3,
     topic: Annotated[Literal["general", "news", "finance"], InjectedToolArg] = "general",
@@ -228,22 +443,56 @@ def tavily_search(
     Returns:
         Formatted string of search results with summaries
     """
-    # Execute search for single query
-    search_results = tavily_search_multiple(
-        [query],  # Convert single query to list for the internal function
-        max_results=max_results,
-        topic=topic,
-        include_raw_content=True,
-    )
+    # Fewer results per query when the system is under load
+    max_results = run_depth().cap_results(max_results)
 
-    # Deduplicate results by URL to avoid processing duplicate content
-    unique_results = deduplicate_search_results(search_results)
+    # Take over a speculative search for the same query started when this topic was delegated
+    cache = current_speculative_cache.get()
+    prefetched = cache.take(query, max_results, topic) if cache is not None else None
+    if prefetched is not None:
+        try:
+            return await prefetched
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Prefetched search failed, searching again: %s", e)
 
-    # Process results with summarization
-    summarized_results = process_search_results(unique_results)
+    return await run_search_pipeline([query], max_results, topic, current_source_registry())
 
-    # Format output for consumption
-    return format_search_output(summarized_results)
+@tool(parse_docstring=True)
+async def tavily_search_batch(
+    queries: List[str],
+    max_results: Annotated[int, InjectedToolArg] = 3,
+    topic: Annotated[Literal["general", "news", "finance"], InjectedToolArg] = "general",
+) -> str:
+    """Fetch results for several search queries at once with content summarization.
+
+    Use this instead of multiple tavily_search calls when you want to cover
+    several angles of a question in one step. Results are deduplicated across
+    queries and returned as a single numbered list of sources. Each query counts
+    as one search against your budget, and only the first few are run.
+
+    Args:
+        queries: List of distinct search queries to execute together (a few; extra queries are skipped)
+        max_results: Maximum number of results to return per query
+        topic: Topic to filter results by ('general', 'news', 'finance')
+
+    Returns:
+        Formatted string of merged search results with summaries
+    """
+    max_results = run_depth().cap_results(max_results)
+    batch = batch_queries(queries)
+    result = await run_search_pipeline(batch, max_results, topic, current_source_registry())
+    if len(batch) < len(queries):
+        result = f"Ran {len(batch)} of {len(queries)} queries (repeats and queries past the limit of {max_batch_queries} are skipped): {batch}\n\n{result}"
+    return result
+
+def batch_queries(queries: List[str]) -> List[str]:
+    """Drop repeated queries of a batch and keep at most `max_batch_queries` of the rest."""
+    unique = {}
+    for query in queries:
+        unique.setdefault(normalize_query(query), query)
+    return list(unique.values())[:max_batch_queries]
 
 @tool(parse_docstring=True)
 def think_tool(reflection: str) -> str:
@@ -0,0 +1,5 @@
+import os
+
+# Model clients are created at import time; tests never reach the real providers
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("TAVILY_API_KEY", "test")
@@ -0,0 +1,98 @@
+"""Cancelling a supervisor step must stop its researchers and their in-flight searches."""
+
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage
+
+from deep_research_from_scratch import multi_agent_supervisor, research_agent, utils
+from deep_research_from_scratch.cancellation import cancel_grace_seconds
+from deep_research_from_scratch.execution_backend import InProcessBackend
+from deep_research_from_scratch.scheduler import provider_scheduler, scheduler
+from deep_research_from_scratch.search_providers import SearchProvider
+
+
+class HangingSearchProvider(SearchProvider):
+    """Stand-in provider whose searches never return."""
+
+    def __init__(self):
+        self.started = 0
+        self.cancelled = 0
+        self.all_started = asyncio.Event()
+        self.expected = 0
+
+    def search(self, *args, **kwargs):
+        raise NotImplementedError
+
+    def extract(self, urls):
+        raise NotImplementedError
+
+    async def asearch(self, query, max_results=3, include_raw_content=True, topic="general"):
+        self.started += 1
+        if self.started >= self.expected:
+            self.all_started.set()
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+class RecordingBackend(InProcessBackend):
+    """In-process backend that remembers the task of each researcher."""
+
+    def __init__(self):
+        self.tasks = []
+
+    async def run_researcher(self, research_topic, thread_id=None):
+        self.tasks.append(asyncio.current_task())
+        return await super().run_researcher(research_topic, thread_id)
+
+class SearchingModel(FakeMessagesListChatModel):
+    """Researcher model that always asks for one search."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+def test_cancelling_supervisor_tools_cancels_researchers_and_searches(monkeypatch):
+    provider = HangingSearchProvider()
+    provider.expected = 3
+    backend = RecordingBackend()
+    monkeypatch.setattr(utils, "search_provider", provider)
+    monkeypatch.setattr(multi_agent_supervisor, "get_execution_backend", lambda: backend)
+    monkeypatch.setattr(research_agent, "model_with_tools", SearchingModel(responses=[
+        AIMessage(content="", tool_calls=[{"name": "tavily_search", "args": {"query": "topic"}, "id": "search"}]),
+    ]))
+
+    state = {
+        "supervisor_messages": [AIMessage(content="", tool_calls=[
+            {"name": "ConductResearch", "args": {"research_topic": f"topic {i}"}, "id": f"research-{i}"}
+            for i in range(3)
+        ])],
+        "research_iterations": 1,
+    }
+
+    async def run():
+        step = asyncio.create_task(multi_agent_supervisor.supervisor_tools(state))
+        await asyncio.wait_for(provider.all_started.wait(), timeout=10)
+        assert scheduler.in_use == 3
+        assert provider_scheduler.in_use == 3
+
+        step.cancel()
+        try:
+            await step
+        except asyncio.CancelledError:
+            pass
+
+        # Slots are released within the grace period
+        deadline = asyncio.get_running_loop().time() + cancel_grace_seconds
+        while (scheduler.in_use or provider_scheduler.in_use) and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.01)
+        return scheduler.in_use, provider_scheduler.in_use
+
+    researchers_in_use, provider_calls_in_use = asyncio.run(run())
+
+    assert len(backend.tasks) == 3
+    assert all(task.cancelled() for task in backend.tasks)
+    assert provider.cancelled == 3
+    assert researchers_in_use == 0
+    assert provider_calls_in_use == 0
@@ -0,0 +1,53 @@
+"""Repeated calls must reuse the cached prompt prefix even when per-run values change."""
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from deep_research_from_scratch import prompt_cache
+from deep_research_from_scratch.metrics import metrics
+from deep_research_from_scratch.prompt_cache import (
+    LocalPromptCache,
+    build_cached_prompt,
+    record_prompt_usage,
+    split_prompt,
+)
+from deep_research_from_scratch.prompts import lead_researcher_prompt
+
+
+def supervisor_request(date, researchers, iterations):
+    system_prompt, run_context = split_prompt(
+        lead_researcher_prompt,
+        date=date,
+        max_concurrent_research_units=researchers,
+        max_researcher_iterations=iterations,
+    )
+    history = [HumanMessage(content="Research the history of the bicycle.")]
+    return system_prompt, build_cached_prompt(system_prompt, history, run_context=run_context)
+
+
+def test_repeated_calls_hit_the_local_cache(monkeypatch):
+    monkeypatch.setattr(prompt_cache, "prompt_caching", True)
+    monkeypatch.setattr(prompt_cache, "prompt_cache_backend", "local")
+    monkeypatch.setattr(prompt_cache, "local_prompt_cache", LocalPromptCache())
+
+    # A later call on another day, with depth reduced under load
+    first_prompt, first = supervisor_request("Mon Oct 19, 2026", 3, 6)
+    second_prompt, second = supervisor_request("Tue Oct 20, 2026", 1, 2)
+
+    assert first_prompt == second_prompt
+    assert isinstance(first[0], SystemMessage) and first[0].content == second[0].content
+    assert "Tue Oct 20, 2026" in second[-1].content and "- max_concurrent_research_units: 1" in second[-1].content
+
+    before = metrics.get("llm_input_tokens_total", node="test", cache="cached")
+    record_prompt_usage("test", first_prompt, None)
+    assert metrics.get("llm_input_tokens_total", node="test", cache="cached") == before
+    record_prompt_usage("test", second_prompt, None)
+    assert metrics.get("llm_input_tokens_total", node="test", cache="cached") > before
+
+
+def test_values_stay_inline_without_caching(monkeypatch):
+    monkeypatch.setattr(prompt_cache, "prompt_caching", False)
+
+    system_prompt, request = supervisor_request("Mon Oct 19, 2026", 3, 6)
+
+    assert "Mon Oct 19, 2026" in system_prompt
+    assert len(request) == 2